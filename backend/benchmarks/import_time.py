@@ -0,0 +1,84 @@
+# Cold start benchmark - measures `python -X importtime` for the Vercel entry point
+#
+# Usage (from backend/):
+#   python -m benchmarks.import_time            Check against import_time_budget.json
+#   python -m benchmarks.import_time --top 20   Also print the 20 slowest imports
+#
+# Exits non-zero when the cumulative import time exceeds the budget or a
+# module that should be imported lazily is loaded at startup.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_time_budget.json")
+
+
+def measure(module: str, runs: int) -> List[Dict[str, Tuple[int, int]]]:
+    """
+    Import a module in fresh interpreters with -X importtime.
+
+    Returns:
+        One dict per run mapping module name to (self_us, cumulative_us)
+    """
+    results = []
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{proc.stderr}")
+
+        timings: Dict[str, Tuple[int, int]] = {}
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "[us]" in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            timings[name.strip()] = (int(self_us), int(cumulative_us))
+        results.append(timings)
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to measure (median is reported)")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to print")
+    args = parser.parse_args(argv)
+
+    with open(BUDGET_FILE) as f:
+        budget = json.load(f)
+
+    module = budget["module"]
+    runs = measure(module, args.runs)
+    totals = sorted(run[module][1] for run in runs)
+    median_ms = totals[len(totals) // 2] / 1000
+
+    print(f"{module}: median cumulative import time {median_ms:.1f} ms over {args.runs} runs "
+          f"(budget {budget['budget_ms']} ms)")
+
+    slowest = sorted(runs[0].items(), key=lambda item: item[1][0], reverse=True)[: args.top]
+    for name, (self_us, cumulative_us) in slowest:
+        print(f"  {self_us / 1000:8.1f} ms self  {cumulative_us / 1000:8.1f} ms cumulative  {name}")
+
+    failed = False
+    if median_ms > budget["budget_ms"]:
+        print(f"FAIL: import time {median_ms:.1f} ms exceeds budget of {budget['budget_ms']} ms")
+        failed = True
+
+    eager = [name for name in budget.get("forbidden_modules", []) if name in runs[0]]
+    if eager:
+        print(f"FAIL: modules imported at startup that must stay lazy: {', '.join(eager)}")
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+# Command line entry point for operational tasks
+#
+# Usage:
+#   python -m src.cli init-db      Create or migrate database tables and indexes
+#   python -m src.cli check-db     Test database connectivity
+
+import argparse
+import sys
+
+
+def init_db_command(args: argparse.Namespace) -> int:
+    """Create database extensions, tables and indexes."""
+    from src.config.database import init_db
+    init_db()
+    print("Database schema is up to date.")
+    return 0
+
+
+def check_db_command(args: argparse.Namespace) -> int:
+    """Test database connectivity."""
+    from src.config.database import _test_connection
+    _test_connection()
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.cli", description="Node Builder API management commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("init-db", help="Create or migrate database tables and indexes").set_defaults(func=init_db_command)
+    subparsers.add_parser("check-db", help="Test database connectivity").set_defaults(func=check_db_command)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
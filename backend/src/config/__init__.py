@@ -1,4 +1,4 @@
 # Config package
-from .database import engine, init_db, get_db
+from .database import get_engine, init_db, get_db, open_session, get_session_factory
 
-__all__ = ["engine", "init_db", "get_db"]
+__all__ = ["get_engine", "init_db", "get_db", "open_session", "get_session_factory"]
@@ -1,61 +1,120 @@
 # Database connection and session management (adapted from Supabase docs)
 
-import os
-from dotenv import load_dotenv
-from sqlalchemy import create_engine
-# from sqlalchemy.pool import NullPool
+import threading
+from typing import Optional
+from sqlalchemy.engine import Engine
 from sqlmodel import SQLModel, Session
 from urllib.parse import quote_plus
 
-# Load environment variables from .env
-load_dotenv()
-
-# Fetch variables
-USER = os.getenv("user")
-PASSWORD = os.getenv("password")
-HOST = os.getenv("host")
-PORT = os.getenv("port", "5432")
-DBNAME = os.getenv("dbname")
-
-if not all([USER, PASSWORD, HOST, DBNAME]):
-    raise RuntimeError("Database credentials are not fully set. Required: user, password, host, dbname")
-
-# URL-encode username/password to survive special characters (#, @, etc.)
-ENCODED_USER = quote_plus(USER)
-ENCODED_PASSWORD = quote_plus(PASSWORD)
-
-# Guard against misconfigured host containing credentials
-if "@" in HOST:
-    raise RuntimeError(
-        "The 'host' env var appears to include credentials. "
-        "Set 'host' to the bare domain (e.g. aws-1-ap-south-1.pooler.supabase.com) "
-        "and keep username/password in 'user'/'password'."
+from src.config.settings import get_env
+
+# Postgres extensions the schema depends on (trigram indexes on nodes)
+DB_EXTENSIONS = ("pg_trgm",)
+
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+
+
+def get_database_url() -> str:
+    """Build the SQLAlchemy connection string from environment variables."""
+    # Fetch variables
+    user = get_env("user")
+    password = get_env("password")
+    host = get_env("host")
+    port = get_env("port", "5432")
+    dbname = get_env("dbname")
+
+    if not all([user, password, host, dbname]):
+        raise RuntimeError("Database credentials are not fully set. Required: user, password, host, dbname")
+
+    # Guard against misconfigured host containing credentials
+    if "@" in host:
+        raise RuntimeError(
+            "The 'host' env var appears to include credentials. "
+            "Set 'host' to the bare domain (e.g. aws-1-ap-south-1.pooler.supabase.com) "
+            "and keep username/password in 'user'/'password'."
+        )
+
+    # URL-encode username/password to survive special characters (#, @, etc.)
+    return (
+        f"postgresql+psycopg2://{quote_plus(user)}:{quote_plus(password)}"
+        f"@{host}:{port}/{dbname}?sslmode=require"
     )
 
-# Construct the SQLAlchemy connection string
-DATABASE_URL = f"postgresql+psycopg2://{ENCODED_USER}:{ENCODED_PASSWORD}@{HOST}:{PORT}/{DBNAME}?sslmode=require"
 
-# Create the SQLAlchemy engine
-engine = create_engine(DATABASE_URL)
-# If using Transaction Pooler or Session Pooler, disable client-side pooling:
-# engine = create_engine(DATABASE_URL, poolclass=NullPool)
+def get_engine() -> Engine:
+    """
+    Return the process-wide SQLAlchemy engine, creating it on first use.
+    
+    Engine construction (and the psycopg2 import it triggers) is deferred
+    until a request actually needs the database, keeping cold starts fast.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                from sqlalchemy import create_engine
+                _engine = create_engine(get_database_url())
+                # If using Transaction Pooler or Session Pooler, disable client-side pooling:
+                # from sqlalchemy.pool import NullPool
+                # _engine = create_engine(get_database_url(), poolclass=NullPool)
+    return _engine
+
+
+def __getattr__(name: str):
+    # Backwards compatible lazy access to `engine`
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def init_db():
-    """Initialize database tables."""
-    SQLModel.metadata.create_all(engine)
+    """
+    Initialize the database schema (run via `python -m src.cli init-db`).
+    
+    Creates required extensions, missing tables, and indexes that were added
+    to a model after its table was created, so re-running it migrates an
+    existing database.
+    """
+    from sqlalchemy import text
+
+    # Import models so their tables are registered on SQLModel.metadata
+    import src.models  # noqa: F401
+    with get_engine().begin() as connection:
+        for extension in DB_EXTENSIONS:
+            connection.execute(text(f"CREATE EXTENSION IF NOT EXISTS {extension}"))
+        SQLModel.metadata.create_all(connection)
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
 
 
 def get_db():
     """Dependency that provides a database session."""
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         yield session
 
 
+def open_session() -> Session:
+    """Open a session for a short piece of work; the caller closes it."""
+    return Session(get_engine())
+
+
+def get_session_factory():
+    """
+    Dependency that provides open_session instead of a session.
+    
+    For long-running handlers (pipeline runs): a get_db session would keep
+    its pooled connection checked out until the response is sent, while the
+    handler only needs the database for a quick lookup up front.
+    """
+    return open_session
+
+
 def _test_connection():
     """Test database connectivity (mirrors Supabase sample)."""
     try:
-        with engine.connect() as connection:
+        with get_engine().connect() as connection:
             print("Connection successful!")
     except Exception as e:  # pragma: no cover - diagnostic helper
         print(f"Failed to connect: {e}")
@@ -0,0 +1,27 @@
+# Request size limits - bound the memory a single request can pin
+
+from src.config.settings import get_env, get_float, get_int
+
+# Largest request body accepted, in bytes (413 above this)
+MAX_REQUEST_BODY_BYTES = get_int("MAX_REQUEST_BODY_BYTES", 16 * 1024 * 1024)
+
+# Bytes of request bodies held by all in-flight requests on a worker; requests
+# wait for room (503 after REQUEST_BODY_BUDGET_WAIT seconds) once it is spent
+REQUEST_BODY_BUDGET_BYTES = get_int("REQUEST_BODY_BUDGET_BYTES", 128 * 1024 * 1024)
+REQUEST_BODY_BUDGET_WAIT = get_float("REQUEST_BODY_BUDGET_WAIT", 10.0)
+
+# Longest line in a streamed NDJSON body (the batch header line holds the pipeline)
+MAX_NDJSON_LINE_BYTES = get_int("MAX_NDJSON_LINE_BYTES", MAX_REQUEST_BODY_BYTES)
+
+# Per-field and per-graph limits for pipeline payloads
+PIPELINE_MAX_TEXT_CHARS = get_int("PIPELINE_MAX_TEXT_CHARS", 1_000_000)
+PIPELINE_MAX_PROMPT_CHARS = get_int("PIPELINE_MAX_PROMPT_CHARS", 200_000)
+PIPELINE_MAX_NODES = get_int("PIPELINE_MAX_NODES", 5_000)
+PIPELINE_MAX_EDGES = get_int("PIPELINE_MAX_EDGES", 20_000)
+
+# Prompt token budgets, estimated locally before each LLM call (0 = unlimited):
+# per LLM node call, and for all LLM calls of one pipeline run together
+LLM_NODE_MAX_PROMPT_TOKENS = get_int("LLM_NODE_MAX_PROMPT_TOKENS", 32_000)
+PIPELINE_MAX_PROMPT_TOKENS = get_int("PIPELINE_MAX_PROMPT_TOKENS", 0)
+# What happens to a prompt over budget: truncate, summarize or fail
+TOKEN_BUDGET_POLICY = get_env("TOKEN_BUDGET_POLICY", "truncate")
@@ -0,0 +1,33 @@
+# Application settings - environment is loaded exactly once per process
+
+import os
+from typing import Optional
+from dotenv import load_dotenv
+
+# Load environment variables from .env
+load_dotenv()
+
+
+def get_env(name: str, default: Optional[str] = None) -> Optional[str]:
+    """Read a string setting from the environment."""
+    return os.getenv(name, default)
+
+
+def get_int(name: str, default: int) -> int:
+    """Read an integer setting from the environment."""
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def get_float(name: str, default: float) -> float:
+    """Read a float setting from the environment."""
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+def get_bool(name: str, default: bool = False) -> bool:
+    """Read a boolean setting from the environment (1/true/yes/on)."""
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
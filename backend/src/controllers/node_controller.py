@@ -1,12 +1,34 @@
 # Node Controller - Business logic for node operations
 
-from typing import List
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
 from fastapi import HTTPException, status
+from pydantic import TypeAdapter
 from sqlmodel import Session, select
+from sqlalchemy import func, literal_column, or_
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 
-from src.models.node import Node
-from src.schemas.node import NodeCreate
+from src.models.node import Node, NODE_SEARCH_VECTOR
+from src.schemas.node import NodeCreate, NodeResponse, NodeSearchResult, NodeSearchResponse
+from src.utils.catalog_cache import CATALOG_CACHE_TTL, catalog_cache
+from src.utils.shared_cache import shared_cache
+
+NODE_LIST_ADAPTER = TypeAdapter(List[NodeResponse])
+
+# Words as the Postgres text search parser splits them (underscores separate words)
+SEARCH_TOKEN_PATTERN = re.compile(r"[^\W_]+")
+LIKE_ESCAPE = "!"
+
+
+def _search_tsquery(query: str) -> Optional[str]:
+    """Prefix-match every word of the query ("text inp" -> "text:* & inp:*")."""
+    tokens = SEARCH_TOKEN_PATTERN.findall(query.lower())
+    return " & ".join(f"{token}:*" for token in tokens) or None
+
+
+def _like_pattern(query: str) -> str:
+    escaped = re.sub(r"([!%_])", r"!\1", query)
+    return f"%{escaped}%"
 
 
 class NodeController:
@@ -44,6 +66,7 @@ class NodeController:
             db.add(node)
             db.commit()
             db.refresh(node)
+            catalog_cache.invalidate()
             
             return node
             
@@ -85,6 +108,198 @@ class NodeController:
                 detail=f"Database error: {str(e)}"
             )
     
+    @staticmethod
+    def get_catalog_body(db: Session, encoding: Optional[str] = None) -> Tuple[bytes, str]:
+        """
+        Get the serialized node catalog, served from the catalog cache.
+        
+        Args:
+            db: Database session
+            encoding: Negotiated content-coding ("br", "gzip") or None
+            
+        Returns:
+            Tuple of the JSON body (compressed with encoding, if given) and its ETag
+            
+        Raises:
+            HTTPException: If database error occurs
+        """
+        def build() -> bytes:
+            nodes = NodeController.get_all_nodes(db)
+            return NODE_LIST_ADAPTER.dump_json(
+                NODE_LIST_ADAPTER.validate_python(nodes, from_attributes=True),
+                exclude_none=True,
+            )
+
+        return catalog_cache.get(build, encoding)
+    
+    @staticmethod
+    def search_nodes(
+        db: Session,
+        query: str = "",
+        tab: Optional[str] = None,
+        field_type: Optional[str] = None,
+        handle_type: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0
+    ) -> NodeSearchResponse:
+        """
+        Search node definitions, best match first.
+        
+        Words are prefix-matched against the full-text index (title, label,
+        type, description, tab and string values in fields/handles); titles
+        and labels also match on substrings and near-misses via trigrams.
+        
+        Args:
+            db: Database session
+            query: Search text; empty lists every node (filters still apply)
+            tab: Only nodes in this tab
+            field_type: Only nodes with a field of this type
+            handle_type: Only nodes with a handle of this type
+            limit: Page size
+            offset: Number of results to skip
+            
+        Returns:
+            A page of ranked results and the total number of matches
+            
+        Raises:
+            HTTPException: If database error occurs
+        """
+        query = query.strip()
+        vector = literal_column(f"({NODE_SEARCH_VECTOR})")
+
+        filters = []
+        if tab:
+            filters.append(Node.tab == tab)
+        if field_type:
+            filters.append(Node.fields.contains([{"type": field_type}]))
+        if handle_type:
+            filters.append(Node.handles.contains([{"type": handle_type}]))
+
+        if query:
+            pattern = _like_pattern(query)
+            matches = [
+                Node.title.ilike(pattern, escape=LIKE_ESCAPE),
+                Node.label.ilike(pattern, escape=LIKE_ESCAPE),
+                Node.title.op("%")(query),
+                Node.label.op("%")(query),
+            ]
+            rank = func.greatest(func.similarity(Node.title, query), func.similarity(Node.label, query))
+            tsquery = _search_tsquery(query)
+            if tsquery:
+                ts_query = func.to_tsquery("simple", tsquery)
+                matches.append(vector.op("@@")(ts_query))
+                rank = rank + func.ts_rank(vector, ts_query)
+            filters.append(or_(*matches))
+        else:
+            rank = literal_column("0.0")
+
+        try:
+            rank_column = rank.label("rank")
+            statement = (
+                select(Node, rank_column, func.count().over().label("total"))
+                .where(*filters)
+                .order_by(rank_column.desc(), Node.title)
+                .limit(limit)
+                .offset(offset)
+            )
+            rows = db.exec(statement).all()
+
+            if rows:
+                total = rows[0].total
+            elif offset:
+                # Past the last page: the window count has no row to ride on
+                total = db.exec(select(func.count()).select_from(Node).where(*filters)).one()
+            else:
+                total = 0
+
+            results = [
+                NodeSearchResult(
+                    **NodeResponse.model_validate(node, from_attributes=True).model_dump(),
+                    rank=float(row_rank or 0.0)
+                )
+                for node, row_rank, _ in rows
+            ]
+            return NodeSearchResponse(query=query, total=total, limit=limit, offset=offset, results=results)
+        except SQLAlchemyError as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Database error: {str(e)}"
+            )
+    
+    @staticmethod
+    def get_nodes_by_types(db: Session, node_types: Iterable[str]) -> Dict[str, Node]:
+        """
+        Get the node definitions of several types in a single query.
+        
+        Args:
+            db: Database session
+            node_types: Node types to look up
+            
+        Returns:
+            Dict mapping each found type to its node (unknown types are absent)
+            
+        Raises:
+            HTTPException: If database error occurs
+        """
+        types = set(node_types)
+        if not types:
+            return {}
+        try:
+            nodes = db.exec(select(Node).where(Node.type.in_(types))).all()
+            return {node.type: node for node in nodes}
+        except SQLAlchemyError as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Database error: {str(e)}"
+            )
+    
+    @staticmethod
+    def get_node_definitions(db: Session, node_types: Iterable[str]) -> Dict[str, NodeResponse]:
+        """
+        Get the node definitions of several types through the shared cache.
+        
+        Each type is cached under the current catalog version (types that are
+        not in the catalog too), so one worker's query warms every worker and
+        a catalog change invalidates them all. Types not in the shared cache
+        are fetched in a single query. Without a shared backend this is
+        get_nodes_by_types().
+        
+        Args:
+            db: Database session
+            node_types: Node types to look up
+            
+        Returns:
+            Dict mapping each found type to its definition (unknown types are absent)
+            
+        Raises:
+            HTTPException: If database error occurs
+        """
+        types = set(node_types)
+        if not shared_cache.shared:
+            return {
+                node_type: NodeResponse.model_validate(node)
+                for node_type, node in NodeController.get_nodes_by_types(db, types).items()
+            }
+        
+        definitions: Dict[str, NodeResponse] = {}
+        missing = set()
+        for node_type in types:
+            cached = shared_cache.get("catalog", "node", node_type)
+            if cached is None:
+                missing.add(node_type)
+            elif cached != b"null":
+                definitions[node_type] = NodeResponse.model_validate_json(cached)
+        
+        nodes = NodeController.get_nodes_by_types(db, missing)
+        for node_type in missing:
+            node = nodes.get(node_type)
+            definition = NodeResponse.model_validate(node) if node is not None else None
+            if definition is not None:
+                definitions[node_type] = definition
+            value = definition.model_dump_json().encode() if definition is not None else b"null"
+            shared_cache.set("catalog", "node", node_type, value=value, ttl=CATALOG_CACHE_TTL)
+        return definitions
+    
     @staticmethod
     def get_node_by_type(db: Session, node_type: str) -> Node:
         """
@@ -144,6 +359,7 @@ class NodeController:
             
             db.delete(node)
             db.commit()
+            catalog_cache.invalidate()
             
             return {"message": f"Node '{node_type}' deleted successfully"}
         except HTTPException:
@@ -1,22 +1,62 @@
 # Pipeline Controller - Business logic for pipeline operations
 
-from typing import Dict, List
-from fastapi import HTTPException
+import asyncio
+import dataclasses
+import heapq
+import json
+import time
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import Session
 
 from src.schemas import (
     PipelineNode,
     PipelineEdge,
     PipelineCreate,
     PipelineParseResponse,
+    PipelineBatchRow,
+    PipelineBatchResult,
+    PipelineRunResponse,
+    PipelinePatchOp,
+    PipelinePatch,
+    PipelineVersionResponse,
 )
 from src.utils import (
-    is_dag,
-    topological_sort,
-    find_nodes_by_type,
-    get_connected_inputs,
     interpolate_variables,
-    execute_llm,
+    complete_llm,
 )
+from src.config.settings import get_float, get_int
+from src.controllers.node_controller import NodeController
+from src.utils.node_validation import PipelineWiringError, node_specs, wiring_errors
+from src.utils.llm_providers import LLMResult, llm_registry
+from src.utils.offload import graph_offload
+from src.utils.pipeline_plan import PipelinePlan
+from src.utils.pipeline_store import StoredPipeline, VersionConflict, pipeline_store
+from src.utils.run_registry import run_registry
+from src.utils.run_results import run_results
+from src.utils.shared_cache import CacheLockTimeout, shared_cache
+from src.utils.token_budget import TOKEN_SUMMARY_MODEL, RunTokenBudget
+from src.utils.scheduler import (
+    DEFAULT_PRIORITY,
+    critical_path_lengths,
+    latency_tracker,
+    node_limiter,
+    priority_rank,
+)
+
+# LLM nodes of a single run executed at once
+PIPELINE_NODE_CONCURRENCY = get_int("PIPELINE_NODE_CONCURRENCY", 4)
+
+# Non-LLM nodes processed before the executor yields to other requests
+PIPELINE_YIELD_EVERY = get_int("PIPELINE_YIELD_EVERY", 500)
+
+BATCH_DEFAULT_CONCURRENCY = get_int("BATCH_DEFAULT_CONCURRENCY", 4)
+BATCH_MAX_CONCURRENCY = get_int("BATCH_MAX_CONCURRENCY", 32)
+
+# Seconds an LLM completion is reused for an identical prompt (0 = never reuse)
+LLM_RESULT_CACHE_TTL = get_float("LLM_RESULT_CACHE_TTL", 0.0)
 
 
 class PipelineController:
@@ -40,6 +80,92 @@ Strict requirements:
 - Do not add assumptions or information not supported by the input text.
 - Avoid repetition and unnecessary context."""
     
+    @staticmethod
+    def compile_plan(nodes: List[PipelineNode], edges: List[PipelineEdge]) -> PipelinePlan:
+        """
+        Validate and plan a pipeline graph once.
+        
+        Args:
+            nodes: List of pipeline nodes
+            edges: List of pipeline edges
+            
+        Returns:
+            PipelinePlan reusable across executions
+        """
+        return PipelinePlan(
+            nodes,
+            edges,
+            input_types=PipelineController.INPUT_TYPES,
+            output_types=PipelineController.OUTPUT_TYPES,
+        )
+    
+    @staticmethod
+    async def compile_plan_async(nodes: List[PipelineNode], edges: List[PipelineEdge]) -> PipelinePlan:
+        """
+        Plan a pipeline graph without blocking the event loop on large graphs.
+        
+        Graphs are compiled inline, in a worker thread or in a worker process
+        depending on their size (see graph_offload).
+        
+        Args:
+            nodes: List of pipeline nodes
+            edges: List of pipeline edges
+            
+        Returns:
+            PipelinePlan reusable across executions
+        """
+        return await graph_offload.run(
+            len(nodes) + len(edges), PipelineController.compile_plan, nodes, edges
+        )
+    
+    @staticmethod
+    async def validate_wiring(
+        open_db: Callable[[], Session], nodes: List[PipelineNode], edges: List[PipelineEdge]
+    ) -> None:
+        """
+        Check a pipeline against the node catalog before anything runs.
+        
+        The definitions of all node types used are fetched in one query (or
+        from the shared cache) and compiled into validators, cached until the
+        catalog changes, so a warm check is a single pass over the nodes and
+        edges.
+        
+        Args:
+            open_db: Opens a database session; called only when the validators
+                are not cached, and the session is closed right after the lookup
+            nodes: List of pipeline nodes
+            edges: List of pipeline edges
+            
+        Raises:
+            PipelineWiringError: 422 listing unknown node types, invalid field
+                values, edges through handles the node types do not have and
+                models that are not routed
+        """
+        types = {node.type for node in nodes if node.type}
+
+        def load(missing):
+            with open_db() as db:
+                return NodeController.get_node_definitions(db, missing)
+
+        # A warm cache answers inline; a miss (even one caused by the cache
+        # expiring just now) or a catalog version to read from a remote cache
+        # runs the lookups off the event loop
+        specs = None if shared_cache.backend.remote else node_specs.cached(types)
+        if specs is None:
+            specs = await asyncio.to_thread(node_specs.get, types, load)
+        
+        builtin_types = PipelineController.INPUT_TYPES + PipelineController.LLM_TYPES + PipelineController.OUTPUT_TYPES
+        errors = await graph_offload.run(
+            len(nodes) + len(edges), wiring_errors, nodes, edges, specs, builtin_types
+        )
+        # Clients may pick a model only among the routed backends' models
+        for index, node in enumerate(nodes):
+            msg = llm_registry.model_error(node.type, node.data.model) if node.data else None
+            if msg:
+                errors.append({"loc": ["nodes", index, "data", "model"], "msg": msg, "type": "invalid_wiring"})
+        if errors:
+            raise PipelineWiringError(errors)
+    
     @staticmethod
     async def execute_pipeline(nodes: List[PipelineNode], edges: List[PipelineEdge]) -> Dict[str, str]:
         """
@@ -52,74 +178,201 @@ Strict requirements:
         Returns:
             Dict mapping node_id to its output value
         """
-        # Build a dictionary for quick node lookup
-        nodes_dict = {node.id: node for node in nodes}
-
-        # Get execution order
-        exec_order = topological_sort(nodes, edges)
+        plan = await PipelineController.compile_plan_async(nodes, edges)
+        return await PipelineController.execute_plan(plan)
+    
+    @staticmethod
+    async def execute_plan(
+        plan: PipelinePlan,
+        overrides: Optional[Dict[str, str]] = None,
+        priority: str = DEFAULT_PRIORITY,
+        budget: Optional[RunTokenBudget] = None
+    ) -> Dict[str, str]:
+        """
+        Execute a compiled plan.
+        
+        Nodes run as soon as everything they depend on has finished, with up
+        to PIPELINE_NODE_CONCURRENCY LLM nodes in flight. Ready nodes are
+        started longest-remaining-critical-path first (estimated from observed
+        per-type latency), and every LLM node then waits for a slot in the
+        worker-wide node limiter, where interactive runs go ahead of batch
+        runs. If the run is cancelled, in-flight LLM calls are cancelled
+        immediately and the abandoned work is recorded in the run registry stats.
+        
+        Every LLM prompt is fitted into the run's token budget before it is
+        sent; prompts that are over budget before anything runs fail the run
+        up front under the fail policy.
+        
+        Args:
+            plan: Compiled pipeline plan
+            overrides: Optional {input_node_id: text} replacing input node values
+            priority: Priority class of the run ("interactive" or "batch")
+            budget: Token budget of the run, collecting its token usage
+                (defaults to a budget from the environment settings)
+            
+        Returns:
+            Dict mapping node_id to its output value
+            
+        Raises:
+            TokenBudgetExceeded: A prompt is over budget under the fail policy
+        """
+        overrides = overrides or {}
+        budget = budget or RunTokenBudget()
         
         # Store intermediate results
         node_outputs: Dict[str, str] = {}
         
-        for node_id in exec_order:
-            node = nodes_dict.get(node_id)
-            if not node or not node.data:
+        # Text/Input nodes - store their text (or the row override) as output up
+        # front, so {{node-id}} references see overrides regardless of order
+        for node_id in plan.input_node_ids:
+            node = plan.nodes_dict[node_id]
+            if node.data:
+                node_outputs[node_id] = overrides.get(node_id, node.data.text or "")
+        
+        # Rank nodes by estimated remaining critical path
+        costs = {
+            node_id: latency_tracker.estimate(plan.nodes_dict[node_id].type)
+            for node_id in plan.order
+            if (plan.nodes_dict[node_id].type or "").lower() in PipelineController.LLM_TYPES
+        }
+        remaining = critical_path_lengths(plan.order, plan.dependents, costs)
+        rank = priority_rank(priority)
+        
+        # Prompts built only from input nodes are known now: under the fail
+        # policy, reject them before any LLM call is paid for
+        input_ids = set(plan.input_node_ids)
+        static_prompts = {}
+        for node_id in costs:
+            node = plan.nodes_dict[node_id]
+            if not node.data or "fail" not in (budget.policy, node.data.budgetPolicy):
                 continue
-            
-            node_type = (node.type or "").lower()
-            
-            # Text/Input nodes - store their text as output
-            if node_type in PipelineController.INPUT_TYPES:
-                text_value = node.data.text or ""
-                node_outputs[node_id] = text_value
-            
-            # LLM nodes - gather inputs and execute
-            elif node_type in PipelineController.LLM_TYPES:
-                node_outputs[node_id] = await PipelineController._process_llm_node(
-                    node, edges, nodes_dict, node_outputs
+            if plan.dependencies[node_id] <= input_ids:
+                instructions, prompt_parts = PipelineController._build_llm_prompt(node, plan, node_outputs)
+                static_prompts[node_id] = (
+                    budget.estimator.estimate(instructions) + budget.estimator.estimate_parts(prompt_parts),
+                    node.data.maxPromptTokens,
+                    node.data.budgetPolicy,
                 )
-            
-            # Output nodes - collect the result from connected input
-            elif node_type in PipelineController.OUTPUT_TYPES:
-                input_nodes = get_connected_inputs(node_id, edges, nodes_dict)
-                for input_node in input_nodes:
-                    if input_node.id in node_outputs:
-                        node_outputs[node_id] = node_outputs[input_node.id]
-                        break
+        budget.preflight(static_prompts)
+        
+        waiting = {node_id: len(deps) for node_id, deps in plan.dependencies.items()}
+        ready = []
+        running: Dict[asyncio.Task, str] = {}
+        finished = 0
+        
+        def push_ready(node_id: str) -> None:
+            heapq.heappush(ready, (-remaining[node_id], plan.position[node_id], node_id))
+        
+        def complete(node_id: str) -> None:
+            nonlocal finished
+            finished += 1
+            for dependent in plan.dependents[node_id]:
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    push_ready(dependent)
+        
+        for node_id in plan.order:
+            if waiting[node_id] == 0:
+                push_ready(node_id)
+        
+        try:
+            while ready or running:
+                processed = 0
+                while ready and len(running) < PIPELINE_NODE_CONCURRENCY and processed < PIPELINE_YIELD_EVERY:
+                    processed += 1
+                    _, _, node_id = heapq.heappop(ready)
+                    node = plan.nodes_dict[node_id]
+                    node_type = (node.type or "").lower()
+                    
+                    # LLM nodes - gather inputs and execute concurrently
+                    if node.data and node_type in PipelineController.LLM_TYPES:
+                        task = asyncio.create_task(PipelineController._run_llm_node(
+                            node, plan, node_outputs, (rank, -remaining[node_id]), budget
+                        ))
+                        running[task] = node_id
+                        continue
+                    
+                    # Output nodes - collect the result from connected input
+                    if node.data and node_type in PipelineController.OUTPUT_TYPES:
+                        for input_node in plan.inputs[node_id]:
+                            if input_node.id in node_outputs:
+                                node_outputs[node_id] = node_outputs[input_node.id]
+                                break
+                    complete(node_id)
+                
+                if processed >= PIPELINE_YIELD_EVERY:
+                    # Long runs of non-LLM nodes: let other requests use the loop
+                    await asyncio.sleep(0)
+                    continue
+                
+                if running:
+                    done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        node_id = running.pop(task)
+                        node_outputs[node_id] = task.result()
+                        complete(node_id)
+        except asyncio.CancelledError:
+            run_registry.stats.record_abandoned(len(running), len(plan.order) - finished - len(running))
+            raise
+        finally:
+            # On cancellation or a failed node, stop every outstanding LLM call
+            # and wait for them to unwind before the run is reported finished
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
         
         return node_outputs
     
     @staticmethod
-    async def _process_llm_node(
+    async def _run_llm_node(
         node: PipelineNode,
-        edges: List[PipelineEdge],
-        nodes_dict: Dict[str, PipelineNode],
-        node_outputs: Dict[str, str]
+        plan: PipelinePlan,
+        node_outputs: Dict[str, str],
+        slot_key: tuple,
+        budget: RunTokenBudget
     ) -> str:
+        """Run an LLM node once the node limiter admits it, recording its latency."""
+        async with node_limiter.slot(slot_key):
+            started = time.monotonic()
+            result = await PipelineController._process_llm_node(node, plan, node_outputs, budget)
+            latency_tracker.observe(node.type, time.monotonic() - started)
+            return result
+    
+    @staticmethod
+    def _build_llm_prompt(
+        node: PipelineNode,
+        plan: PipelinePlan,
+        node_outputs: Dict[str, str]
+    ) -> Tuple[str, List[str]]:
         """
-        Process a single LLM node.
+        Build an LLM node's instructions and prompt parts from its inputs.
         
         Args:
-            node: The LLM node to process
-            edges: List of pipeline edges
-            nodes_dict: Dict of all nodes by ID
+            node: The LLM node
+            plan: Compiled pipeline plan
             node_outputs: Current node outputs
             
         Returns:
-            LLM response string
+            Tuple of the instructions and the prompt parts
         """
-        # Get all input values connected to this LLM node
-        input_nodes = get_connected_inputs(node.id, edges, nodes_dict)
-        input_texts = []
+        nodes_dict = plan.nodes_dict
         
-        for input_node in input_nodes:
+        # Get all input values connected to this LLM node, newline separated.
+        # The values are referenced, not concatenated: complete_llm joins the
+        # prompt parts once, so large inputs are copied a single time.
+        input_parts: List[str] = []
+        
+        for input_node in plan.inputs[node.id]:
             if input_node.id in node_outputs:
-                input_texts.append(node_outputs[input_node.id])
+                text = node_outputs[input_node.id]
             elif input_node.data and input_node.data.text:
-                input_texts.append(input_node.data.text)
-        
-        # Combine all inputs from connected nodes
-        combined_input = "\n".join(input_texts) if input_texts else ""
+                text = input_node.data.text
+            else:
+                continue
+            if input_parts:
+                input_parts.append("\n")
+            input_parts.append(text)
         
         # Get LLM instructions and prompt
         instructions = PipelineController.DEFAULT_INSTRUCTIONS
@@ -138,64 +391,458 @@ Strict requirements:
         if prompt_template and prompt_template != "Enter Query/Prompt":
             # Check if prompt contains variables - if so, use it directly
             if "{{" not in (node.data.Prompt or ""):
-                final_prompt = f"{prompt_template}\n\nInput: {combined_input}"
+                prompt_parts = [prompt_template, "\n\nInput: ", *input_parts]
             else:
                 # Variables were interpolated, use the prompt as is
-                final_prompt = prompt_template
+                prompt_parts = [prompt_template]
         else:
-            final_prompt = combined_input
-
-        # Execute the LLM
-        return await execute_llm(final_prompt, instructions)
+            prompt_parts = input_parts
+        
+        return instructions, prompt_parts
     
     @staticmethod
-    async def parse_pipeline(pipeline_data: PipelineCreate) -> PipelineParseResponse:
+    async def _process_llm_node(
+        node: PipelineNode,
+        plan: PipelinePlan,
+        node_outputs: Dict[str, str],
+        budget: RunTokenBudget
+    ) -> str:
+        """
+        Process a single LLM node.
+        
+        Args:
+            node: The LLM node to process
+            plan: Compiled pipeline plan
+            node_outputs: Current node outputs
+            budget: Token budget of the run
+            
+        Returns:
+            LLM response string
+        """
+        instructions, prompt_parts = PipelineController._build_llm_prompt(node, plan, node_outputs)
+        
+        async def summarize(text: str, summary_instructions: str):
+            return await complete_llm(text, summary_instructions, node.type, TOKEN_SUMMARY_MODEL or node.data.model)
+        
+        # Cut or summarize the prompt into the node's token budget (or fail)
+        prompt_parts = await budget.fit(
+            node.id, instructions, prompt_parts, summarize,
+            node.data.maxPromptTokens, node.data.budgetPolicy
+        )
+        
+        # Execute the LLM on the backend routed for this node type
+        if LLM_RESULT_CACHE_TTL > 0:
+            result, cached = await PipelineController._complete_cached(node, instructions, prompt_parts)
+        else:
+            result, cached = await complete_llm(prompt_parts, instructions, node.type, node.data.model), False
+        budget.record(node.id, result, cached)
+        return result.text
+    
+    @staticmethod
+    async def _complete_cached(
+        node: PipelineNode,
+        instructions: str,
+        prompt_parts: List[str]
+    ) -> Tuple[LLMResult, bool]:
+        """
+        Complete an LLM prompt through the shared LLM result cache.
+        
+        Identical requests (node type, model, instructions and prompt) are
+        sent to the backend once per LLM_RESULT_CACHE_TTL across all workers
+        sharing the cache; concurrent duplicates wait for the first one.
+        
+        Returns:
+            Tuple of the completion and whether it came from the cache
+        """
+        built = False
+        
+        async def build() -> bytes:
+            nonlocal built
+            built = True
+            result = await complete_llm(prompt_parts, instructions, node.type, node.data.model)
+            return json.dumps(dataclasses.asdict(result)).encode()
+        
+        value = await shared_cache.aget_or_set(
+            "llm", (node.type, node.data.model, instructions, *prompt_parts), build, LLM_RESULT_CACHE_TTL
+        )
+        return LLMResult(**json.loads(value)), not built
+    
+    @staticmethod
+    async def parse_pipeline(
+        pipeline_data: PipelineCreate,
+        priority: str = DEFAULT_PRIORITY,
+        run_id: Optional[str] = None
+    ) -> PipelineParseResponse:
         """
         Parse and execute a pipeline.
         
         Args:
             pipeline_data: Pipeline creation data with nodes and edges
+            priority: Priority class of the run ("interactive" or "batch")
+            run_id: If given, the result is stored under this id
             
         Returns:
             PipelineParseResponse with execution results
         """
-        nodes = pipeline_data.nodes
-        edges = pipeline_data.edges
-        
-        # Check if the pipeline forms a valid DAG
-        pipeline_is_dag = is_dag(nodes, edges)
+        # Check if the pipeline forms a valid DAG and plan its execution
+        plan = await PipelineController.compile_plan_async(pipeline_data.nodes, pipeline_data.edges)
+        return await PipelineController.parse_plan(plan, priority, run_id)
+    
+    @staticmethod
+    async def parse_plan(
+        plan: PipelinePlan,
+        priority: str = DEFAULT_PRIORITY,
+        run_id: Optional[str] = None
+    ) -> PipelineParseResponse:
+        """
+        Execute a compiled plan and build the parse response.
         
+        Args:
+            plan: Compiled pipeline plan
+            priority: Priority class of the run ("interactive" or "batch")
+            run_id: If given, the result is stored under this id
+            
+        Returns:
+            PipelineParseResponse with execution results
+        """
+        node_outputs: Dict[str, str] = {}
         response = PipelineParseResponse(
-            num_nodes=len(nodes),
-            num_edges=len(edges),
-            is_dag=pipeline_is_dag
+            run_id=run_id,
+            num_nodes=plan.num_nodes,
+            num_edges=plan.num_edges,
+            is_dag=plan.is_dag
         )
 
-        if not pipeline_is_dag:
+        if not plan.is_dag:
             response.error = "Pipeline contains a cycle and is not a valid DAG"
-            return response
         
         # Execute the pipeline if we have nodes
-        if nodes:
+        elif plan.nodes:
+            budget = RunTokenBudget()
             try:
                 # Get all node outputs
-                node_outputs = await PipelineController.execute_pipeline(nodes, edges)
-                
-                # Find all output nodes and create the outputs list
-                output_nodes = find_nodes_by_type(nodes, PipelineController.OUTPUT_TYPES)
-                
-                # Build outputs list: [{output_node_id: result}, ...]
-                outputs_list = []
-                for output_node in output_nodes:
-                    output_id = output_node.id
-                    result = node_outputs.get(output_id, "No output generated")
-                    outputs_list.append({output_id: result})
-                
-                response.outputs = outputs_list
+                node_outputs = await PipelineController.execute_plan(plan, priority=priority, budget=budget)
+                response.outputs = PipelineController._collect_outputs(plan, node_outputs)
                         
             except HTTPException as e:
                 response.error = e.detail
             except Exception as e:
                 response.error = f"Pipeline execution error: {str(e)}"
+            response.usage = budget.report()
         
+        if run_id:
+            PipelineController._record_run(
+                run_id, plan, response.outputs, node_outputs, response.error
+            )
         return response
+    
+    @staticmethod
+    def _record_run(
+        run_id: str,
+        plan: PipelinePlan,
+        outputs: Optional[List[Dict[str, str]]],
+        node_outputs: Dict[str, str],
+        error: Optional[str]
+    ) -> None:
+        """Hand a finished run's result to the results store (written in the background)."""
+        input_ids = set(plan.input_node_ids)
+        run_results.record(
+            run_id,
+            "failed" if error else "completed",
+            plan.num_nodes,
+            plan.num_edges,
+            plan.is_dag,
+            outputs=outputs,
+            # Input values are the request itself; keep only what the run produced
+            node_outputs={
+                node_id: output
+                for node_id, output in node_outputs.items()
+                if node_id not in input_ids
+            },
+            error=error,
+        )
+    
+    @staticmethod
+    def cancelled_response(
+        run_id: str,
+        error: str,
+        num_nodes: int,
+        num_edges: int,
+        is_dag: bool = True
+    ) -> PipelineParseResponse:
+        """
+        Build (and store) the response of a run that was cancelled.
+        
+        Args:
+            run_id: Run identifier
+            error: Cancellation message
+            num_nodes: Number of nodes in the pipeline
+            num_edges: Number of edges in the pipeline
+            is_dag: Whether the pipeline is a valid DAG
+            
+        Returns:
+            PipelineParseResponse carrying the cancellation as its error
+        """
+        run_results.record(run_id, "cancelled", num_nodes, num_edges, is_dag, error=error)
+        return PipelineParseResponse(
+            run_id=run_id,
+            num_nodes=num_nodes,
+            num_edges=num_edges,
+            is_dag=is_dag,
+            error=error
+        )
+    
+    @staticmethod
+    def get_run(db: Session, run_id: str, include_nodes: bool = False) -> PipelineRunResponse:
+        """
+        Get the stored result of a finished run.
+        
+        Args:
+            db: Database session
+            run_id: Run identifier (the run_id of the parse response)
+            include_nodes: Include every executed node's output
+            
+        Returns:
+            PipelineRunResponse with the run's outputs
+            
+        Raises:
+            HTTPException: If no result is stored (unknown, still running or
+                expired) or if a database error occurs
+        """
+        try:
+            row = run_results.get(db, run_id)
+        except SQLAlchemyError as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Database error: {str(e)}"
+            )
+        if row is None:
+            if run_registry.get(run_id) is not None:
+                detail = f"Run '{run_id}' is still in progress"
+            else:
+                detail = f"No stored result for run '{run_id}'"
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=detail)
+        
+        result = PipelineRunResponse.model_validate(row)
+        if not include_nodes:
+            result.node_outputs = None
+        return result
+    
+    @staticmethod
+    def _version_response(stored: StoredPipeline) -> PipelineVersionResponse:
+        return PipelineVersionResponse(
+            pipeline_id=stored.pipeline_id,
+            version=stored.version,
+            num_nodes=stored.plan.num_nodes,
+            num_edges=stored.plan.num_edges,
+            is_dag=stored.plan.is_dag
+        )
+    
+    @staticmethod
+    async def create_draft(pipeline_data: PipelineCreate) -> PipelineVersionResponse:
+        """
+        Store a pipeline server-side so later edits can be sent as patches.
+        
+        Args:
+            pipeline_data: Pipeline creation data with nodes and edges
+            
+        Returns:
+            PipelineVersionResponse with the new pipeline id (version 1)
+        """
+        plan = await PipelineController.compile_plan_async(pipeline_data.nodes, pipeline_data.edges)
+        stored = await PipelineController._call_store(pipeline_store.create, plan)
+        return PipelineController._version_response(stored)
+    
+    @staticmethod
+    async def _call_store(fn: Callable[..., Any], *args: Any, size: int = 0) -> Any:
+        """
+        Call the pipeline store: in a worker thread if it may wait on the
+        shared cache, otherwise where graph_offload puts graphs of `size`
+        (never in a process, since the store lives in this one).
+        """
+        if shared_cache.shared:
+            return await asyncio.to_thread(fn, *args)
+        return await graph_offload.run(size, fn, *args, processes=False)
+    
+    @staticmethod
+    async def get_draft(pipeline_id: str) -> StoredPipeline:
+        """
+        Get a stored pipeline.
+        
+        Raises:
+            HTTPException: If the pipeline is not stored (unknown or evicted)
+        """
+        stored = await PipelineController._call_store(pipeline_store.get, pipeline_id)
+        if stored is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Pipeline '{pipeline_id}' not found"
+            )
+        return stored
+    
+    @staticmethod
+    def _to_operation(op: PipelinePatchOp) -> Callable[[PipelinePlan], Any]:
+        """Translate a patch op into an edit on a plan."""
+        if op.op == "add_node":
+            if op.node is None:
+                raise ValueError("add_node requires 'node'")
+            return lambda plan: plan.add_node(op.node)
+        if op.op == "add_edge":
+            if op.edge is None:
+                raise ValueError("add_edge requires 'edge'")
+            return lambda plan: plan.add_edge(op.edge)
+        
+        if op.id is None:
+            raise ValueError(f"{op.op} requires 'id'")
+        if op.op == "remove_node":
+            return lambda plan: plan.remove_node(op.id)
+        if op.op == "remove_edge":
+            return lambda plan: plan.remove_edge(op.id)
+        if op.op == "update_node":
+            return lambda plan: plan.update_node(op.id, op.changes or {})
+        return lambda plan: plan.update_edge(op.id, op.changes or {})
+    
+    @staticmethod
+    async def patch_draft(pipeline_id: str, patch: PipelinePatch) -> PipelineVersionResponse:
+        """
+        Apply add/remove/update operations to a stored pipeline.
+        
+        Operations are applied in order to the stored plan incrementally; the
+        patch is all-or-nothing. Patches of large graphs are applied off the
+        event loop (see graph_offload), as graphs are compiled for create_draft.
+        
+        Args:
+            pipeline_id: Stored pipeline id
+            patch: Base version and operations
+            
+        Returns:
+            PipelineVersionResponse with the new version
+            
+        Raises:
+            HTTPException: 404 if not stored, 409 on a stale base version,
+                422 if an operation is invalid, 503 if another worker kept
+                the pipeline locked
+        """
+        try:
+            operations = [PipelineController._to_operation(op) for op in patch.ops]
+            # The patched graph is re-planned once as a whole
+            stored = await PipelineController._call_store(
+                pipeline_store.patch, pipeline_id, patch.base_version, operations,
+                size=pipeline_store.size(pipeline_id) + len(operations)
+            )
+        except VersionConflict as e:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+        except CacheLockTimeout:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Pipeline '{pipeline_id}' is being patched elsewhere, retry shortly"
+            )
+        except KeyError as e:
+            if await PipelineController._call_store(pipeline_store.get, pipeline_id) is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=e.args[0])
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=e.args[0])
+        except (ValueError, ValidationError) as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+        
+        return PipelineController._version_response(stored)
+    
+    @staticmethod
+    def _collect_outputs(plan: PipelinePlan, node_outputs: Dict[str, str]) -> List[Dict[str, str]]:
+        """Build the outputs list: [{output_node_id: result}, ...]"""
+        return [
+            {output_id: node_outputs.get(output_id, "No output generated")}
+            for output_id in plan.output_node_ids
+        ]
+    
+    @staticmethod
+    async def _run_batch_row(
+        plan: PipelinePlan,
+        index: int,
+        row: Union[PipelineBatchRow, Dict[str, Any], bytes],
+        priority: str,
+        batch_id: Optional[str] = None
+    ) -> PipelineBatchResult:
+        """Execute one batch row, turning failures into a per-row error."""
+        result = PipelineBatchResult(index=index)
+        node_outputs: Dict[str, str] = {}
+        budget = RunTokenBudget()
+        try:
+            if isinstance(row, bytes):
+                row = PipelineBatchRow.model_validate_json(row)
+            elif not isinstance(row, PipelineBatchRow):
+                row = PipelineBatchRow.model_validate(row)
+            result.id = row.id
+            
+            unknown = [node_id for node_id in row.inputs if node_id not in plan.input_node_ids]
+            if unknown:
+                result.error = f"Unknown input node(s): {', '.join(unknown)}"
+            else:
+                node_outputs = await PipelineController.execute_plan(plan, row.inputs, priority, budget)
+                result.outputs = PipelineController._collect_outputs(plan, node_outputs)
+        except ValidationError as e:
+            result.error = f"Invalid batch row: {str(e)}"
+        except HTTPException as e:
+            result.error = e.detail
+        except Exception as e:
+            result.error = f"Pipeline execution error: {str(e)}"
+        result.usage = budget.report()
+        
+        if batch_id:
+            result.run_id = f"{batch_id}-{index}"
+            PipelineController._record_run(
+                result.run_id, plan, result.outputs, node_outputs, result.error
+            )
+        return result
+    
+    @staticmethod
+    async def run_batch(
+        plan: PipelinePlan,
+        rows: AsyncIterable[Union[PipelineBatchRow, Dict[str, Any], bytes]],
+        concurrency: Optional[int] = None,
+        priority: str = "batch",
+        batch_id: Optional[str] = None
+    ) -> AsyncIterator[PipelineBatchResult]:
+        """
+        Run a planned pipeline over a stream of input rows.
+        
+        At most `concurrency` rows are in flight and no further rows are read
+        from the input until a slot frees up, so memory stays flat for
+        arbitrarily long inputs. Results are yielded as rows complete, which
+        may differ from input order (see PipelineBatchResult.index).
+        
+        Args:
+            plan: Compiled pipeline plan (must be a DAG)
+            rows: Async iterable of rows, raw row dicts or NDJSON row lines
+            concurrency: Rows executed at once (capped by BATCH_MAX_CONCURRENCY)
+            priority: Priority class for the rows' node slots (default "batch")
+            batch_id: If given, each row's result is stored as run "{batch_id}-{index}"
+            
+        Yields:
+            PipelineBatchResult per row
+        """
+        limit = max(1, min(concurrency or BATCH_DEFAULT_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+        pending = set()
+        index = 0
+        
+        try:
+            async for row in rows:
+                pending.add(asyncio.create_task(
+                    PipelineController._run_batch_row(plan, index, row, priority, batch_id)
+                ))
+                index += 1
+                
+                if len(pending) >= limit:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+            
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            # Client went away or the input stream failed - drop unfinished rows
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
@@ -1,26 +1,48 @@
 # Main FastAPI application
 
-import os
 from contextlib import asynccontextmanager
-from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-# Load environment variables from .env file
-load_dotenv()
-
+from src.config.settings import get_bool
 from src.api import router
 from src.config.database import init_db
+from src.middleware import BodyLimitMiddleware, CompressionMiddleware, ProfilingMiddleware
+from src.utils.llm_providers import llm_registry
+from src.utils.loop_monitor import loop_monitor
+from src.utils.offload import shutdown_executors
+from src.utils.pipeline_ingest import warn_if_parsed_whole
+from src.utils.run_results import run_results
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan handler for startup and shutdown events."""
-    # Startup: Initialize database tables
-    init_db()
+    # Startup: schema creation is an explicit step (`python -m src.cli init-db`);
+    # opt back in for local development only.
+    if get_bool("DB_INIT_ON_STARTUP"):
+        init_db()
+
+    # Startup: open each LLM backend's connection pool on this worker's event loop
+    await llm_registry.startup()
+
+    # Startup: report handlers that block the event loop past LOOP_LAG_BUDGET_MS
+    if get_bool("LOOP_LAG_MONITOR", True):
+        await loop_monitor.start()
+
+    # Startup: write run results to the database in the background
+    await run_results.start()
+
+    # Startup: flag the whole-body fallback for large pipeline uploads
+    warn_if_parsed_whole()
     
     yield
-    # Shutdown: Cleanup if needed
+    # Shutdown: write buffered run results, close pooled LLM connections and
+    # stop background helpers
+    await run_results.stop()
+    await llm_registry.aclose()
+    await loop_monitor.stop()
+    shutdown_executors()
 
 
 # Create FastAPI application
@@ -31,6 +53,10 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Early 413 for oversized bodies and a worker-wide body memory budget
+# (added before CORS, so its 413/503 responses carry CORS headers)
+app.add_middleware(BodyLimitMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -40,6 +66,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Negotiated gzip/brotli compression for large JSON responses
+app.add_middleware(CompressionMiddleware)
+
+# Opt-in, admin-gated request profiling (outermost, so it covers compression too)
+app.add_middleware(ProfilingMiddleware)
+
 # Include API router
 app.include_router(router)
 
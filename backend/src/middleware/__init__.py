@@ -0,0 +1,6 @@
+# Middleware package
+from .body_limit import BodyLimitMiddleware
+from .compression import CompressionMiddleware
+from .profiling import ProfilingMiddleware
+
+__all__ = ["BodyLimitMiddleware", "CompressionMiddleware", "ProfilingMiddleware"]
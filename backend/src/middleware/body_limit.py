@@ -0,0 +1,113 @@
+# Body limit middleware - early 413s and a worker-wide request body budget
+
+from typing import Iterable
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.config.limits import MAX_REQUEST_BODY_BYTES
+from src.utils.payload_limits import BodyBudget, PayloadTooLarge, body_budget, check_content_length
+
+BODYLESS_METHODS = ("GET", "HEAD", "OPTIONS", "DELETE")
+
+# Endpoints that consume NDJSON line by line (each line is limited by the reader)
+STREAMING_PATHS = ("/api/v1/pipelines/batch",)
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+class BodyLimitMiddleware:
+    """
+    Reject oversized request bodies before they are buffered.
+
+    A declared Content-Length over the limit is rejected with 413 before any
+    of the body is read; chunked bodies are counted as they arrive and
+    rejected as soon as they cross it. Each request also reserves its body
+    size from the worker-wide body budget while the body is being read: a
+    declared length up front, an undeclared (chunked) body chunk by chunk
+    as it arrives. The reservation is released once the body has been read,
+    so a burst of large uploads waits instead of exhausting memory, while
+    long-running requests (an LLM run) do not hold budget they no longer
+    use, and body-less POSTs reserve nothing.
+    NDJSON streams sent to STREAMING_PATHS are exempt: they are read one
+    bounded line at a time.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_bytes: int = MAX_REQUEST_BODY_BYTES,
+        budget: BodyBudget = body_budget,
+        streaming_paths: Iterable[str] = STREAMING_PATHS,
+    ) -> None:
+        self.app = app
+        self.max_bytes = max_bytes
+        self.budget = budget
+        self.streaming_paths = tuple(streaming_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] in BODYLESS_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        if (
+            scope["path"].rstrip("/") in self.streaming_paths
+            and headers.get("content-type", "").startswith(NDJSON_MEDIA_TYPE)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            length = check_content_length(headers.get("content-length"), self.max_bytes)
+            reserved = await self.budget.acquire(length) if length else 0
+        except HTTPException as e:
+            await self._error(e, scope, receive, send)
+            return
+
+        received = 0
+        response_started = False
+
+        async def release() -> None:
+            nonlocal reserved
+            if reserved:
+                size, reserved = reserved, 0
+                await self.budget.release(size)
+
+        async def receive_wrapper() -> Message:
+            nonlocal received, reserved
+            message = await receive()
+            if message["type"] == "http.request":
+                size = len(message.get("body", b""))
+                received += size
+                if received > self.max_bytes:
+                    raise PayloadTooLarge(self.max_bytes)
+                if length is None and size:
+                    reserved += await self.budget.acquire(size)
+                if not message.get("more_body", False):
+                    await release()
+            elif message["type"] == "http.disconnect":
+                await release()
+            return message
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        except PayloadTooLarge as e:
+            # Normally turned into a 413 by the app's exception handling
+            if response_started:
+                raise
+            await self._error(e, scope, receive, send)
+        finally:
+            await release()
+
+    @staticmethod
+    async def _error(error: HTTPException, scope: Scope, receive: Receive, send: Send) -> None:
+        response = JSONResponse({"detail": error.detail}, status_code=error.status_code, headers=error.headers)
+        await response(scope, receive, send)
@@ -0,0 +1,103 @@
+# Profiling middleware - opt-in sampling profiles of individual requests
+
+import random
+from typing import Optional
+from urllib.parse import parse_qs
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.config.settings import get_float
+from src.utils.admin_auth import ADMIN_TOKEN_HEADER, is_admin_token
+from src.utils.profiler import SamplingProfiler, profiler
+
+# Fraction of requests profiled without being asked (0 = only on request)
+PROFILING_SAMPLE_RATE = get_float("PROFILING_SAMPLE_RATE", 0.0)
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_QUERY_PARAM = "profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+TRUE_VALUES = ("1", "true", "yes", "on")
+
+
+class ProfilingMiddleware:
+    """
+    Profile a request when an admin asks for it or when it is sampled.
+
+    A request is profiled on demand when it carries `X-Profile: 1` (or
+    `?profile=1`) together with a valid `X-Admin-Token`. Without a valid
+    token the flag is ignored. A PROFILING_SAMPLE_RATE fraction of all
+    requests is also profiled. Profiled responses carry an X-Profile-Id
+    header; the profile is fetched from `/admin/profiles/{id}`. It covers
+    the whole response, including streamed bodies.
+
+    The sampler sees every thread of the worker, so a request is only
+    profiled while no other request is in flight: an on-demand profile is
+    refused with 409 and a sampled one is skipped. Requests that start
+    while a profile is running are counted in its overlapping_requests.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        sample_rate: float = PROFILING_SAMPLE_RATE,
+        sampler: SamplingProfiler = profiler,
+    ) -> None:
+        self.app = app
+        self.sample_rate = sample_rate
+        self.sampler = sampler
+        # HTTP requests in flight on this worker (only touched on the event loop)
+        self.in_flight = 0
+
+    def _profile_mode(self, scope: Scope) -> Optional[str]:
+        """"requested" (admin asked for it), "sampled" or None."""
+        headers = Headers(scope=scope)
+        flag = headers.get(PROFILE_HEADER)
+        if flag is None:
+            query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+            flag = (query.get(PROFILE_QUERY_PARAM) or [None])[0]
+        if flag is not None and flag.lower() in TRUE_VALUES:
+            return "requested" if is_admin_token(headers.get(ADMIN_TOKEN_HEADER)) else None
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        mode = self._profile_mode(scope)
+        if mode == "requested" and self.in_flight:
+            response = JSONResponse(
+                {"detail": "Another request is in flight on this worker; retry the profile when it is idle"},
+                status_code=status.HTTP_409_CONFLICT
+            )
+            await response(scope, receive, send)
+            return
+
+        self.in_flight += 1
+        try:
+            if mode is None or self.in_flight > 1:
+                self.sampler.note_request()
+                await self.app(scope, receive, send)
+            else:
+                await self._profile(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+    async def _profile(self, scope: Scope, receive: Receive, send: Send) -> None:
+        session = self.sampler.start(scope["method"], scope["path"])
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[PROFILE_ID_HEADER] = session.profile_id
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.sampler.stop(session)
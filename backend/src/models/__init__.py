@@ -1,4 +1,5 @@
 # Models package
 from .node import Node
+from .pipeline_run import PipelineRun
 
-__all__ = ["Node"]
+__all__ = ["Node", "PipelineRun"]
@@ -4,9 +4,18 @@ import uuid
 from datetime import datetime
 from typing import Optional, List, Any
 from sqlmodel import SQLModel, Field
-from sqlalchemy import Column, Text
+from sqlalchemy import Column, Index, Text, text
 from sqlalchemy.dialects.postgresql import JSONB
 
+# Weighted full-text document of a node: title/label/type rank above
+# description/tab, which rank above string values inside fields/handles.
+# Search queries must use this exact expression to hit the GIN index.
+NODE_SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(label, '') || ' ' || coalesce(type, '')), 'A')"
+    " || setweight(to_tsvector('simple', coalesce(description, '') || ' ' || coalesce(tab, '')), 'B')"
+    " || setweight(jsonb_to_tsvector('simple', fields || handles, '[\"string\"]'), 'C')"
+)
+
 
 class Node(SQLModel, table=True):
     """
@@ -15,6 +24,17 @@ class Node(SQLModel, table=True):
     Represents a node definition with its metadata, fields, and handles.
     """
     __tablename__ = "nodes"
+    __table_args__ = (
+        # Substring / fuzzy matching on titles and labels (needs pg_trgm)
+        Index("ix_nodes_title_trgm", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+        Index("ix_nodes_label_trgm", "label", postgresql_using="gin", postgresql_ops={"label": "gin_trgm_ops"}),
+        # Ranked full-text search over all text columns and fields/handles
+        Index("ix_nodes_search_vector", text(f"({NODE_SEARCH_VECTOR})"), postgresql_using="gin"),
+        # Containment filters such as handles @> '[{"type": "target"}]'
+        Index("ix_nodes_fields_gin", "fields", postgresql_using="gin", postgresql_ops={"fields": "jsonb_path_ops"}),
+        Index("ix_nodes_handles_gin", "handles", postgresql_using="gin", postgresql_ops={"handles": "jsonb_path_ops"}),
+        Index("ix_nodes_tab", "tab"),
+    )
 
     id: uuid.UUID = Field(
         default_factory=uuid.uuid4,
@@ -0,0 +1,64 @@
+# Pipeline run model definition
+
+from datetime import datetime
+from typing import Optional, List, Dict, Any
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, Text
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+class PipelineRun(SQLModel, table=True):
+    """
+    Pipeline run result table model.
+    
+    Stores the outputs of a pipeline run so clients can fetch them by run id
+    without re-executing the pipeline. Rows expire after a TTL.
+    """
+    __tablename__ = "pipeline_runs"
+
+    run_id: str = Field(
+        primary_key=True,
+        description="Run identifier (the X-Run-Id of the run)"
+    )
+    status: str = Field(
+        nullable=False,
+        description="completed, failed or cancelled"
+    )
+    num_nodes: int = Field(
+        default=0,
+        nullable=False,
+        description="Number of nodes in the pipeline"
+    )
+    num_edges: int = Field(
+        default=0,
+        nullable=False,
+        description="Number of edges in the pipeline"
+    )
+    is_dag: bool = Field(
+        default=True,
+        nullable=False,
+        description="Whether the pipeline is a valid DAG"
+    )
+    outputs: Optional[List[Dict[str, str]]] = Field(
+        default=None,
+        sa_column=Column(JSONB),
+        description="Final outputs as a list of {output_node_id: result}"
+    )
+    node_outputs: Optional[Dict[str, Any]] = Field(
+        default=None,
+        sa_column=Column(JSONB),
+        description="Output of every executed (non-input) node"
+    )
+    error: Optional[str] = Field(
+        default=None,
+        sa_column=Column(Text),
+        description="Error message if the run failed or was cancelled"
+    )
+    created_at: datetime = Field(
+        default_factory=datetime.utcnow,
+        description="Timestamp when the run finished"
+    )
+    expires_at: datetime = Field(
+        index=True,
+        description="Timestamp after which the result is deleted"
+    )
@@ -1,5 +1,6 @@
 # Routes package
 from .node_routes import router as node_router
 from .pipeline_routes import router as pipeline_router
+from .admin_routes import router as admin_router
 
-__all__ = ["node_router", "pipeline_router"]
+__all__ = ["node_router", "pipeline_router", "admin_router"]
@@ -0,0 +1,64 @@
+# Admin API Routes
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from src.utils.admin_auth import require_admin
+from src.utils.loop_monitor import loop_monitor
+from src.utils.offload import body_offload, graph_offload
+from src.utils.profiler import profiler
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get(
+    "/profiles",
+    summary="List request profiles",
+    description="List the most recent request profiles, newest first."
+)
+def list_profiles():
+    """
+    List captured profiles. Requires the X-Admin-Token header.
+    """
+    return profiler.list()
+
+
+@router.get(
+    "/profiles/{profile_id}",
+    response_class=PlainTextResponse,
+    summary="Get a request profile",
+    description="Get a profile as folded stacks for flamegraph.pl or speedscope."
+)
+def get_profile(profile_id: str):
+    """
+    Get a profile in folded stack format (`frame;frame;frame count` per line).
+    
+    Render it with `flamegraph.pl profile.folded > profile.svg` or open it
+    in https://www.speedscope.app. Requires the X-Admin-Token header.
+    """
+    session = profiler.get(profile_id)
+    if session is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Profile '{profile_id}' not found"
+        )
+    return PlainTextResponse(
+        session.folded(),
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.folded"'}
+    )
+
+
+@router.get(
+    "/loop",
+    summary="Get event loop health",
+    description="Event loop lag, recent stalls with the code that caused them, and offload counts."
+)
+def get_loop_stats():
+    """
+    Get event loop lag statistics. Each recent stall includes the innermost
+    frames of the code that was blocking the loop. Requires the X-Admin-Token header.
+    """
+    return {
+        **loop_monitor.as_dict(),
+        "offload": {"graph": graph_offload.as_dict(), "body": body_offload.as_dict()},
+    }
@@ -1,12 +1,13 @@
 # Node API Routes
 
-from typing import List
-from fastapi import APIRouter, Depends, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Query, Request, Response, status
 from sqlmodel import Session
 
 from src.config import get_db
 from src.controllers import NodeController
-from src.schemas.node import NodeCreate, NodeResponse
+from src.schemas.node import NodeCreate, NodeResponse, NodeSearchResponse
+from src.utils.compression import choose_encoding
 
 router = APIRouter(prefix="/nodes", tags=["nodes"])
 
@@ -14,6 +15,7 @@ router = APIRouter(prefix="/nodes", tags=["nodes"])
 @router.post(
     "/",
     response_model=NodeResponse,
+    response_model_exclude_none=True,
     status_code=status.HTTP_201_CREATED,
     summary="Create a new node",
     description="Create a new node definition with the provided data."
@@ -40,16 +42,53 @@ def create_node(node_data: NodeCreate, db: Session = Depends(get_db)):
     summary="Get all nodes",
     description="Retrieve all node definitions from the database."
 )
-def get_all_nodes(db: Session = Depends(get_db)):
+def get_all_nodes(request: Request, db: Session = Depends(get_db)):
     """
     Get all nodes. Returns a list of all node definitions ordered by creation date.
+    
+    The body is served precompressed from the catalog cache and supports
+    conditional requests via ETag / If-None-Match.
+    """
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    body, etag = NodeController.get_catalog_body(db, encoding)
+
+    headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get(
+    "/search",
+    response_model=NodeSearchResponse,
+    response_model_exclude_none=True,
+    summary="Search nodes",
+    description="Search node definitions by text, ranked by relevance and paginated."
+)
+def search_nodes(
+    q: str = Query(default="", max_length=200, description="Search text"),
+    tab: Optional[str] = Query(default=None, description="Only nodes in this tab"),
+    field_type: Optional[str] = Query(default=None, description="Only nodes with a field of this type"),
+    handle_type: Optional[str] = Query(default=None, description="Only nodes with a handle of this type"),
+    limit: int = Query(default=20, ge=1, le=100),
+    offset: int = Query(default=0, ge=0),
+    db: Session = Depends(get_db)
+):
+    """
+    Search nodes by title, label, type, description, tab and the contents of
+    their fields and handles. Words match by prefix; titles and labels also
+    match substrings and close spellings.
     """
-    return NodeController.get_all_nodes(db)
+    return NodeController.search_nodes(db, q, tab, field_type, handle_type, limit, offset)
 
 
 @router.get(
     "/{node_type}",
     response_model=NodeResponse,
+    response_model_exclude_none=True,
     summary="Get node by type",
     description="Retrieve a specific node definition by its type."
 )
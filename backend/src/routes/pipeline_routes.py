@@ -1,17 +1,59 @@
 # Pipeline API Routes
 
-from fastapi import APIRouter, Depends
+import json
+import logging
+import uuid
+from typing import Callable, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 from sqlmodel import Session
 
-from src.config import get_db
+from src.config import get_db, get_session_factory
 from src.controllers import PipelineController
-from src.schemas import PipelineCreate, PipelineParseResponse
+from src.schemas import (
+    PipelineCreate,
+    PipelineParseResponse,
+    PipelineBatchRequest,
+    PipelineBatchResult,
+    PipelineRunResponse,
+    PipelinePatch,
+    PipelineVersionResponse,
+    PipelineDraftResponse,
+)
+from src.utils.admin_auth import is_admin_token, require_admin
+from src.utils.ndjson import iter_ndjson_lines, ndjson_line
+from src.utils.offload import body_offload
+from src.utils.payload_limits import PayloadTooLarge, body_budget, read_limited
+from src.utils.pipeline_ingest import PIPELINE_BODY_OPENAPI, body_errors, read_pipeline
+from src.utils.run_registry import RunCancelled, run_registry
+from src.utils.run_results import run_results
+from src.utils.shared_cache import shared_cache
+from src.utils.scheduler import DEFAULT_PRIORITY, latency_tracker, node_limiter, request_priority
+from src.utils.token_budget import token_estimator
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/pipelines", tags=["pipelines"])
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def run_priority(default: str):
+    """Dependency resolving a run's X-Priority against the endpoint's default."""
+    def dependency(
+        x_priority: Optional[str] = Header(default=None),
+        x_admin_token: Optional[str] = Header(default=None)
+    ) -> str:
+        return request_priority(x_priority, default, is_admin_token(x_admin_token))
+    return dependency
+
 
 @router.post(
     "/",
+    response_model=PipelineCreate,
+    response_model_exclude_none=True,
     summary="Create a new pipeline",
     description="Create a new pipeline configuration."
 )
@@ -22,17 +64,25 @@ def create_pipeline(pipeline_data: PipelineCreate, db: Session = Depends(get_db)
     - **nodes**: List of pipeline nodes
     - **edges**: List of connections between nodes
     """
-    print(pipeline_data, "pipeline_data")
+    logger.debug("Pipeline received: %d nodes, %d edges", len(pipeline_data.nodes), len(pipeline_data.edges))
     return pipeline_data
 
 
 @router.post(
     "/parse",
     response_model=PipelineParseResponse,
+    response_model_exclude_none=True,
     summary="Parse and execute a pipeline",
-    description="Parse the pipeline structure and execute it through LLM nodes."
+    description="Parse the pipeline structure and execute it through LLM nodes.",
+    openapi_extra=PIPELINE_BODY_OPENAPI
 )
-async def parse_pipeline(pipeline_data: PipelineCreate, db: Session = Depends(get_db)):
+async def parse_pipeline(
+    request: Request,
+    response: Response,
+    priority: str = Depends(run_priority(DEFAULT_PRIORITY)),
+    pipeline_data: PipelineCreate = Depends(read_pipeline),
+    open_db: Callable[[], Session] = Depends(get_session_factory)
+):
     """
     Parse and execute a pipeline.
     
@@ -40,5 +90,302 @@ async def parse_pipeline(pipeline_data: PipelineCreate, db: Session = Depends(ge
     - Processes nodes in topological order
     - Executes LLM nodes with connected text inputs
     - Returns outputs as list of {output_node_id: result}
+    
+    The run is cancelled if the client disconnects. Every run gets a
+    server-generated `run_id`, returned in the body and the `X-Run-Id` header;
+    the result stays retrievable from `/pipelines/runs/{run_id}` for
+    RUN_RESULTS_TTL_SECONDS, and an admin can cancel the run while it is in
+    flight via `/pipelines/runs/{run_id}/cancel`.
+    
+    `X-Priority: batch` lets interactive runs take node slots first.
+    `X-Priority: interactive` on batch work needs an `X-Admin-Token`.
+    
+    Bodies over MAX_REQUEST_BODY_BYTES are rejected with 413; large bodies are
+    parsed incrementally when `ijson` is installed. Node types, field values and
+    edge handles are checked against the node catalog first; invalid wiring is
+    rejected with 422 before any node runs.
+    """
+    await PipelineController.validate_wiring(open_db, pipeline_data.nodes, pipeline_data.edges)
+    # Runs and results are keyed by an id clients cannot choose, so one client
+    # can neither collide with, cancel nor guess another's run
+    run_id = str(uuid.uuid4())
+    response.headers["X-Run-Id"] = run_id
+    try:
+        return await run_registry.execute(
+            run_id, PipelineController.parse_pipeline(pipeline_data, priority, run_id), request
+        )
+    except RunCancelled as e:
+        return PipelineController.cancelled_response(
+            run_id, str(e), len(pipeline_data.nodes), len(pipeline_data.edges)
+        )
+
+
+@router.post(
+    "/drafts",
+    response_model=PipelineVersionResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Store a pipeline for incremental edits",
+    description="Store the full pipeline server-side and return its id and version.",
+    openapi_extra=PIPELINE_BODY_OPENAPI
+)
+async def create_draft(
+    pipeline_data: PipelineCreate = Depends(read_pipeline),
+    open_db: Callable[[], Session] = Depends(get_session_factory)
+):
+    """
+    Store a pipeline. Later edits can be sent to `PATCH /pipelines/drafts/{id}`
+    instead of re-uploading the whole graph.
+    
+    The pipeline is checked against the node catalog (422 on invalid wiring).
+    """
+    await PipelineController.validate_wiring(open_db, pipeline_data.nodes, pipeline_data.edges)
+    return await PipelineController.create_draft(pipeline_data)
+
+
+@router.get(
+    "/drafts/{pipeline_id}",
+    response_model=PipelineDraftResponse,
+    response_model_exclude_none=True,
+    summary="Get a stored pipeline",
+    description="Retrieve a stored pipeline's current version and graph."
+)
+async def get_draft(pipeline_id: str):
+    """
+    Get a stored pipeline with its nodes and edges.
+    """
+    stored = await PipelineController.get_draft(pipeline_id)
+    return PipelineDraftResponse(
+        **PipelineController._version_response(stored).model_dump(),
+        nodes=stored.plan.nodes,
+        edges=stored.plan.edges
+    )
+
+
+@router.patch(
+    "/drafts/{pipeline_id}",
+    response_model=PipelineVersionResponse,
+    summary="Patch a stored pipeline",
+    description="Apply add/remove/update node and edge operations against a base version."
+)
+async def patch_draft(pipeline_id: str, patch: PipelinePatch):
+    """
+    Patch a stored pipeline.
+    
+    - **base_version**: Version the edits were made against (409 if stale)
+    - **ops**: `add_node` (node), `remove_node` (id), `update_node` (id, changes),
+      `add_edge` (edge), `remove_edge` (id), `update_edge` (id, changes)
+    """
+    return await PipelineController.patch_draft(pipeline_id, patch)
+
+
+@router.post(
+    "/drafts/{pipeline_id}/parse",
+    response_model=PipelineParseResponse,
+    response_model_exclude_none=True,
+    summary="Execute a stored pipeline",
+    description="Execute a stored pipeline using its cached plan."
+)
+async def parse_draft(
+    pipeline_id: str,
+    request: Request,
+    response: Response,
+    version: Optional[int] = None,
+    priority: str = Depends(run_priority(DEFAULT_PRIORITY)),
+    open_db: Callable[[], Session] = Depends(get_session_factory)
+):
+    """
+    Execute a stored pipeline without re-uploading or re-planning it.
+    
+    Pass `version` to make sure the expected version runs (409 otherwise).
+    Cancellation, priority and the catalog check work as for `/pipelines/parse`.
     """
-    return await PipelineController.parse_pipeline(pipeline_data)
+    stored = await PipelineController.get_draft(pipeline_id)
+    if version is not None and version != stored.version:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Pipeline '{pipeline_id}' is at version {stored.version}, not {version}"
+        )
+
+    plan = stored.plan
+    await PipelineController.validate_wiring(open_db, plan.nodes, plan.edges)
+    run_id = str(uuid.uuid4())
+    response.headers["X-Run-Id"] = run_id
+    try:
+        return await run_registry.execute(
+            run_id, PipelineController.parse_plan(plan, priority, run_id), request
+        )
+    except RunCancelled as e:
+        return PipelineController.cancelled_response(
+            run_id, str(e), plan.num_nodes, plan.num_edges, plan.is_dag
+        )
+
+
+@router.get(
+    "/runs/stats",
+    summary="Get run stats",
+    description="Cancelled runs, abandoned node work and scheduler state on this worker."
+)
+def get_run_stats():
+    """
+    Get counters for cancelled runs and the work they abandoned, node slot
+    usage, the per-node-type latency estimates used for scheduling, the
+    accuracy of local prompt token estimates per model and shared cache
+    hit/miss counters.
+    """
+    return {
+        **run_registry.stats.as_dict(),
+        "node_slots": node_limiter.as_dict(),
+        "body_budget": body_budget.as_dict(),
+        "latency_estimates": latency_tracker.as_dict(),
+        "token_estimates": token_estimator.as_dict(),
+        "run_results": run_results.as_dict(),
+        "shared_cache": shared_cache.as_dict(),
+    }
+
+
+@router.get(
+    "/runs/{run_id}",
+    response_model=PipelineRunResponse,
+    response_model_exclude_none=True,
+    summary="Get a run's result",
+    description="Retrieve the stored outputs of a finished pipeline run by its run id."
+)
+def get_run(run_id: str, include_nodes: bool = False, db: Session = Depends(get_db)):
+    """
+    Get the stored result of a run without re-executing the pipeline.
+    
+    - **run_id**: The `run_id` of the parse response; batch rows are stored
+      as `{batch_id}-{index}`
+    - **include_nodes**: Also return every executed node's output
+    
+    Results expire after RUN_RESULTS_TTL_SECONDS. 404 if the run is unknown,
+    expired or still in progress.
+    """
+    return PipelineController.get_run(db, run_id, include_nodes)
+
+
+@router.post(
+    "/runs/{run_id}/cancel",
+    summary="Cancel a pipeline run",
+    description="Cancel an in-flight pipeline run by its run id (requires X-Admin-Token).",
+    dependencies=[Depends(require_admin)]
+)
+async def cancel_run(run_id: str):
+    """
+    Cancel an in-flight run. Pending node tasks and LLM calls stop immediately.
+    
+    Clients cancel their own runs by disconnecting; this endpoint is for
+    operators stopping job-style runs.
+    """
+    if not run_registry.cancel(run_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No in-flight run with id '{run_id}'"
+        )
+    return {"message": f"Run '{run_id}' cancelled"}
+
+
+async def _iterate(items):
+    for item in items:
+        yield item
+
+
+@router.post(
+    "/batch",
+    response_class=StreamingResponse,
+    summary="Run a pipeline over many inputs",
+    description="Plan a pipeline once and stream one NDJSON result line per input row as rows complete.",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {
+                        "type": "object",
+                        "description": "PipelineBatchRequest: {\"pipeline\": {...}, \"rows\": [...], \"concurrency\": n}",
+                    }
+                },
+                NDJSON_MEDIA_TYPE: {
+                    "schema": {
+                        "type": "string",
+                        "description": (
+                            "First line: {\"pipeline\": {...}, \"concurrency\": n}; "
+                            "each following line: {\"id\": ..., \"inputs\": {input_node_id: text}}"
+                        ),
+                    }
+                },
+            },
+        },
+        "responses": {
+            "200": {
+                "description": "One PipelineBatchResult per line, in completion order",
+                "content": {NDJSON_MEDIA_TYPE: {"schema": PipelineBatchResult.model_json_schema()}},
+            }
+        },
+    },
+)
+async def run_batch(
+    request: Request,
+    priority: str = Depends(run_priority("batch")),
+    open_db: Callable[[], Session] = Depends(get_session_factory)
+):
+    """
+    Run one pipeline over many input rows.
+    
+    - Send `application/json` with a `PipelineBatchRequest`, or
+    - Stream `application/x-ndjson`: a header line with the pipeline followed by
+      one row per line; rows are read only as execution slots free up
+    - Each row overrides input node values by node id
+    - Results stream back as NDJSON with the row `index` and `id`
+    - Each row's result is stored as run `{batch_id}-{index}` (its `run_id`);
+      the batch id is generated server-side and returned in the `X-Run-Id`
+      response header
+    """
+    try:
+        if request.headers.get("content-type", "").startswith(NDJSON_MEDIA_TYPE):
+            lines = iter_ndjson_lines(request.stream())
+            try:
+                header = json.loads(await lines.__anext__())
+            except StopAsyncIteration:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty batch stream")
+            except json.JSONDecodeError as e:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid batch header: {e}")
+            if not isinstance(header, dict):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Invalid batch header: expected a JSON object"
+                )
+            pipeline = PipelineCreate.model_validate(header.get("pipeline", header))
+            concurrency = header.get("concurrency")
+            rows = lines
+        else:
+            body = await read_limited(request.stream())
+            batch = await body_offload.run(len(body), PipelineBatchRequest.model_validate_json, body)
+            del body
+            pipeline = batch.pipeline
+            concurrency = batch.concurrency
+            rows = _iterate(batch.rows)
+    except ValidationError as e:
+        raise RequestValidationError(body_errors(e))
+
+    await PipelineController.validate_wiring(open_db, pipeline.nodes, pipeline.edges)
+    plan = await PipelineController.compile_plan_async(pipeline.nodes, pipeline.edges)
+    if not plan.is_dag:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pipeline contains a cycle and is not a valid DAG"
+        )
+
+    batch_id = str(uuid.uuid4())
+
+    async def stream_results():
+        try:
+            async for result in PipelineController.run_batch(plan, rows, concurrency, priority, batch_id):
+                yield ndjson_line(result.model_dump(exclude_none=True))
+        except PayloadTooLarge as e:
+            # The response has started; report the rejected input as a last line
+            yield ndjson_line({"error": e.detail})
+
+    return StreamingResponse(
+        stream_results(), media_type=NDJSON_MEDIA_TYPE, headers={"X-Run-Id": batch_id}
+    )
@@ -1,5 +1,5 @@
 # Schemas package
-from .node import NodeCreate, NodeResponse
+from .node import NodeCreate, NodeResponse, NodeSearchResult, NodeSearchResponse
 from .pipeline import (
     Position,
     MarkerEnd,
@@ -7,17 +7,39 @@ from .pipeline import (
     PipelineNode,
     PipelineEdge,
     PipelineCreate,
+    LLMNodeUsage,
+    PipelineTokenUsage,
     PipelineParseResponse,
+    PipelineBatchRow,
+    PipelineBatchRequest,
+    PipelineBatchResult,
+    PipelineRunResponse,
+    PipelinePatchOp,
+    PipelinePatch,
+    PipelineVersionResponse,
+    PipelineDraftResponse,
 )
 
 __all__ = [
     "NodeCreate",
     "NodeResponse",
+    "NodeSearchResult",
+    "NodeSearchResponse",
     "Position",
     "MarkerEnd",
     "NodeData",
     "PipelineNode",
     "PipelineEdge",
     "PipelineCreate",
+    "LLMNodeUsage",
+    "PipelineTokenUsage",
     "PipelineParseResponse",
+    "PipelineBatchRow",
+    "PipelineBatchRequest",
+    "PipelineBatchResult",
+    "PipelineRunResponse",
+    "PipelinePatchOp",
+    "PipelinePatch",
+    "PipelineVersionResponse",
+    "PipelineDraftResponse",
 ]
@@ -3,7 +3,10 @@
 import uuid
 from datetime import datetime
 from typing import Optional, List, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
+
+# Types that would be shadowed by fixed paths under /nodes (GET /nodes/search)
+RESERVED_NODE_TYPES = ("search",)
 
 
 class NodeCreate(BaseModel):
@@ -17,6 +20,13 @@ class NodeCreate(BaseModel):
     fields: List[Any] = Field(default=[], description="JSON array of field definitions")
     handles: List[Any] = Field(default=[], description="JSON array of handle definitions")
 
+    @field_validator("type")
+    @classmethod
+    def check_type_not_reserved(cls, value: str) -> str:
+        if value in RESERVED_NODE_TYPES:
+            raise ValueError(f"'{value}' is reserved and cannot be used as a node type")
+        return value
+
     model_config = {
         "json_schema_extra": {
             "example": {
@@ -53,3 +63,17 @@ class NodeResponse(BaseModel):
     model_config = {
         "from_attributes": True
     }
+
+
+class NodeSearchResult(NodeResponse):
+    """A node matched by a catalog search, with its relevance score."""
+    rank: float = Field(..., description="Relevance score, higher is better")
+
+
+class NodeSearchResponse(BaseModel):
+    """Schema for a page of catalog search results."""
+    query: str = Field(..., description="The search text")
+    total: int = Field(..., description="Number of matching nodes across all pages")
+    limit: int = Field(..., description="Page size")
+    offset: int = Field(..., description="Number of results skipped")
+    results: List[NodeSearchResult] = Field(default=[], description="Matching nodes, best match first")
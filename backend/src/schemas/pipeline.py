@@ -1,7 +1,19 @@
 # Pipeline Pydantic schemas for API request/response
 
-from typing import Optional, List, Dict
-from pydantic import BaseModel
+from datetime import datetime
+from typing import Any, Optional, List, Dict, Literal
+from pydantic import BaseModel, Field
+from typing_extensions import Annotated
+
+from src.config.limits import (
+    PIPELINE_MAX_TEXT_CHARS,
+    PIPELINE_MAX_PROMPT_CHARS,
+    PIPELINE_MAX_NODES,
+    PIPELINE_MAX_EDGES,
+)
+
+# Text values that may hold whole documents
+LargeText = Annotated[str, Field(max_length=PIPELINE_MAX_TEXT_CHARS)]
 
 
 class Position(BaseModel):
@@ -22,12 +34,17 @@ class NodeData(BaseModel):
     id: str
     nodeType: str
     # Text node fields
-    text: Optional[str] = None
+    text: Optional[LargeText] = None
     # LLM node fields (gemini, openai, mistral, etc.)
-    Instructions: Optional[str] = None
-    Prompt: Optional[str] = None
+    Instructions: Optional[str] = Field(default=None, max_length=PIPELINE_MAX_PROMPT_CHARS)
+    Prompt: Optional[str] = Field(default=None, max_length=PIPELINE_MAX_PROMPT_CHARS)
+    # Optional model override: "model-name" or "backend:model-name"
+    model: Optional[str] = None
+    # Optional prompt token budget and over-budget policy for this LLM node
+    maxPromptTokens: Optional[int] = Field(default=None, ge=0)
+    budgetPolicy: Optional[Literal["truncate", "summarize", "fail"]] = None
     # Output node fields
-    output: Optional[str] = None
+    output: Optional[LargeText] = None
 
     class Config:
         extra = "allow"  # Allow additional fields
@@ -60,14 +77,103 @@ class PipelineEdge(BaseModel):
 
 class PipelineCreate(BaseModel):
     """Request body for pipeline operations."""
-    nodes: List[PipelineNode]
-    edges: List[PipelineEdge]
+    nodes: List[PipelineNode] = Field(..., max_length=PIPELINE_MAX_NODES)
+    edges: List[PipelineEdge] = Field(..., max_length=PIPELINE_MAX_EDGES)
+
+
+class LLMNodeUsage(BaseModel):
+    """Estimated and reported token usage of one LLM node."""
+    estimated_prompt_tokens: int  # Local estimate of the prompts sent (incl. summary calls)
+    prompt_tokens: Optional[int] = None  # As reported by the backend
+    completion_tokens: Optional[int] = None
+    model: Optional[str] = None
+    budget_action: Optional[Literal["truncated", "summarized"]] = None
+    estimated_before_budget: Optional[int] = None  # Estimate of the prompt before it was cut
+    summary_calls: int = 0
+    cached: bool = False  # Served from the LLM result cache, no tokens were spent
+
+
+class PipelineTokenUsage(BaseModel):
+    """Token usage of a pipeline run."""
+    estimated_prompt_tokens: int
+    prompt_tokens: int
+    completion_tokens: int
+    nodes: Dict[str, LLMNodeUsage]  # {llm_node_id: usage}
 
 
 class PipelineParseResponse(BaseModel):
     """Response from pipeline parsing."""
+    run_id: Optional[str] = None  # Fetch the stored result via /pipelines/runs/{run_id}
+    num_nodes: int
+    num_edges: int
+    is_dag: bool
+    outputs: Optional[List[Dict[str, str]]] = None  # List of {output_node_id: result}
+    usage: Optional[PipelineTokenUsage] = None
+    error: Optional[str] = None
+
+
+class PipelineBatchRow(BaseModel):
+    """One batch input: value overrides for the pipeline's input nodes."""
+    id: Optional[str] = None  # Caller's row identifier, echoed in the result
+    inputs: Dict[str, LargeText] = Field(default_factory=dict)  # {input_node_id: text}
+
+
+class PipelineBatchRequest(BaseModel):
+    """Request body for running one pipeline over many inputs."""
+    pipeline: PipelineCreate
+    rows: List[PipelineBatchRow]
+    concurrency: Optional[int] = None  # Rows executed at once (capped server-side)
+
+
+class PipelineBatchResult(BaseModel):
+    """One streamed batch result line, emitted as each row completes."""
+    index: int
+    id: Optional[str] = None
+    run_id: Optional[str] = None
+    outputs: Optional[List[Dict[str, str]]] = None
+    usage: Optional[PipelineTokenUsage] = None
+    error: Optional[str] = None
+
+
+class PipelineRunResponse(BaseModel):
+    """A stored pipeline run result."""
+    run_id: str
+    status: str  # completed, failed or cancelled
     num_nodes: int
     num_edges: int
     is_dag: bool
     outputs: Optional[List[Dict[str, str]]] = None  # List of {output_node_id: result}
+    node_outputs: Optional[Dict[str, str]] = None  # {node_id: output} of every executed node
     error: Optional[str] = None
+    created_at: datetime
+    expires_at: datetime
+
+
+class PipelinePatchOp(BaseModel):
+    """One edit to a stored pipeline."""
+    op: Literal["add_node", "remove_node", "update_node", "add_edge", "remove_edge", "update_edge"]
+    id: Optional[str] = None  # Node id / edge id for remove_* and update_*
+    node: Optional[PipelineNode] = None  # add_node
+    edge: Optional[PipelineEdge] = None  # add_edge
+    changes: Optional[Dict[str, Any]] = None  # update_*: fields to merge ("data" is merged into node.data)
+
+
+class PipelinePatch(BaseModel):
+    """Request body for patching a stored pipeline."""
+    base_version: int
+    ops: List[PipelinePatchOp]
+
+
+class PipelineVersionResponse(BaseModel):
+    """A stored pipeline's id and current version."""
+    pipeline_id: str
+    version: int
+    num_nodes: int
+    num_edges: int
+    is_dag: bool
+
+
+class PipelineDraftResponse(PipelineVersionResponse):
+    """A stored pipeline with its full graph."""
+    nodes: List[PipelineNode]
+    edges: List[PipelineEdge]
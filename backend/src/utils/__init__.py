@@ -7,7 +7,7 @@ from .graph_utils import (
     get_connected_inputs,
     interpolate_variables,
 )
-from .llm_utils import execute_llm
+from .llm_utils import complete_llm, execute_llm
 
 __all__ = [
     "build_adjacency_list",
@@ -16,5 +16,6 @@ __all__ = [
     "find_nodes_by_type",
     "get_connected_inputs",
     "interpolate_variables",
+    "complete_llm",
     "execute_llm",
 ]
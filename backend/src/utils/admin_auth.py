@@ -0,0 +1,26 @@
+# Admin authentication - shared-secret token for operational endpoints
+
+import hmac
+from typing import Optional
+from fastapi import Header, HTTPException, status
+
+from src.config.settings import get_env
+
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    """Check a token against ADMIN_TOKEN; always False when no token is configured."""
+    expected = get_env("ADMIN_TOKEN")
+    if not expected or not token:
+        return False
+    return hmac.compare_digest(token.encode(), expected.encode())
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    """Dependency that rejects requests without a valid X-Admin-Token header."""
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin token required"
+        )
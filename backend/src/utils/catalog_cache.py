@@ -0,0 +1,92 @@
+# Node catalog response cache - serialized and precompressed bodies
+
+import hashlib
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from src.config.settings import get_float
+from src.utils.compression import compress
+from src.utils.shared_cache import shared_cache
+
+# Safety net for multi-worker deployments where another worker changed the catalog
+CATALOG_CACHE_TTL = get_float("CATALOG_CACHE_TTL", 60.0)
+
+
+class CatalogCache:
+    """
+    Caches the serialized node catalog together with its compressed variants.
+
+    The JSON body is built once per catalog version and each content-coding
+    is compressed at most once, so repeated GET /nodes requests only pay for
+    a dict lookup. Writers call invalidate() after changing the catalog,
+    which also bumps `version` for other caches derived from the catalog.
+
+    With a shared cache backend, the body is built by one worker and read
+    by the others from the shared tier, and invalidate() bumps the shared
+    "catalog" namespace, so every worker drops its copy within
+    SHARED_CACHE_VERSION_INTERVAL instead of CATALOG_CACHE_TTL.
+    """
+
+    def __init__(self, ttl: float = CATALOG_CACHE_TTL) -> None:
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._bodies: Dict[str, bytes] = {}
+        self._etag: Optional[str] = None
+        self._built_at = 0.0
+        self._built_version: Optional[Tuple[int, int]] = None
+        self._version = 0
+
+    @property
+    def version(self) -> Tuple[int, int]:
+        """Changes whenever the catalog changed on this or (with a shared backend) another worker."""
+        return self._version, shared_cache.version("catalog")
+
+    def _is_fresh(self) -> bool:
+        return (
+            "identity" in self._bodies
+            and (time.monotonic() - self._built_at) < self.ttl
+            and self._built_version == self.version
+        )
+
+    def get(self, build: Callable[[], bytes], encoding: Optional[str] = None) -> Tuple[bytes, str]:
+        """
+        Return (body, etag) for the requested encoding, building it if needed.
+
+        Args:
+            build: Callable producing the uncompressed JSON body
+            encoding: Content-coding negotiated for the client, or None
+
+        Returns:
+            Tuple of the (possibly compressed) body and its ETag; each
+            content-coding gets its own (suffixed) ETag, since the bodies
+            differ byte for byte
+        """
+        key = encoding or "identity"
+        with self._lock:
+            if not self._is_fresh():
+                self._built_version = self.version
+                if shared_cache.shared:
+                    body = shared_cache.get_or_set("catalog", ("body",), build, self.ttl)
+                else:
+                    body = build()
+                self._bodies = {"identity": body}
+                self._etag = hashlib.sha1(body).hexdigest()
+                self._built_at = time.monotonic()
+
+            if key not in self._bodies:
+                self._bodies[key] = compress(self._bodies["identity"], key)
+
+            etag = self._etag if key == "identity" else f"{self._etag}-{key}"
+            return self._bodies[key], f'"{etag}"'
+
+    def invalidate(self) -> None:
+        """Drop all cached bodies so the next read rebuilds them."""
+        with self._lock:
+            self._bodies = {}
+            self._etag = None
+            self._version += 1
+        shared_cache.invalidate("catalog")
+
+
+catalog_cache = CatalogCache()
@@ -0,0 +1,66 @@
+# Response compression helpers (content negotiation and encoders)
+
+import gzip
+from typing import Dict, Optional
+
+try:  # Brotli is optional - gzip is always available
+    import brotli
+except ImportError:  # pragma: no cover - depends on the deployment image
+    brotli = None
+
+
+# Encodings in server preference order
+SUPPORTED_ENCODINGS = ["br", "gzip"] if brotli else ["gzip"]
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """Parse an Accept-Encoding header into a {coding: q-value} dict."""
+    codings: Dict[str, float] = {}
+    if not header:
+        return codings
+
+    for part in header.split(","):
+        item = part.strip()
+        if not item:
+            continue
+        coding, _, params = item.partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[coding.strip().lower()] = q
+    return codings
+
+
+def choose_encoding(header: Optional[str]) -> Optional[str]:
+    """
+    Pick the best supported content-coding for an Accept-Encoding header.
+
+    Returns None when the client accepts none of the supported codings,
+    in which case the response should be sent uncompressed.
+    """
+    codings = parse_accept_encoding(header)
+    wildcard = codings.get("*", 0.0)
+
+    best = None
+    best_q = 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        q = codings.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a response body with the given content-coding."""
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unsupported content-coding: {encoding}")
@@ -1,10 +1,14 @@
 # Graph utility functions for pipeline processing
 
 import re
+from collections import deque
 from typing import Dict, List
 
 from src.schemas import PipelineNode, PipelineEdge
 
+# Pattern to match {{node-id}} - captures the node ID inside
+VARIABLE_PATTERN = re.compile(r'\{\{([^}]+)\}\}')
+
 
 def build_adjacency_list(nodes: List[PipelineNode], edges: List[PipelineEdge]) -> Dict[str, List[str]]:
     """Build an adjacency list from nodes and edges."""
@@ -21,24 +25,27 @@ def is_dag(nodes: List[PipelineNode], edges: List[PipelineEdge]) -> bool:
     visited = set()
     rec_stack = set()
     
-    def has_cycle(node_id: str) -> bool:
-        visited.add(node_id)
-        rec_stack.add(node_id)
-        
-        for neighbor in adj.get(node_id, []):
-            if neighbor not in visited:
-                if has_cycle(neighbor):
-                    return True
-            elif neighbor in rec_stack:
-                return True
-        
-        rec_stack.remove(node_id)
-        return False
-    
+    # Iterative depth-first search, so long chains cannot hit the recursion limit
     for node in nodes:
-        if node.id not in visited:
-            if has_cycle(node.id):
-                return False
+        if node.id in visited:
+            continue
+        visited.add(node.id)
+        rec_stack.add(node.id)
+        stack = [(node.id, iter(adj.get(node.id, [])))]
+        
+        while stack:
+            node_id, neighbors = stack[-1]
+            for neighbor in neighbors:
+                if neighbor not in visited:
+                    visited.add(neighbor)
+                    rec_stack.add(neighbor)
+                    stack.append((neighbor, iter(adj.get(neighbor, []))))
+                    break
+                if neighbor in rec_stack:
+                    return False
+            else:
+                rec_stack.remove(node_id)
+                stack.pop()
     return True
 
 
@@ -51,11 +58,11 @@ def topological_sort(nodes: List[PipelineNode], edges: List[PipelineEdge]) -> Li
         if edge.target in in_degree:
             in_degree[edge.target] += 1
     
-    queue = [node_id for node_id, degree in in_degree.items() if degree == 0]
+    queue = deque(node_id for node_id, degree in in_degree.items() if degree == 0)
     result = []
     
     while queue:
-        node_id = queue.pop(0)
+        node_id = queue.popleft()
         result.append(node_id)
         
         for neighbor in adj.get(node_id, []):
@@ -68,7 +75,8 @@ def topological_sort(nodes: List[PipelineNode], edges: List[PipelineEdge]) -> Li
 
 def find_nodes_by_type(nodes: List[PipelineNode], node_types: List[str]) -> List[PipelineNode]:
     """Find all nodes matching the given types."""
-    return [node for node in nodes if node.type and node.type.lower() in [t.lower() for t in node_types]]
+    types = {t.lower() for t in node_types}
+    return [node for node in nodes if node.type and node.type.lower() in types]
 
 
 def get_connected_inputs(node_id: str, edges: List[PipelineEdge], nodes_dict: Dict[str, PipelineNode]) -> List[PipelineNode]:
@@ -94,12 +102,9 @@ def interpolate_variables(text: str, node_outputs: Dict[str, str], nodes_dict: D
     Returns:
         Text with all {{node-id}} placeholders replaced with actual values
     """
-    if not text:
+    if not text or "{{" not in text:
         return text
     
-    # Pattern to match {{node-id}} - captures the node ID inside
-    pattern = r'\{\{([^}]+)\}\}'
-    
     def replace_variable(match):
         node_id = match.group(1).strip()
         
@@ -120,4 +125,4 @@ def interpolate_variables(text: str, node_outputs: Dict[str, str], nodes_dict: D
         # If no value found, return the original placeholder
         return match.group(0)
     
-    return re.sub(pattern, replace_variable, text)
+    return VARIABLE_PATTERN.sub(replace_variable, text)
@@ -0,0 +1,141 @@
+# Managed LLM HTTP client - one pooled httpx transport per event loop
+
+import asyncio
+import importlib.util
+import logging
+import ssl
+from typing import Any, Optional, Set
+
+from src.config.settings import get_bool, get_float, get_int
+
+logger = logging.getLogger(__name__)
+
+MISTRAL_SERVER_URL = "https://api.mistral.ai"
+
+
+class LLMClientSettings:
+    """Transport tuning for the LLM HTTP pool, read from the environment."""
+
+    def __init__(self) -> None:
+        self.max_connections = get_int("LLM_MAX_CONNECTIONS", 20)
+        self.max_keepalive_connections = get_int("LLM_MAX_KEEPALIVE_CONNECTIONS", 10)
+        self.keepalive_expiry = get_float("LLM_KEEPALIVE_EXPIRY", 60.0)
+        self.connect_timeout = get_float("LLM_CONNECT_TIMEOUT", 5.0)
+        self.read_timeout = get_float("LLM_READ_TIMEOUT", 60.0)
+        self.pool_timeout = get_float("LLM_POOL_TIMEOUT", 10.0)
+        # HTTP/2 needs the optional `h2` package; fall back to HTTP/1.1 without it
+        self.http2 = get_bool("LLM_HTTP2", True) and importlib.util.find_spec("h2") is not None
+        self.warmup = get_bool("LLM_WARMUP_ON_STARTUP", False)
+
+
+class LLMClientManager:
+    """
+    Owns the Mistral SDK client and the httpx connection pool behind it.
+
+    The pool is created inside the running event loop (from the FastAPI
+    lifespan under uvicorn workers) and closed on shutdown. If a request
+    arrives on a different loop than the one the pool was built on, or
+    the lifespan never ran (serverless), a new pool is built lazily and
+    the stale one is closed.
+    """
+
+    def __init__(self, api_key: Optional[str], settings: Optional[LLMClientSettings] = None) -> None:
+        self.api_key = api_key
+        self.settings = settings or LLMClientSettings()
+        self._client: Any = None
+        self._http: Any = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ssl_context: Optional[ssl.SSLContext] = None
+        # Closes of stale pools in flight (tasks are only weakly referenced by the loop)
+        self._closing: Set["asyncio.Future[Any]"] = set()
+
+    def _build_http_client(self):
+        import httpx
+
+        if self._ssl_context is None:
+            # One SSL context for the whole process so TLS state (sessions,
+            # loaded CA bundle) is shared by every pooled connection
+            import certifi
+            self._ssl_context = ssl.create_default_context(cafile=certifi.where())
+
+        s = self.settings
+        return httpx.AsyncClient(
+            http2=s.http2,
+            verify=self._ssl_context,
+            limits=httpx.Limits(
+                max_connections=s.max_connections,
+                max_keepalive_connections=s.max_keepalive_connections,
+                keepalive_expiry=s.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(
+                s.read_timeout,
+                connect=s.connect_timeout,
+                pool=s.pool_timeout,
+            ),
+        )
+
+    def _build(self) -> None:
+        from mistralai import Mistral
+
+        self._loop = asyncio.get_running_loop()
+        self._http = self._build_http_client()
+        self._client = Mistral(
+            api_key=self.api_key,
+            async_client=self._http,
+            timeout_ms=int(self.settings.read_timeout * 1000),
+        )
+        logger.info(
+            "LLM client pool ready (http2=%s, max_connections=%s)",
+            self.settings.http2, self.settings.max_connections,
+        )
+
+    async def startup(self) -> None:
+        """Create the pool on the running loop and optionally pre-open a connection."""
+        if not self.api_key:
+            return
+        self._build()
+        if self.settings.warmup:
+            try:
+                await self._http.head(MISTRAL_SERVER_URL)
+            except Exception as e:  # pragma: no cover - network dependent
+                logger.warning("LLM connection warm-up failed: %s", e)
+
+    def get_client(self):
+        """Return the Mistral client bound to the current event loop."""
+        if not self.api_key:
+            return None
+        if self._client is None or self._loop is not asyncio.get_running_loop():
+            # Pools cannot be shared across loops; the stale one is closed
+            self._close_stale()
+            self._build()
+        return self._client
+
+    def _close_stale(self) -> None:
+        """Schedule closing the pool built on a previous event loop."""
+        http, loop = self._http, self._loop
+        if http is None:
+            return
+        if loop is not None and loop.is_running():
+            # The old loop still serves another thread: close the pool there
+            future = asyncio.run_coroutine_threadsafe(self._close_quietly(http), loop)
+        else:
+            # The old loop is gone; release what can still be released
+            future = asyncio.get_running_loop().create_task(self._close_quietly(http))
+        self._closing.add(future)
+        future.add_done_callback(self._closing.discard)
+
+    @staticmethod
+    async def _close_quietly(http: Any) -> None:
+        try:
+            await http.aclose()
+        except Exception as e:
+            logger.debug("Closing a stale LLM connection pool failed: %s", e)
+
+    async def aclose(self) -> None:
+        """Close pooled connections; called from the lifespan on shutdown."""
+        if self._http is not None and self._loop is asyncio.get_running_loop():
+            await self._http.aclose()
+        self._http = None
+        self._client = None
+        self._loop = None
+
@@ -0,0 +1,297 @@
+# LLM provider registry - routes LLM node types to async backends
+
+import asyncio
+import hashlib
+import json
+import logging
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from src.config.settings import get_env, get_float, get_int
+from src.utils.llm_client import LLMClientManager, LLMClientSettings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LLMResult:
+    """Completion returned by a backend."""
+    text: str
+    model: str
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+
+
+class LLMBackend(ABC):
+    """
+    Base class for LLM backends.
+
+    Each backend owns its own concurrency limit and model choice; subclasses
+    implement _complete() and, if they hold connections, startup()/aclose().
+    Nodes may ask for `model`, `small_model` or one of the extra `models`.
+    """
+
+    kind = "base"
+
+    def __init__(
+        self,
+        name: str,
+        model: str,
+        small_model: Optional[str] = None,
+        max_concurrency: int = 8,
+        models: Optional[List[str]] = None,
+    ) -> None:
+        self.name = name
+        self.model = model
+        self.small_model = small_model
+        self.max_concurrency = max_concurrency
+        self.models = list(models or [])
+        # Created on first use in each event loop, like the HTTP pool (see
+        # LLMClientManager): backends are built at import, outside any loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def allowed_models(self) -> Set[str]:
+        """Models a node may ask this backend for."""
+        return {name for name in (self.model, self.small_model, *self.models) if name}
+
+    async def startup(self) -> None:
+        """Open connections (called from the application lifespan)."""
+
+    async def aclose(self) -> None:
+        """Close connections (called from the application lifespan)."""
+
+    def _slots(self) -> asyncio.Semaphore:
+        """This backend's concurrency limit on the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def complete(self, prompt: str, model: Optional[str] = None) -> LLMResult:
+        """Run a completion, waiting for a free slot under this backend's limit."""
+        async with self._slots():
+            return await self._complete(prompt, model or self.model)
+
+    @abstractmethod
+    async def _complete(self, prompt: str, model: str) -> LLMResult:
+        """Run one completion with the given model."""
+
+
+class MistralBackend(LLMBackend):
+    """Mistral chat completions over a dedicated connection pool."""
+
+    kind = "mistral"
+
+    def __init__(self, name: str, api_key: Optional[str], settings: Optional[LLMClientSettings] = None, **kwargs) -> None:
+        super().__init__(name, **kwargs)
+        self.client = LLMClientManager(api_key=api_key, settings=settings)
+
+    async def startup(self) -> None:
+        await self.client.startup()
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    async def _complete(self, prompt: str, model: str) -> LLMResult:
+        client = self.client.get_client()
+        if client is None:
+            raise RuntimeError("MISTRAL_API_KEY environment variable is not set")
+
+        chat_response = await client.chat.complete_async(
+            model=model,
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt,
+                },
+            ]
+        )
+        usage = getattr(chat_response, "usage", None)
+        return LLMResult(
+            text=chat_response.choices[0].message.content,
+            model=model,
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            completion_tokens=getattr(usage, "completion_tokens", None),
+        )
+
+
+class EchoBackend(LLMBackend):
+    """
+    Local deterministic backend for offline testing and benchmarking.
+
+    Returns a stable digest of the prompt plus its first characters, after
+    an optional fixed delay that simulates model latency.
+    """
+
+    kind = "echo"
+
+    def __init__(self, name: str, latency_ms: float = 0.0, preview_chars: int = 200, **kwargs) -> None:
+        kwargs.setdefault("model", "echo")
+        super().__init__(name, **kwargs)
+        self.latency_ms = latency_ms
+        self.preview_chars = preview_chars
+
+    async def _complete(self, prompt: str, model: str) -> LLMResult:
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:12]
+        text = f"[{model}:{digest}] {prompt[: self.preview_chars]}"
+        return LLMResult(
+            text=text,
+            model=model,
+            prompt_tokens=len(prompt.split()),
+            completion_tokens=len(text.split()),
+        )
+
+
+BACKEND_KINDS = {
+    MistralBackend.kind: MistralBackend,
+    EchoBackend.kind: EchoBackend,
+}
+
+
+class LLMProviderRegistry:
+    """
+    Maps LLM node types to named backends.
+
+    Routing order for a node:
+    1. An explicit `model` on the node, either "backend:model" or a bare
+       model name for the node type's backend. Pipelines may only name
+       backends that are routed (LLM_ROUTES, or the default) and models
+       those are configured with (see model_error).
+    2. The backend routed for the node type (LLM_ROUTES), else the default.
+    3. Prompts shorter than LLM_SMALL_PROMPT_CHARS use the backend's
+       small_model, when it has one.
+    """
+
+    def __init__(self, default_backend: str, small_prompt_chars: int = 0) -> None:
+        self.default_backend = default_backend
+        self.small_prompt_chars = small_prompt_chars
+        self.backends: Dict[str, LLMBackend] = {}
+        self.routes: Dict[str, str] = {}
+
+    def register_backend(self, backend: LLMBackend) -> None:
+        self.backends[backend.name] = backend
+
+    def route(self, node_type: str, backend_name: str) -> None:
+        self.routes[node_type.lower()] = backend_name
+
+    def get_backend(self, name: str) -> LLMBackend:
+        backend = self.backends.get(name)
+        if backend is None:
+            raise KeyError(f"Unknown LLM backend '{name}'")
+        return backend
+
+    def _select(self, node_type: Optional[str], model: str) -> Tuple[Optional[LLMBackend], str]:
+        """Backend and model an explicit node model names (backend None if not routed)."""
+        prefix, sep, rest = model.partition(":")
+        if sep and prefix in self.backends:
+            backend_name, model = prefix, rest
+        else:
+            backend_name = self.routes.get((node_type or "").lower(), self.default_backend)
+        if backend_name != self.default_backend and backend_name not in self.routes.values():
+            return None, model
+        backend = self.backends.get(backend_name)
+        return backend, model or (backend.model if backend else model)
+
+    def model_error(self, node_type: Optional[str], model: Optional[str]) -> Optional[str]:
+        """Why a node may not use `model` (None if it may)."""
+        if not model:
+            return None
+        backend, name = self._select(node_type, model)
+        if backend is None:
+            return f"Model '{model}' is not served by a routed LLM backend"
+        if name not in backend.allowed_models:
+            return f"Model '{name}' is not configured for LLM backend '{backend.name}'"
+        return None
+
+    def resolve(self, node_type: Optional[str], prompt: str, model: Optional[str] = None) -> Tuple[LLMBackend, str]:
+        """
+        Pick the backend and model for an LLM node.
+
+        Client-supplied models are checked with model_error() before a run
+        starts; server-side choices (TOKEN_SUMMARY_MODEL) are taken as given.
+        """
+        backend_name = self.routes.get((node_type or "").lower(), self.default_backend)
+
+        if model:
+            prefix, sep, rest = model.partition(":")
+            if sep and prefix in self.backends:
+                return self.backends[prefix], rest or self.backends[prefix].model
+            return self.get_backend(backend_name), model
+
+        backend = self.get_backend(backend_name)
+        if backend.small_model and len(prompt) < self.small_prompt_chars:
+            return backend, backend.small_model
+        return backend, backend.model
+
+    async def startup(self) -> None:
+        for backend in self.backends.values():
+            await backend.startup()
+
+    async def aclose(self) -> None:
+        for backend in self.backends.values():
+            await backend.aclose()
+
+
+def _build_backend(name: str, config: dict) -> LLMBackend:
+    config = dict(config)
+    kind = config.pop("kind", name)
+    if kind not in BACKEND_KINDS:
+        raise ValueError(f"Unknown LLM backend kind '{kind}' for backend '{name}'")
+
+    if kind == MistralBackend.kind:
+        settings = LLMClientSettings()
+        for key in ("max_connections", "max_keepalive_connections", "keepalive_expiry",
+                    "connect_timeout", "read_timeout", "pool_timeout", "http2"):
+            if key in config:
+                setattr(settings, key, config.pop(key))
+        config.setdefault("api_key", get_env(config.pop("api_key_env", "MISTRAL_API_KEY")))
+        config.setdefault("model", "mistral-large-latest")
+        return MistralBackend(name, settings=settings, **config)
+
+    return BACKEND_KINDS[kind](name, **config)
+
+
+def build_registry() -> LLMProviderRegistry:
+    """
+    Build the registry from the environment.
+
+    LLM_BACKENDS (JSON) adds or overrides named backends, e.g.
+    {"mistral-fast": {"kind": "mistral", "model": "mistral-small-latest", "max_concurrency": 16}}
+    LLM_ROUTES (JSON) maps node types to backend names, e.g. {"claude": "mistral-fast"}.
+    A backend's "models" lists further models nodes may ask it for.
+    """
+    configs = {
+        "mistral": {
+            "kind": "mistral",
+            "model": get_env("MISTRAL_MODEL", "mistral-large-latest"),
+            "small_model": get_env("MISTRAL_SMALL_MODEL", "mistral-small-latest"),
+            "max_concurrency": get_int("MISTRAL_MAX_CONCURRENCY", 8),
+        },
+        "echo": {
+            "kind": "echo",
+            "latency_ms": get_float("ECHO_LATENCY_MS", 0.0),
+            "max_concurrency": get_int("ECHO_MAX_CONCURRENCY", 64),
+        },
+    }
+    configs.update(json.loads(get_env("LLM_BACKENDS", "{}")))
+
+    registry = LLMProviderRegistry(
+        default_backend=get_env("LLM_DEFAULT_BACKEND", "mistral"),
+        small_prompt_chars=get_int("LLM_SMALL_PROMPT_CHARS", 0),
+    )
+    for name, config in configs.items():
+        registry.register_backend(_build_backend(name, config))
+    for node_type, backend_name in json.loads(get_env("LLM_ROUTES", "{}")).items():
+        registry.route(node_type, backend_name)
+
+    logger.info("LLM backends: %s (default: %s)", ", ".join(registry.backends), registry.default_backend)
+    return registry
+
+
+llm_registry = build_registry()
@@ -1,48 +1,65 @@
 # LLM utility functions
 
-import os
+import logging
+from typing import Optional, Sequence, Union
 from fastapi import HTTPException, status
-from dotenv import load_dotenv
-from mistralai import Mistral
 
-load_dotenv()
+from src.utils.llm_providers import LLMResult, llm_registry
 
-# Initialize Mistral client
-MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
-MISTRAL_CLIENT = None
+logger = logging.getLogger(__name__)
 
-if MISTRAL_API_KEY:
-    MISTRAL_CLIENT = Mistral(api_key=MISTRAL_API_KEY)
 
+def build_prompt(prompt: Union[str, Sequence[str]], instructions: str = "") -> str:
+    """Join the prompt parts once, prefixed with the instructions if there are any."""
+    parts = [prompt] if isinstance(prompt, str) else list(prompt)
+    if instructions and instructions.strip() and instructions != "Add Instructions":
+        parts.insert(0, f"Instructions: {instructions}\n\n")
+    return "".join(parts)
 
-async def execute_llm(prompt: str, instructions: str = "") -> str:
-    """Execute the Mistral LLM with the given prompt and instructions."""
-    if not MISTRAL_API_KEY:
+
+async def complete_llm(
+    prompt: Union[str, Sequence[str]],
+    instructions: str = "",
+    node_type: Optional[str] = None,
+    model: Optional[str] = None,
+) -> LLMResult:
+    """
+    Execute an LLM with the given prompt and instructions.
+
+    The backend and model are chosen by the provider registry from the
+    node type, an optional explicit model and the prompt size. The prompt
+    may be given as parts, which are joined once with the instructions.
+
+    Returns:
+        LLMResult with the text, the model used and the token usage the
+        backend reported
+    """
+    full_prompt = build_prompt(prompt, instructions)
+
+    try:
+        backend, resolved_model = llm_registry.resolve(node_type, full_prompt, model)
+    except KeyError as e:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="MISTRAL_API_KEY environment variable is not set"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
-    
+
     try:
-        # Build the full prompt with instructions
-        full_prompt = ""
-        if instructions and instructions.strip() and instructions != "Add Instructions":
-            full_prompt += f"Instructions: {instructions}\n\n"
-        full_prompt += prompt
-
-        print(full_prompt, "full_prompt")
-        chat_response = await MISTRAL_CLIENT.chat.complete_async(
-            model='mistral-large-latest',
-            messages=[
-                {
-                    "role": "user",
-                    "content": full_prompt,
-                },
-            ]
-        )
-        return chat_response.choices[0].message.content
+        logger.debug("Executing %s/%s with a %d character prompt", backend.name, resolved_model, len(full_prompt))
+        return await backend.complete(full_prompt, resolved_model)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error executing Mistral: {str(e)}"
+            detail=f"Error executing {backend.name}: {str(e)}"
         )
+
+
+async def execute_llm(
+    prompt: Union[str, Sequence[str]],
+    instructions: str = "",
+    node_type: Optional[str] = None,
+    model: Optional[str] = None,
+) -> str:
+    """Execute an LLM (see complete_llm) and return only the response text."""
+    result = await complete_llm(prompt, instructions, node_type, model)
+    return result.text
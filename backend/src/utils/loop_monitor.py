@@ -0,0 +1,119 @@
+# Event loop lag monitor - reports handlers that block the event loop
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from src.config.settings import get_float, get_int
+
+logger = logging.getLogger(__name__)
+
+# Blocking the loop for longer than this is reported
+LOOP_LAG_BUDGET_MS = get_float("LOOP_LAG_BUDGET_MS", 100.0)
+LOOP_LAG_INTERVAL_MS = get_float("LOOP_LAG_INTERVAL_MS", 50.0)
+LOOP_LAG_HISTORY = get_int("LOOP_LAG_HISTORY", 20)
+
+# Innermost frames of the blocking code kept per stall
+STALL_STACK_FRAMES = 12
+
+
+def _format_stack(frame) -> List[str]:
+    entries = traceback.extract_stack(frame)[-STALL_STACK_FRAMES:]
+    return [f"{entry.name} ({entry.filename}:{entry.lineno})" for entry in entries]
+
+
+class LoopLagMonitor:
+    """
+    Measure how late the event loop runs a periodic heartbeat.
+
+    A heartbeat task sleeps for the interval and records by how much it
+    overslept (the loop lag). A watchdog thread watches the heartbeat and,
+    while the loop is stalled past the budget, captures the loop thread's
+    stack - the code that is blocking it. Each stall over budget is logged
+    once with that stack and kept in a short history for /admin/loop.
+    """
+
+    def __init__(
+        self,
+        budget_ms: float = LOOP_LAG_BUDGET_MS,
+        interval_ms: float = LOOP_LAG_INTERVAL_MS,
+        history: int = LOOP_LAG_HISTORY,
+    ) -> None:
+        self.budget = budget_ms / 1000.0
+        self.interval = interval_ms / 1000.0
+        self.stalls = 0
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self._beat = 0.0
+        self._stall_stack: Optional[List[str]] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    async def start(self) -> None:
+        """Start monitoring the running loop; called from the lifespan."""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            before = time.monotonic()
+            self._beat = before
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - before - self.interval)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.budget:
+                self._record_stall(lag)
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval):
+            stalled = time.monotonic() - self._beat - self.interval
+            if stalled > self.budget and self._stall_stack is None:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                self._stall_stack = _format_stack(frame) if frame is not None else []
+
+    def _record_stall(self, lag: float) -> None:
+        stack, self._stall_stack = self._stall_stack or [], None
+        self.stalls += 1
+        self.recent.append({"at": time.time(), "lag_ms": round(lag * 1000, 1), "stack": stack})
+        logger.warning(
+            "Event loop blocked for %.0f ms (budget %.0f ms)%s",
+            lag * 1000, self.budget * 1000,
+            "; blocking code:\n  " + "\n  ".join(stack) if stack else "",
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "budget_ms": self.budget * 1000,
+            "stalls": self.stalls,
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "last_lag_ms": round(self.last_lag * 1000, 1),
+            "recent_stalls": list(self.recent),
+        }
+
+
+loop_monitor = LoopLagMonitor()
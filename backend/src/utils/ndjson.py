@@ -0,0 +1,49 @@
+# Newline-delimited JSON helpers for streaming request/response bodies
+
+import json
+from typing import Any, AsyncIterable, AsyncIterator
+
+from src.config.limits import MAX_NDJSON_LINE_BYTES
+from src.utils.payload_limits import PayloadTooLarge
+
+
+async def iter_ndjson_lines(
+    chunks: AsyncIterable[bytes],
+    max_line_bytes: int = MAX_NDJSON_LINE_BYTES
+) -> AsyncIterator[bytes]:
+    """
+    Split an NDJSON byte stream into raw record lines.
+
+    Only the current partial line is buffered, so memory stays flat no
+    matter how long the stream is. Blank lines are skipped; decoding is
+    left to the caller so one bad line can be reported on its own.
+
+    Raises:
+        PayloadTooLarge: If a line grows beyond max_line_bytes
+    """
+    buffer = bytearray()
+    async for chunk in chunks:
+        # Only the new bytes can hold a newline; rescanning (or re-joining)
+        # the buffered partial line on every chunk would be quadratic
+        scan = len(buffer)
+        buffer += chunk
+        start = 0
+        end = buffer.find(b"\n", scan)
+        while end != -1:
+            if end - start > max_line_bytes:
+                raise PayloadTooLarge(max_line_bytes, "NDJSON line")
+            line = bytes(buffer[start:end])
+            if line.strip():
+                yield line
+            start = end + 1
+            end = buffer.find(b"\n", start)
+        del buffer[:start]
+        if len(buffer) > max_line_bytes:
+            raise PayloadTooLarge(max_line_bytes, "NDJSON line")
+    if buffer.strip():
+        yield bytes(buffer)
+
+
+def ndjson_line(record: Any) -> bytes:
+    """Encode one record as an NDJSON line."""
+    return json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n"
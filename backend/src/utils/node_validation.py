@@ -0,0 +1,227 @@
+# Node validation - pipeline wiring checked against the node catalog's handles and fields
+
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from fastapi import HTTPException, status
+
+from src.schemas import PipelineEdge, PipelineNode
+from src.utils.catalog_cache import CATALOG_CACHE_TTL, catalog_cache
+
+# Wiring errors reported per request (the rest are counted, not listed)
+MAX_WIRING_ERRORS = 50
+
+
+class PipelineWiringError(HTTPException):
+    """422 listing every node and edge that does not match the catalog."""
+
+    def __init__(self, errors: List[Dict[str, Any]]) -> None:
+        super().__init__(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=errors)
+        self.errors = errors
+
+
+def _is_number(value: Any) -> bool:
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return True
+    try:
+        float(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+class NodeSpec:
+    """
+    Validator compiled from one catalog node definition.
+
+    Handle ids are split by direction once (edges reference them as
+    "{node_id}-{handle_id}"), and field checks are reduced to the fields
+    whose values can actually be wrong (numbers and select options), so
+    validating a node or edge is a few set lookups.
+    """
+
+    def __init__(self, node_type: str, fields: Iterable[Any], handles: Iterable[Any]) -> None:
+        self.type = node_type
+        self.source_handles: Set[str] = set()
+        self.target_handles: Set[str] = set()
+        for handle in handles or ():
+            if not isinstance(handle, dict) or not handle.get("id"):
+                continue
+            if handle.get("type") == "target":
+                self.target_handles.add(str(handle["id"]))
+            else:
+                self.source_handles.add(str(handle["id"]))
+
+        self.number_fields: List[str] = []
+        self.option_fields: Dict[str, Set[str]] = {}
+        for field in fields or ():
+            if not isinstance(field, dict) or not field.get("name"):
+                continue
+            if field.get("type") == "number":
+                self.number_fields.append(field["name"])
+            elif field.get("type") == "select" and field.get("options"):
+                self.option_fields[field["name"]] = {str(option) for option in field["options"]}
+
+    def field_errors(self, data: Any) -> List[str]:
+        """Messages for field values (attributes of node data) the definition does not allow."""
+        errors = []
+        for name in self.number_fields:
+            value = getattr(data, name, None)
+            if value not in (None, "") and not _is_number(value):
+                errors.append(f"Field '{name}' must be a number")
+        for name, options in self.option_fields.items():
+            value = getattr(data, name, None)
+            if value not in (None, "") and str(value) not in options:
+                errors.append(f"Field '{name}' must be one of: {', '.join(sorted(options))}")
+        return errors
+
+    def handle_error(self, node_id: str, handle: Optional[str], direction: str) -> Optional[str]:
+        """
+        Message if an edge may not leave (direction "source") or enter
+        (direction "target") this node through `handle`, else None.
+        """
+        allowed = self.source_handles if direction == "source" else self.target_handles
+        if not allowed:
+            kind = "outputs" if direction == "source" else "inputs"
+            return f"Node '{node_id}' ({self.type}) has no {kind}"
+        if handle is None:
+            return None
+        prefix = f"{node_id}-"
+        if not handle.startswith(prefix) or handle[len(prefix):] not in allowed:
+            return (
+                f"Handle '{handle}' is not a {direction} handle of node '{node_id}' ({self.type}); "
+                f"expected one of: {', '.join(prefix + h for h in sorted(allowed))}"
+            )
+        return None
+
+
+class NodeSpecCache:
+    """
+    Compiled NodeSpecs per node type, valid for one catalog version.
+
+    Types missing from the cache are loaded together in one lookup, and
+    types that are not in the catalog are remembered as unknown, so a
+    warm cache never touches the database. The cache is dropped when the
+    catalog changes (catalog_cache.version, which covers other workers when
+    the shared cache tier is enabled) and after CATALOG_CACHE_TTL.
+    """
+
+    def __init__(self, ttl: float = CATALOG_CACHE_TTL) -> None:
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._specs: Dict[str, Optional[NodeSpec]] = {}
+        self._version: Optional[Tuple[int, int]] = None
+        self._loaded_at = 0.0
+
+    def _check_fresh(self) -> None:
+        version = catalog_cache.version
+        if self._version != version or (time.monotonic() - self._loaded_at) >= self.ttl:
+            self._specs = {}
+            self._version = version
+            self._loaded_at = time.monotonic()
+
+    def missing(self, node_types: Iterable[str]) -> Set[str]:
+        """Types that get() would have to load."""
+        with self._lock:
+            self._check_fresh()
+            return {node_type for node_type in node_types if node_type not in self._specs}
+
+    def cached(self, node_types: Iterable[str]) -> Optional[Dict[str, Optional[NodeSpec]]]:
+        """Like get(), but only from the cache: None if any type would have to be loaded."""
+        with self._lock:
+            self._check_fresh()
+            if any(node_type not in self._specs for node_type in node_types):
+                return None
+            return {node_type: self._specs[node_type] for node_type in node_types}
+
+    def get(
+        self,
+        node_types: Iterable[str],
+        load: Callable[[Set[str]], Mapping[str, Any]]
+    ) -> Dict[str, Optional[NodeSpec]]:
+        """
+        Return {type: NodeSpec or None if not in the catalog} for the given types.
+
+        Args:
+            node_types: Node types used by a pipeline
+            load: Callable mapping a set of types to {type: node definition}
+                  (objects with `fields` and `handles`), called once with
+                  every type that is not cached
+        """
+        types = set(node_types)
+        missing = self.missing(types)
+        if missing:
+            nodes = load(missing)
+            compiled: Dict[str, Optional[NodeSpec]] = {}
+            for node_type in missing:
+                node = nodes.get(node_type)
+                compiled[node_type] = NodeSpec(node_type, node.fields, node.handles) if node is not None else None
+            with self._lock:
+                self._check_fresh()
+                self._specs.update(compiled)
+        with self._lock:
+            return {node_type: self._specs.get(node_type) for node_type in types}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._specs = {}
+
+
+def wiring_errors(
+    nodes: List[PipelineNode],
+    edges: List[PipelineEdge],
+    specs: Mapping[str, Optional[NodeSpec]],
+    builtin_types: Iterable[str] = ()
+) -> List[Dict[str, Any]]:
+    """
+    Check a pipeline against the catalog in one pass over nodes and edges.
+
+    Nodes of types that are neither in the catalog nor built in, field
+    values the definition does not allow and edges through handles the node
+    type does not have are all reported. Built-in types that are missing
+    from the catalog are not checked, and edges to nodes that are not in
+    the pipeline are ignored, as execution ignores them.
+
+    Returns:
+        Errors as {"loc": [...], "msg": ...}, empty if the pipeline is valid
+    """
+    builtin = {node_type.lower() for node_type in builtin_types}
+    errors: List[Dict[str, Any]] = []
+    spec_by_id: Dict[str, Optional[NodeSpec]] = {}
+
+    def add(loc: tuple, msg: str) -> None:
+        errors.append({"loc": list(loc), "msg": msg, "type": "invalid_wiring"})
+
+    for index, node in enumerate(nodes):
+        spec = specs.get(node.type) if node.type else None
+        spec_by_id[node.id] = spec
+        if spec is None:
+            if node.type and node.type.lower() not in builtin:
+                add(("nodes", index, "type"), f"Unknown node type '{node.type}'")
+            continue
+        if node.data is not None:
+            for msg in spec.field_errors(node.data):
+                add(("nodes", index, "data"), msg)
+
+    for index, edge in enumerate(edges):
+        for direction, node_id, handle in (
+            ("source", edge.source, edge.sourceHandle),
+            ("target", edge.target, edge.targetHandle),
+        ):
+            spec = spec_by_id.get(node_id)
+            if spec is not None:
+                msg = spec.handle_error(node_id, handle, direction)
+                if msg:
+                    add(("edges", index, f"{direction}Handle"), msg)
+
+    if len(errors) > MAX_WIRING_ERRORS:
+        hidden = len(errors) - MAX_WIRING_ERRORS
+        errors = errors[:MAX_WIRING_ERRORS]
+        add(("pipeline",), f"... and {hidden} more error(s)")
+    return errors
+
+
+node_specs = NodeSpecCache()
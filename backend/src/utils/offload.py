@@ -0,0 +1,142 @@
+# CPU offload - run heavy synchronous work off the event loop, by input size
+
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Dict
+
+from src.config.settings import get_int
+
+logger = logging.getLogger(__name__)
+
+# Graphs with at least this many nodes + edges are compiled in a worker thread
+GRAPH_OFFLOAD_THREAD_ITEMS = get_int("GRAPH_OFFLOAD_THREAD_ITEMS", 2_000)
+# ...and with at least this many in a worker process (0 = never use processes)
+GRAPH_OFFLOAD_PROCESS_ITEMS = get_int("GRAPH_OFFLOAD_PROCESS_ITEMS", 0)
+# Request bodies of at least this many bytes are validated in a worker thread
+BODY_OFFLOAD_THREAD_BYTES = get_int("BODY_OFFLOAD_THREAD_BYTES", 256 * 1024)
+
+OFFLOAD_THREADS = get_int("OFFLOAD_THREADS", 4)
+OFFLOAD_PROCESSES = get_int("OFFLOAD_PROCESSES", 2)
+
+_executors: Dict[str, Executor] = {}
+_executors_lock = threading.Lock()
+
+
+def _get_executor(mode: str) -> Executor:
+    executor = _executors.get(mode)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(mode)
+            if executor is None:
+                if mode == "process":
+                    # spawn: forking a process that runs an event loop and threads is unsafe
+                    executor = ProcessPoolExecutor(
+                        max_workers=OFFLOAD_PROCESSES,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+                else:
+                    executor = ThreadPoolExecutor(max_workers=OFFLOAD_THREADS, thread_name_prefix="offload")
+                _executors[mode] = executor
+    return executor
+
+
+def _discard_executor(mode: str) -> None:
+    """Drop a pool that cannot run work, so the next use builds a new one."""
+    with _executors_lock:
+        executor = _executors.pop(mode, None)
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_executors() -> None:
+    """Stop the offload pools; called from the lifespan on shutdown."""
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=True, cancel_futures=True)
+        _executors.clear()
+
+
+class OffloadPolicy:
+    """
+    Size-aware choice of where to run a synchronous function.
+
+    Small inputs run inline (a thread hop would cost more than the work).
+    Inputs from `thread_size` up run in a dedicated thread pool, so the
+    event loop keeps serving other requests while they are processed.
+    Inputs from `process_size` up run in a process pool, for work large
+    enough to be worth pickling arguments and results across processes.
+    The function and its arguments must then be picklable. Where worker
+    processes cannot be started, or the pool broke, that work runs in the
+    thread pool instead (counted in process_fallbacks).
+    """
+
+    def __init__(self, name: str, thread_size: int, process_size: int = 0) -> None:
+        self.name = name
+        self.thread_size = thread_size
+        self.process_size = process_size
+        self.counts = {"inline": 0, "thread": 0, "process": 0}
+        self.process_fallbacks = 0
+
+    def mode(self, size: int) -> str:
+        if self.process_size and size >= self.process_size:
+            return "process"
+        if self.thread_size and size >= self.thread_size:
+            return "thread"
+        return "inline"
+
+    async def run(
+        self, size: int, fn: Callable[..., Any], *args: Any, processes: bool = True, **kwargs: Any
+    ) -> Any:
+        """
+        Run fn(*args, **kwargs) where the policy says inputs of `size` belong.
+
+        Pass processes=False for work that must run in this process (it
+        reads or updates in-memory state); it then runs in a thread instead.
+        """
+        mode = self.mode(size)
+        if mode == "process" and not processes:
+            mode = "thread"
+        if mode == "inline":
+            self.counts[mode] += 1
+            return fn(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        call = partial(fn, *args, **kwargs)
+        if mode == "process":
+            try:
+                future = loop.run_in_executor(_get_executor(mode), call)
+            except (OSError, NotImplementedError, BrokenProcessPool) as e:
+                # No worker processes on this platform or sandbox
+                return await self._in_thread(loop, call, e)
+            try:
+                result = await future
+            except BrokenProcessPool as e:
+                # A worker died; the whole pool is unusable
+                return await self._in_thread(loop, call, e)
+            self.counts[mode] += 1
+            return result
+        self.counts[mode] += 1
+        return await loop.run_in_executor(_get_executor(mode), call)
+
+    async def _in_thread(self, loop: asyncio.AbstractEventLoop, call: Callable[[], Any], error: Exception) -> Any:
+        logger.warning("Process pool unavailable (%r); running %s work in a thread", error, self.name)
+        _discard_executor("process")
+        self.process_fallbacks += 1
+        self.counts["thread"] += 1
+        return await loop.run_in_executor(_get_executor("thread"), call)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "thread_size": self.thread_size,
+            "process_size": self.process_size,
+            "counts": dict(self.counts),
+            "process_fallbacks": self.process_fallbacks,
+        }
+
+
+graph_offload = OffloadPolicy("graph", GRAPH_OFFLOAD_THREAD_ITEMS, GRAPH_OFFLOAD_PROCESS_ITEMS)
+body_offload = OffloadPolicy("body", BODY_OFFLOAD_THREAD_BYTES)
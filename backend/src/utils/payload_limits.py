@@ -0,0 +1,129 @@
+# Payload limits - request body size checks and a worker-wide body byte budget
+
+import asyncio
+from typing import AsyncIterable, AsyncIterator, Optional
+
+from fastapi import HTTPException, status
+
+from src.config.limits import (
+    MAX_REQUEST_BODY_BYTES,
+    REQUEST_BODY_BUDGET_BYTES,
+    REQUEST_BODY_BUDGET_WAIT,
+)
+
+
+class PayloadTooLarge(HTTPException):
+    """413 raised as soon as a body is known to exceed its limit."""
+
+    def __init__(self, limit: int, what: str = "Request body") -> None:
+        super().__init__(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"{what} exceeds the limit of {limit} bytes"
+        )
+        self.limit = limit
+
+
+def check_content_length(value: Optional[str], limit: int = MAX_REQUEST_BODY_BYTES) -> Optional[int]:
+    """
+    Parse a Content-Length header and reject it early if it is over the limit.
+
+    Returns:
+        The declared length, or None if the body is chunked / undeclared
+    """
+    if value is None:
+        return None
+    try:
+        length = int(value)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Content-Length")
+    if length > limit:
+        raise PayloadTooLarge(limit)
+    return length
+
+
+async def limit_stream(chunks: AsyncIterable[bytes], limit: int = MAX_REQUEST_BODY_BYTES) -> AsyncIterator[bytes]:
+    """Pass chunks through, raising PayloadTooLarge once more than `limit` bytes arrived."""
+    received = 0
+    async for chunk in chunks:
+        received += len(chunk)
+        if received > limit:
+            raise PayloadTooLarge(limit)
+        yield chunk
+
+
+async def read_limited(chunks: AsyncIterable[bytes], limit: int = MAX_REQUEST_BODY_BYTES) -> bytearray:
+    """
+    Read a body into one buffer, enforcing the limit while it arrives.
+
+    Unlike Request.body() the buffer is not cached on the request, so it
+    can be freed as soon as the caller has parsed it.
+    """
+    body = bytearray()
+    async for chunk in limit_stream(chunks, limit):
+        body += chunk
+    return body
+
+
+class BodyBudget:
+    """
+    Bytes of request bodies that in-flight requests may hold at once.
+
+    Requests reserve their body size while the body is read (see
+    BodyLimitMiddleware) and release it once it has been read, which bounds
+    the memory taken by uploads in progress under concurrency. A request
+    that does not fit waits for other uploads to finish.
+    """
+
+    def __init__(self, capacity: int = REQUEST_BODY_BUDGET_BYTES, wait: float = REQUEST_BODY_BUDGET_WAIT) -> None:
+        self.capacity = capacity
+        self.wait = wait
+        self.in_use = 0
+        self._condition: Optional[asyncio.Condition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        # Conditions are bound to one event loop; rebuild it if the loop changed
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._loop is not loop:
+            self._condition = asyncio.Condition()
+            self._loop = loop
+        return self._condition
+
+    async def acquire(self, size: int) -> int:
+        """
+        Reserve `size` bytes (capped at the capacity, so any single body fits).
+
+        Returns:
+            The number of bytes reserved, to pass to release()
+
+        Raises:
+            HTTPException: 503 if no room frees up within the wait time
+        """
+        size = min(size, self.capacity)
+        condition = self._get_condition()
+        async with condition:
+            try:
+                await asyncio.wait_for(
+                    condition.wait_for(lambda: self.in_use + size <= self.capacity),
+                    self.wait
+                )
+            except asyncio.TimeoutError:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server is busy with other large requests, retry shortly",
+                    headers={"Retry-After": "1"}
+                )
+            self.in_use += size
+        return size
+
+    async def release(self, size: int) -> None:
+        condition = self._get_condition()
+        async with condition:
+            self.in_use -= size
+            condition.notify_all()
+
+    def as_dict(self) -> dict:
+        return {"capacity": self.capacity, "in_use": self.in_use}
+
+
+body_budget = BodyBudget()
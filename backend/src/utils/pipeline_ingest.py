@@ -0,0 +1,183 @@
+# Pipeline ingestion - parse large pipeline bodies without holding them twice
+
+import asyncio
+import importlib.util
+import logging
+from typing import Any, AsyncIterator, Dict, List, Tuple, Type
+
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+from starlette.requests import Request
+
+from src.config.limits import MAX_REQUEST_BODY_BYTES, PIPELINE_MAX_EDGES, PIPELINE_MAX_NODES
+from src.config.settings import get_int
+from src.schemas import PipelineCreate, PipelineNode, PipelineEdge
+from src.utils.offload import body_offload
+from src.utils.payload_limits import check_content_length, limit_stream, read_limited
+
+logger = logging.getLogger(__name__)
+
+# Bodies at least this large are parsed incrementally when ijson is installed
+PIPELINE_STREAM_PARSE_BYTES = get_int("PIPELINE_STREAM_PARSE_BYTES", 1024 * 1024)
+
+# Items validated before incremental parsing yields to other requests
+PIPELINE_PARSE_YIELD_EVERY = get_int("PIPELINE_PARSE_YIELD_EVERY", 200)
+
+# Incremental parsing needs the optional `ijson` package
+HAS_IJSON = importlib.util.find_spec("ijson") is not None
+
+
+def warn_if_parsed_whole() -> None:
+    """Log a startup warning when large bodies cannot be parsed incrementally."""
+    if not HAS_IJSON:
+        logger.warning(
+            "ijson is not installed; pipeline bodies of %d bytes or more are parsed "
+            "in one piece instead of incrementally",
+            PIPELINE_STREAM_PARSE_BYTES
+        )
+
+ITEM_MODELS: Dict[str, Tuple[str, Type[BaseModel], int]] = {
+    "nodes.item": ("nodes", PipelineNode, PIPELINE_MAX_NODES),
+    "edges.item": ("edges", PipelineEdge, PIPELINE_MAX_EDGES),
+}
+
+
+def body_errors(error: ValidationError, *loc: Any) -> List[Dict[str, Any]]:
+    """Validation errors located under the request body, as FastAPI reports them."""
+    errors = []
+    for item in error.errors(include_url=False):
+        item["loc"] = ("body", *loc, *item["loc"])
+        if isinstance(item.get("input"), (bytes, bytearray)):
+            # Never echo the raw body back (as FastAPI does for JSON errors)
+            item["input"] = {}
+        errors.append(item)
+    return errors
+
+
+class _StreamReader:
+    """File-like adapter over an async byte iterator, for ijson."""
+
+    def __init__(self, chunks: AsyncIterator[bytes]) -> None:
+        self._chunks = chunks
+
+    async def read(self, size: int = -1) -> bytes:
+        # ijson probes the stream type with read(0) and accepts reads of any
+        # other length; an empty read means end of input
+        if size == 0:
+            return b""
+        while True:
+            try:
+                chunk = await self._chunks.__anext__()
+            except StopAsyncIteration:
+                return b""
+            if chunk:
+                return chunk
+
+
+async def parse_pipeline_stream(chunks: AsyncIterator[bytes]) -> PipelineCreate:
+    """
+    Parse a PipelineCreate body incrementally with ijson.
+
+    Each node and edge is built and validated as soon as its JSON has
+    arrived, then its raw dict is dropped, so peak memory is the validated
+    models plus one item instead of the whole body, its parsed dict tree
+    and the models. The node and edge count limits are enforced while
+    reading, before the rest of the body is consumed.
+
+    Raises:
+        RequestValidationError: Invalid JSON, invalid items or too many items
+    """
+    import ijson
+
+    items: Dict[str, list] = {"nodes": [], "edges": []}
+    seen = set()
+    errors: List[Dict[str, Any]] = []
+    builder = None
+    current = None
+    parsed = 0
+
+    def add_item(prefix: str, value: Any) -> None:
+        field, model, limit = ITEM_MODELS[prefix]
+        index = len(items[field])
+        if index >= limit:
+            raise RequestValidationError([{
+                "type": "too_long",
+                "loc": ("body", field),
+                "msg": f"List should have at most {limit} items",
+                "input": None,
+                "ctx": {"field_type": "List", "max_length": limit},
+            }])
+        try:
+            items[field].append(model.model_validate(value))
+        except ValidationError as e:
+            # Keep the index aligned with the request so errors point at the right item
+            items[field].append(None)
+            errors.extend(body_errors(e, field, index))
+
+    try:
+        async for prefix, event, value in ijson.parse_async(_StreamReader(chunks), use_float=True):
+            if builder is not None:
+                builder.event(event, value)
+                if prefix == current and event in ("end_map", "end_array"):
+                    add_item(current, builder.value)
+                    builder = None
+                    parsed += 1
+                    if parsed % PIPELINE_PARSE_YIELD_EVERY == 0:
+                        # One network chunk can hold thousands of items
+                        await asyncio.sleep(0)
+            elif prefix in ITEM_MODELS:
+                if event in ("start_map", "start_array"):
+                    builder = ijson.ObjectBuilder()
+                    builder.event(event, value)
+                    current = prefix
+                else:
+                    add_item(prefix, value)
+            elif prefix in ("nodes", "edges") and event == "start_array":
+                seen.add(prefix)
+    except ijson.JSONError as e:
+        raise RequestValidationError([{
+            "type": "json_invalid",
+            "loc": ("body", 0),
+            "msg": "JSON decode error",
+            "input": {},
+            "ctx": {"error": str(e)},
+        }])
+
+    for field in ("nodes", "edges"):
+        if field not in seen:
+            errors.append({"type": "missing", "loc": ("body", field), "msg": "Field required", "input": None})
+    if errors:
+        raise RequestValidationError(errors)
+    return PipelineCreate.model_construct(nodes=items["nodes"], edges=items["edges"])
+
+
+async def read_pipeline(request: Request) -> PipelineCreate:
+    """
+    Dependency that reads a PipelineCreate body within the size limits.
+
+    Large bodies are parsed incrementally when ijson is installed (see
+    parse_pipeline_stream). Otherwise the body is read into a single
+    buffer, validated straight from JSON by pydantic-core (no intermediate
+    dict tree, in a worker thread if it is large), and released; unlike a
+    regular body parameter the raw bytes are not kept on the request while
+    the pipeline runs.
+    """
+    length = check_content_length(request.headers.get("content-length"))
+    if HAS_IJSON and (length is None or length >= PIPELINE_STREAM_PARSE_BYTES):
+        return await parse_pipeline_stream(limit_stream(request.stream(), MAX_REQUEST_BODY_BYTES))
+
+    body = await read_limited(request.stream(), MAX_REQUEST_BODY_BYTES)
+    try:
+        # Large bodies are validated in a worker thread, off the event loop
+        return await body_offload.run(len(body), PipelineCreate.model_validate_json, body)
+    except ValidationError as e:
+        raise RequestValidationError(body_errors(e))
+
+
+# OpenAPI body description for routes that read PipelineCreate via read_pipeline
+PIPELINE_BODY_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": {"$ref": "#/components/schemas/PipelineCreate"}}},
+    }
+}
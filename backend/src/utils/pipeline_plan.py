@@ -0,0 +1,321 @@
+# Compiled pipeline plan - graph analysis done once, reused across executions
+
+import copy
+from typing import Any, Dict, List, Optional, Set
+
+from src.config.limits import PIPELINE_MAX_EDGES, PIPELINE_MAX_NODES
+from src.schemas import NodeData, PipelineNode, PipelineEdge
+from src.utils.graph_utils import VARIABLE_PATTERN, topological_sort, find_nodes_by_type
+
+
+def edge_key(edge: PipelineEdge, index: int = 0) -> str:
+    """Identity of an edge within a plan: its id, or a key derived from its endpoints."""
+    return edge.id or f"{edge.source}->{edge.target}#{index}"
+
+
+class PipelinePlan:
+    """
+    Execution plan for a pipeline graph.
+
+    Holds everything the executor needs that depends only on the graph
+    structure (DAG check, execution order, per-node inputs), so running the
+    same pipeline many times does not re-validate or re-plan it.
+
+    Plans can also be edited in place (add/remove/update node or edge). Edits
+    update only the affected nodes' edges, inputs and {{node-id}} references
+    and mark the plan dirty; the DAG check, execution order and dependencies
+    are re-derived once, the way a fresh compile would (so references resolve
+    identically), when they are next read or on ensure_planned(). A patch of
+    many operations is therefore planned once, not once per operation. Do
+    not edit a plan that a run is executing - use copy() first.
+    """
+
+    def __init__(
+        self,
+        nodes: List[PipelineNode],
+        edges: List[PipelineEdge],
+        input_types: List[str],
+        output_types: List[str],
+        edge_keys: Optional[List[str]] = None,
+    ) -> None:
+        self.input_types = input_types
+        self.output_types = output_types
+        self.nodes_dict: Dict[str, PipelineNode] = {node.id: node for node in nodes}
+        self.edges_dict: Dict[str, PipelineEdge] = {}
+        # edge_keys restores the keys of a plan that was edited (see PipelineStore)
+        for index, edge in enumerate(edges):
+            self.edges_dict[edge_keys[index] if edge_keys else edge_key(edge, index)] = edge
+        self._index()
+        self._plan()
+
+    @property
+    def nodes(self) -> List[PipelineNode]:
+        return list(self.nodes_dict.values())
+
+    @property
+    def edges(self) -> List[PipelineEdge]:
+        return list(self.edges_dict.values())
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.nodes_dict)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.edges_dict)
+
+    # Order-dependent state, re-derived after edits
+
+    @property
+    def is_dag(self) -> bool:
+        self.ensure_planned()
+        return self._is_dag
+
+    @property
+    def order(self) -> List[str]:
+        self.ensure_planned()
+        return self._order
+
+    @property
+    def position(self) -> Dict[str, int]:
+        self.ensure_planned()
+        return self._position
+
+    @property
+    def dependencies(self) -> Dict[str, Set[str]]:
+        self.ensure_planned()
+        return self._dependencies
+
+    @property
+    def dependents(self) -> Dict[str, Set[str]]:
+        self.ensure_planned()
+        return self._dependents
+
+    def _index(self) -> None:
+        """Index the whole graph's edges, inputs and references from scratch."""
+        # Edge keys per node, in edge order; edges to unknown nodes are ignored.
+        # The lists are replaced, never mutated, so copy() can share them.
+        in_edges: Dict[str, List[str]] = {node_id: [] for node_id in self.nodes_dict}
+        out_edges: Dict[str, List[str]] = {node_id: [] for node_id in self.nodes_dict}
+        # Dangling edge keys, in edge order (a dict used as an ordered set)
+        self._dangling: Dict[str, None] = {}
+        for key, edge in self.edges_dict.items():
+            if edge.source in self.nodes_dict and edge.target in self.nodes_dict:
+                out_edges[edge.source].append(key)
+                in_edges[edge.target].append(key)
+            else:
+                self._dangling[key] = None
+        self.in_edges = in_edges
+        self.out_edges = out_edges
+
+        nodes = self.nodes
+        self.input_node_ids = [node.id for node in find_nodes_by_type(nodes, self.input_types)]
+        self.output_node_ids = [node.id for node in find_nodes_by_type(nodes, self.output_types)]
+
+        # Connected inputs per node, in edge order (mirrors get_connected_inputs)
+        self.inputs: Dict[str, List[PipelineNode]] = {}
+        self.refs: Dict[str, List[str]] = {}
+        for node_id in self.nodes_dict:
+            self._refresh_inputs(node_id)
+            self._refresh_refs(node_id)
+        self._dirty = True
+
+    def _refresh_inputs(self, node_id: str) -> None:
+        self.inputs[node_id] = [
+            self.nodes_dict[self.edges_dict[key].source] for key in self.in_edges.get(node_id, [])
+        ]
+
+    def _refresh_refs(self, node_id: str) -> bool:
+        """Re-read a node's {{node-id}} references; True if they changed."""
+        data = self.nodes_dict[node_id].data
+        refs = [
+            ref.strip()
+            for text in ((data.Prompt, data.Instructions) if data else ())
+            for ref in VARIABLE_PATTERN.findall(text or "")
+        ]
+        changed = refs != self.refs.get(node_id)
+        self.refs[node_id] = refs
+        return changed
+
+    def ensure_planned(self) -> None:
+        """Re-derive the order-dependent state if edits left it stale."""
+        if self._dirty:
+            self._plan()
+
+    def _plan(self) -> None:
+        """
+        Derive the DAG check, execution order and dependencies.
+
+        The order is Kahn's algorithm over nodes and connected edges in plan
+        order, as in a fresh compile. A node depends on its edge sources and
+        on any node it references as {{node-id}} that comes earlier in the
+        execution order - exactly the references that resolved to computed
+        outputs under sequential execution, so concurrent runs produce the
+        same prompts.
+        """
+        nodes = self.nodes
+        edges = [edge for key, edge in self.edges_dict.items() if key not in self._dangling]
+        order = topological_sort(nodes, edges)
+        # Nodes on or behind a cycle never reach in-degree 0
+        self._is_dag = len(order) == len(nodes)
+        self._order: List[str] = order if self._is_dag else []
+        self._position: Dict[str, int] = {node_id: i for i, node_id in enumerate(self._order)}
+        self._dependencies: Dict[str, Set[str]] = {}
+        self._dependents: Dict[str, Set[str]] = {node_id: set() for node_id in self._order}
+
+        position = self._position
+        for node_id in self._order:
+            deps = {source.id for source in self.inputs[node_id]}
+            for ref in self.refs[node_id]:
+                if ref in position and position[ref] < position[node_id]:
+                    deps.add(ref)
+            self._dependencies[node_id] = deps
+            for dep in deps:
+                self._dependents[dep].add(node_id)
+        self._dirty = False
+
+    def _update_type_lists(self, node: PipelineNode) -> None:
+        for ids, types in ((self.input_node_ids, self.input_types), (self.output_node_ids, self.output_types)):
+            matches = bool(find_nodes_by_type([node], types))
+            if matches and node.id not in ids:
+                ids.append(node.id)
+            elif not matches and node.id in ids:
+                ids.remove(node.id)
+
+    # Incremental edits
+
+    def add_node(self, node: PipelineNode) -> None:
+        if node.id in self.nodes_dict:
+            raise ValueError(f"Node '{node.id}' already exists")
+        if len(self.nodes_dict) >= PIPELINE_MAX_NODES:
+            raise ValueError(f"A pipeline can have at most {PIPELINE_MAX_NODES} nodes")
+        self.nodes_dict[node.id] = node
+        self.in_edges[node.id] = []
+        self.out_edges[node.id] = []
+        self._refresh_inputs(node.id)
+        self._refresh_refs(node.id)
+        self._update_type_lists(node)
+        self._dirty = True
+
+        # Edges added before this node now connect; they move to the end of the
+        # edge order, matching where _attach_edge appends them
+        connected = [
+            key for key in self._dangling
+            if node.id in (self.edges_dict[key].source, self.edges_dict[key].target)
+        ]
+        for key in connected:
+            del self._dangling[key]
+            self.edges_dict[key] = self.edges_dict.pop(key)
+            self._attach_edge(key)
+
+    def remove_node(self, node_id: str) -> None:
+        if node_id not in self.nodes_dict:
+            raise KeyError(f"Node '{node_id}' not found")
+        for key in self.in_edges[node_id] + self.out_edges[node_id]:
+            if key in self.edges_dict:
+                self.remove_edge(key)
+
+        del self.nodes_dict[node_id]
+        del self.in_edges[node_id]
+        del self.out_edges[node_id]
+        del self.refs[node_id]
+        self.inputs.pop(node_id, None)
+        for ids in (self.input_node_ids, self.output_node_ids):
+            if node_id in ids:
+                ids.remove(node_id)
+        self._dirty = True
+
+    def update_node(self, node_id: str, changes: Dict[str, Any]) -> None:
+        """Merge changes into a node; a "data" dict is merged into node.data."""
+        old = self.nodes_dict.get(node_id)
+        if old is None:
+            raise KeyError(f"Node '{node_id}' not found")
+
+        changes = dict(changes)
+        if "id" in changes and changes["id"] != node_id:
+            raise ValueError("Node id cannot be changed; remove and add the node instead")
+        data_changes = changes.pop("data", None)
+        merged = {**old.model_dump(exclude_unset=True), **changes}
+        if data_changes is not None:
+            base = old.data.model_dump() if old.data else {"id": node_id, "nodeType": old.type or ""}
+            merged["data"] = NodeData.model_validate({**base, **data_changes})
+        node = PipelineNode.model_validate(merged)
+
+        self.nodes_dict[node_id] = node
+        self._update_type_lists(node)
+        if self._refresh_refs(node_id):
+            self._dirty = True
+        # Downstream nodes hold the node object in their inputs
+        for key in self.out_edges[node_id]:
+            self._refresh_inputs(self.edges_dict[key].target)
+
+    def add_edge(self, edge: PipelineEdge) -> str:
+        if len(self.edges_dict) >= PIPELINE_MAX_EDGES:
+            raise ValueError(f"A pipeline can have at most {PIPELINE_MAX_EDGES} edges")
+        # An id-less edge gets the key a full compile would give it as the
+        # last edge (skipping keys kept by earlier edits), so parallel edges
+        # between the same nodes each get their own key
+        index = self.num_edges
+        key = edge_key(edge, index)
+        while edge.id is None and key in self.edges_dict:
+            index += 1
+            key = edge_key(edge, index)
+        if key in self.edges_dict:
+            raise ValueError(f"Edge '{key}' already exists")
+        self.edges_dict[key] = edge
+        self._attach_edge(key)
+        return key
+
+    def _attach_edge(self, key: str) -> None:
+        edge = self.edges_dict[key]
+        if edge.source not in self.nodes_dict or edge.target not in self.nodes_dict:
+            # Dangling edges are kept (as in full submissions) but ignored
+            self._dangling[key] = None
+            return
+
+        self.out_edges[edge.source] = self.out_edges[edge.source] + [key]
+        self.in_edges[edge.target] = self.in_edges[edge.target] + [key]
+        self._refresh_inputs(edge.target)
+        self._dirty = True
+
+    def remove_edge(self, key: str) -> None:
+        edge = self.edges_dict.pop(key, None)
+        if edge is None:
+            raise KeyError(f"Edge '{key}' not found")
+        if key in self._dangling:
+            del self._dangling[key]
+            return
+        self.out_edges[edge.source] = [k for k in self.out_edges[edge.source] if k != key]
+        self.in_edges[edge.target] = [k for k in self.in_edges[edge.target] if k != key]
+        self._refresh_inputs(edge.target)
+        self._dirty = True
+
+    def update_edge(self, key: str, changes: Dict[str, Any]) -> str:
+        """Merge changes into an edge; moving its endpoints re-wires it."""
+        old = self.edges_dict.get(key)
+        if old is None:
+            raise KeyError(f"Edge '{key}' not found")
+        edge = PipelineEdge.model_validate({**old.model_dump(exclude_unset=True), **changes})
+
+        if (edge.source, edge.target) != (old.source, old.target) or edge.id != old.id:
+            self.remove_edge(key)
+            return self.add_edge(edge)
+        self.edges_dict[key] = edge
+        return key
+
+    def copy(self) -> "PipelinePlan":
+        """
+        Copy the plan for copy-on-write edits.
+
+        Only the top-level containers are copied: per-node lists are replaced
+        rather than mutated by edits, and the planned state is replaced as a
+        whole when the copy is re-planned, so both are shared with the original.
+        """
+        clone = copy.copy(self)
+        for name in ("nodes_dict", "edges_dict", "input_node_ids", "output_node_ids", "_dangling",
+                     "in_edges", "out_edges", "inputs", "refs"):
+            setattr(clone, name, copy.copy(getattr(self, name)))
+        return clone
+
+    def get_node(self, node_id: str) -> Optional[PipelineNode]:
+        return self.nodes_dict.get(node_id)
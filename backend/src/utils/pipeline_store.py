@@ -0,0 +1,224 @@
+# Pipeline store - server-held pipeline versions with their compiled plans
+
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Union
+
+from pydantic import ValidationError
+
+from src.config.settings import get_float, get_int
+from src.schemas import PipelineEdge, PipelineNode
+from src.utils.pipeline_plan import PipelinePlan
+from src.utils.shared_cache import shared_cache
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_STORE_MAX_ENTRIES = get_int("PIPELINE_STORE_MAX_ENTRIES", 256)
+# How long a draft stays in the shared cache after its last change
+PIPELINE_STORE_SHARED_TTL = get_float("PIPELINE_STORE_SHARED_TTL", 24 * 60 * 60)
+
+
+class VersionConflict(Exception):
+    """Raised when a patch's base version is not the stored version."""
+
+    def __init__(self, pipeline_id: str, base_version: int, current_version: int) -> None:
+        super().__init__(
+            f"Pipeline '{pipeline_id}' is at version {current_version}, "
+            f"patch was based on version {base_version}"
+        )
+        self.current_version = current_version
+
+
+class StoredPipeline:
+    """A pipeline draft: its version and compiled plan."""
+
+    def __init__(
+        self,
+        pipeline_id: str,
+        plan: PipelinePlan,
+        version: int = 1,
+        updated_at: Optional[float] = None
+    ) -> None:
+        self.pipeline_id = pipeline_id
+        self.plan = plan
+        self.version = version
+        self.updated_at = updated_at or time.time()
+
+
+class PipelineStore:
+    """
+    Bounded in-memory store of pipeline drafts (least recently used evicted).
+
+    Patches are applied incrementally to a copy of the stored plan's
+    containers (node objects are shared and only the edited nodes are
+    validated), the execution order is re-derived once for the whole patch,
+    and the copy is swapped in when every operation succeeded.
+    Published plans are never mutated, so in-flight runs keep the version
+    they started with and a failed patch leaves no partial edits behind.
+    Each version is a new StoredPipeline, so readers never see a version
+    number paired with another version's plan. Patches are applied without
+    holding the store's lock; of two concurrent patches to the same
+    version, the one committed second gets a VersionConflict.
+
+    With a shared cache backend, every version is also written to the
+    shared tier as JSON (the graph, its edge keys and version; never
+    pickles, so the cache cannot inject code), and recompiled by workers
+    that read it. A draft created on one worker can then be read and
+    patched on any other, and survives restarts. get() reads only the
+    version key while the local copy is current; patches hold a
+    cross-worker lock on the draft. Calls may block on the shared backend,
+    so async callers run them in a worker thread.
+    """
+
+    def __init__(self, max_entries: int = PIPELINE_STORE_MAX_ENTRIES, shared_ttl: float = PIPELINE_STORE_SHARED_TTL) -> None:
+        self.max_entries = max_entries
+        self.shared_ttl = shared_ttl
+        self._entries: "OrderedDict[str, StoredPipeline]" = OrderedDict()
+        # Guards _entries; held only briefly, never while a patch is applied
+        self._lock = threading.RLock()
+
+    def _put(self, stored: StoredPipeline) -> None:
+        with self._lock:
+            self._entries[stored.pipeline_id] = stored
+            self._entries.move_to_end(stored.pipeline_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _publish(self, stored: StoredPipeline) -> None:
+        """Write a version to the shared tier (graph first, so the version key never leads it)."""
+        if not shared_cache.shared:
+            return
+        plan = stored.plan
+        value = json.dumps({
+            "version": stored.version,
+            "updated_at": stored.updated_at,
+            "input_types": plan.input_types,
+            "output_types": plan.output_types,
+            "nodes": [node.model_dump(mode="json", exclude_unset=True) for node in plan.nodes],
+            "edges": [edge.model_dump(mode="json", exclude_unset=True) for edge in plan.edges],
+            "edge_keys": list(plan.edges_dict),
+        }).encode()
+        if not shared_cache.set("pipelines", stored.pipeline_id, "graph", value=value, ttl=self.shared_ttl):
+            logger.warning("Pipeline '%s' is too large for the shared cache, kept on this worker only", stored.pipeline_id)
+            return
+        shared_cache.set(
+            "pipelines", stored.pipeline_id, "version", value=str(stored.version).encode(), ttl=self.shared_ttl
+        )
+
+    @staticmethod
+    def _load(pipeline_id: str, value: bytes) -> Optional[StoredPipeline]:
+        """Validate and recompile a draft read from the shared tier (None if it is malformed)."""
+        try:
+            data = json.loads(value)
+            nodes = [PipelineNode.model_validate(node) for node in data["nodes"]]
+            edges = [PipelineEdge.model_validate(edge) for edge in data["edges"]]
+            edge_keys = [str(key) for key in data["edge_keys"]]
+            if len(edge_keys) != len(edges) or len(set(edge_keys)) != len(edges):
+                raise ValueError("edge keys do not match the edges")
+            plan = PipelinePlan(
+                nodes, edges, list(data["input_types"]), list(data["output_types"]), edge_keys=edge_keys
+            )
+            return StoredPipeline(pipeline_id, plan, int(data["version"]), float(data["updated_at"]))
+        except (ValueError, KeyError, TypeError, ValidationError) as e:
+            logger.warning("Ignoring malformed shared copy of pipeline '%s': %s", pipeline_id, e)
+            return None
+
+    def _refresh(self, pipeline_id: str, stored: Optional[StoredPipeline]) -> Optional[StoredPipeline]:
+        """Replace the local copy with the shared one if another worker has a newer version."""
+        if not shared_cache.shared:
+            return stored
+        version = shared_cache.get("pipelines", pipeline_id, "version")
+        if version is None or not version.isdigit() or (stored is not None and int(version) <= stored.version):
+            return stored
+        value = shared_cache.get("pipelines", pipeline_id, "graph")
+        shared = self._load(pipeline_id, value) if value is not None else None
+        if shared is None or (stored is not None and shared.version <= stored.version):
+            return stored
+        with self._lock:
+            current = self._entries.get(pipeline_id)
+            if current is not None and current.version >= shared.version:
+                return current
+            self._put(shared)
+        return shared
+
+    def create(self, plan: PipelinePlan) -> StoredPipeline:
+        stored = StoredPipeline(str(uuid.uuid4()), plan)
+        self._put(stored)
+        self._publish(stored)
+        return stored
+
+    def get(self, pipeline_id: str) -> Optional[StoredPipeline]:
+        with self._lock:
+            stored = self._entries.get(pipeline_id)
+        stored = self._refresh(pipeline_id, stored)
+        if stored is not None:
+            with self._lock:
+                if pipeline_id in self._entries:
+                    self._entries.move_to_end(pipeline_id)
+        return stored
+
+    def size(self, pipeline_id: str) -> int:
+        """Nodes + edges of this worker's copy of a pipeline (0 if it holds none)."""
+        with self._lock:
+            stored = self._entries.get(pipeline_id)
+        return stored.plan.num_nodes + stored.plan.num_edges if stored else 0
+
+    def patch(
+        self,
+        pipeline_id: str,
+        base_version: int,
+        operations: List[Callable[[PipelinePlan], None]]
+    ) -> StoredPipeline:
+        """
+        Apply edit operations to a stored pipeline atomically.
+
+        Raises:
+            KeyError: If the pipeline does not exist
+            VersionConflict: If base_version is stale
+            KeyError/ValueError: From an invalid operation (nothing is applied)
+            CacheLockTimeout: If another worker held the draft's lock for too long
+        """
+        if not shared_cache.shared:
+            return self._patch(pipeline_id, base_version, operations)
+        # Another worker may be patching the same draft
+        with shared_cache.lock("pipelines", pipeline_id):
+            stored = self._patch(pipeline_id, base_version, operations)
+            self._publish(stored)
+            return stored
+
+    def _patch(
+        self,
+        pipeline_id: str,
+        base_version: int,
+        operations: List[Callable[[PipelinePlan], None]]
+    ) -> StoredPipeline:
+        stored = self.get(pipeline_id)
+        if stored is None:
+            raise KeyError(f"Pipeline '{pipeline_id}' not found")
+        if base_version != stored.version:
+            raise VersionConflict(pipeline_id, base_version, stored.version)
+
+        plan = stored.plan.copy()
+        for operation in operations:
+            operation(plan)
+        # Plan before publishing: published plans are read concurrently
+        plan.ensure_planned()
+
+        updated = StoredPipeline(pipeline_id, plan, stored.version + 1)
+        with self._lock:
+            # A concurrent patch on this worker committed first
+            current = self._entries.get(pipeline_id)
+            if current is not None and current.version != stored.version:
+                raise VersionConflict(pipeline_id, base_version, current.version)
+            self._put(updated)
+        return updated
+
+    def stats(self) -> Dict[str, Union[int, bool]]:
+        return {"entries": len(self._entries), "max_entries": self.max_entries, "shared": shared_cache.shared}
+
+
+pipeline_store = PipelineStore()
@@ -0,0 +1,153 @@
+# Sampling profiler - folded stack profiles of individual requests
+
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional
+
+from src.config.settings import get_float, get_int
+
+PROFILING_INTERVAL_MS = get_float("PROFILING_INTERVAL_MS", 5.0)
+PROFILING_MAX_SECONDS = get_float("PROFILING_MAX_SECONDS", 30.0)
+PROFILING_MAX_PROFILES = get_int("PROFILING_MAX_PROFILES", 32)
+PROFILING_MAX_DEPTH = get_int("PROFILING_MAX_DEPTH", 128)
+
+# Threads whose innermost frame is in one of these files are waiting, not working
+IDLE_FILES = ("threading.py", "selectors.py", "queue.py")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _fold(frame, max_depth: int) -> List[str]:
+    """Stack of a frame, outermost first."""
+    labels = []
+    while frame is not None and len(labels) < max_depth:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+class ProfileSession:
+    """Samples collected for one request."""
+
+    def __init__(self, method: str, path: str) -> None:
+        self.profile_id = str(uuid.uuid4())
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.samples = 0
+        self.overlapping_requests = 0
+        self.stacks: Counter = Counter()
+
+    @property
+    def expired(self) -> bool:
+        return time.time() - self.started_at > PROFILING_MAX_SECONDS
+
+    def folded(self) -> str:
+        """Brendan Gregg's folded format, readable by flamegraph.pl and speedscope."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "profile_id": self.profile_id,
+            "method": self.method,
+            "path": self.path,
+            "started_at": self.started_at,
+            "duration": round(self.duration, 4),
+            "samples": self.samples,
+            "overlapping_requests": self.overlapping_requests,
+        }
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampler over every thread in the process.
+
+    A single daemon thread reads sys._current_frames() while at least one
+    request is being profiled, so both the event loop and threadpool
+    workers (sync routes and dependencies) are covered. Each sample is
+    rooted at its thread name. Idle threads are skipped. Samples cannot
+    be told apart by request, so ProfilingMiddleware only profiles a
+    request while it is alone on the worker and reports any that started
+    during the profile via note_request().
+    """
+
+    def __init__(
+        self,
+        interval_ms: float = PROFILING_INTERVAL_MS,
+        max_profiles: int = PROFILING_MAX_PROFILES,
+        max_depth: int = PROFILING_MAX_DEPTH,
+    ) -> None:
+        self.interval = interval_ms / 1000.0
+        self.max_profiles = max_profiles
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+        self._active: List[ProfileSession] = []
+        self._thread: Optional[threading.Thread] = None
+        self._profiles: "OrderedDict[str, ProfileSession]" = OrderedDict()
+
+    def start(self, method: str, path: str) -> ProfileSession:
+        session = ProfileSession(method, path)
+        with self._lock:
+            self._active.append(session)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+                self._thread.start()
+        return session
+
+    def note_request(self) -> None:
+        """Record an unprofiled request starting while profiles are running."""
+        with self._lock:
+            for session in self._active:
+                session.overlapping_requests += 1
+
+    def stop(self, session: ProfileSession) -> None:
+        session.duration = time.time() - session.started_at
+        with self._lock:
+            if session in self._active:
+                self._active.remove(session)
+            self._profiles[session.profile_id] = session
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+
+    def _run(self) -> None:
+        sampler_id = threading.get_ident()
+        while True:
+            with self._lock:
+                active = [s for s in self._active if not s.expired]
+                if not self._active:
+                    self._thread = None
+                    return
+
+            if active:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stacks = []
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == sampler_id or frame.f_code.co_filename.endswith(IDLE_FILES):
+                        continue
+                    labels = _fold(frame, self.max_depth)
+                    stacks.append(";".join([names.get(thread_id, str(thread_id))] + labels))
+                for session in active:
+                    session.samples += 1
+                    session.stacks.update(stacks)
+
+            time.sleep(self.interval)
+
+    def get(self, profile_id: str) -> Optional[ProfileSession]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [session.summary() for session in reversed(self._profiles.values())]
+
+
+profiler = SamplingProfiler()
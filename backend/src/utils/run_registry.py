@@ -0,0 +1,161 @@
+# Run registry - tracks in-flight pipeline runs so they can be cancelled
+
+import asyncio
+import logging
+from typing import Any, Coroutine, Dict, Optional
+
+from fastapi import HTTPException, status
+from starlette.requests import Request
+
+from src.config.settings import get_float
+
+logger = logging.getLogger(__name__)
+
+# How often an in-flight run checks whether its client has gone away
+DISCONNECT_POLL_INTERVAL = get_float("DISCONNECT_POLL_INTERVAL", 0.25)
+
+
+class RunCancelled(Exception):
+    """Raised when a run is cancelled before it completes."""
+
+    def __init__(self, run_id: str, reason: str) -> None:
+        super().__init__(f"Pipeline run '{run_id}' was cancelled ({reason})")
+        self.run_id = run_id
+        self.reason = reason
+
+
+class RunIdInUse(HTTPException):
+    """409 raised when a run is started with the id of a run still in flight."""
+
+    def __init__(self, run_id: str) -> None:
+        super().__init__(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"A run with id '{run_id}' is already in progress"
+        )
+        self.run_id = run_id
+
+
+class RunStats:
+    """Process-wide counters for cancelled and abandoned work."""
+
+    def __init__(self) -> None:
+        self.runs_started = 0
+        self.runs_cancelled = 0
+        self.cancel_reasons: Dict[str, int] = {}
+        self.abandoned_node_tasks = 0   # LLM node calls cancelled while in flight
+        self.skipped_nodes = 0          # Nodes that never started because of a cancel
+
+    def record_cancel(self, reason: str) -> None:
+        self.runs_cancelled += 1
+        self.cancel_reasons[reason] = self.cancel_reasons.get(reason, 0) + 1
+
+    def record_abandoned(self, in_flight: int, not_started: int) -> None:
+        self.abandoned_node_tasks += in_flight
+        self.skipped_nodes += not_started
+        logger.info("Abandoned %d in-flight node task(s), skipped %d node(s)", in_flight, not_started)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "runs_started": self.runs_started,
+            "runs_cancelled": self.runs_cancelled,
+            "cancel_reasons": dict(self.cancel_reasons),
+            "abandoned_node_tasks": self.abandoned_node_tasks,
+            "skipped_nodes": self.skipped_nodes,
+        }
+
+
+class RunHandle:
+    """An in-flight run and why it was cancelled, if it was."""
+
+    def __init__(self, run_id: str, task: "asyncio.Task") -> None:
+        self.run_id = run_id
+        self.task = task
+        self.cancel_reason: Optional[str] = None
+
+    def cancel(self, reason: str) -> None:
+        if not self.task.done() and self.cancel_reason is None:
+            self.cancel_reason = reason
+            self.task.cancel()
+
+
+class RunRegistry:
+    """
+    Runs pipeline coroutines as cancellable tasks keyed by run id.
+
+    A run is cancelled when its client disconnects or when cancel() is
+    called for its id (job-style runs). Run ids are unique among in-flight
+    runs; a second run with the id of one still in flight is rejected, never
+    allowed to replace it. Runs are tracked per worker process.
+    """
+
+    def __init__(self) -> None:
+        self._runs: Dict[str, RunHandle] = {}
+        self.stats = RunStats()
+
+    def get(self, run_id: str) -> Optional[RunHandle]:
+        return self._runs.get(run_id)
+
+    def cancel(self, run_id: str, reason: str = "cancelled") -> bool:
+        """Cancel an in-flight run; returns False if no such run is running."""
+        handle = self._runs.get(run_id)
+        if handle is None or handle.task.done():
+            return False
+        handle.cancel(reason)
+        return True
+
+    async def _watch_disconnect(self, request: Request, handle: RunHandle) -> None:
+        while not handle.task.done():
+            if await request.is_disconnected():
+                handle.cancel("client_disconnected")
+                return
+            await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+
+    async def execute(self, run_id: str, coro: Coroutine[Any, Any, Any], request: Optional[Request] = None) -> Any:
+        """
+        Run a coroutine as a cancellable run.
+
+        Args:
+            run_id: Run identifier, unique among in-flight runs
+            coro: The pipeline work to run
+            request: If given, the run is cancelled when this client disconnects
+
+        Returns:
+            The coroutine's result
+
+        Raises:
+            RunIdInUse: If a run with the same id is still in flight
+            RunCancelled: If the run was cancelled before completing
+        """
+        previous = self._runs.get(run_id)
+        if previous is not None and not previous.task.done():
+            # The coroutine was never scheduled; close it so it is not leaked
+            coro.close()
+            raise RunIdInUse(run_id)
+
+        handle = RunHandle(run_id, asyncio.create_task(coro))
+        self._runs[run_id] = handle
+        self.stats.runs_started += 1
+        watcher = asyncio.create_task(self._watch_disconnect(request, handle)) if request else None
+
+        try:
+            # asyncio.wait does not raise when the inner task is cancelled,
+            # so a CancelledError here always means this handler was cancelled
+            await asyncio.wait({handle.task})
+        except asyncio.CancelledError:
+            handle.cancel("handler_cancelled")
+            self.stats.record_cancel("handler_cancelled")
+            raise
+        finally:
+            if watcher:
+                watcher.cancel()
+            if self._runs.get(run_id) is handle:
+                del self._runs[run_id]
+
+        if handle.task.cancelled():
+            reason = handle.cancel_reason or "cancelled"
+            self.stats.record_cancel(reason)
+            raise RunCancelled(run_id, reason)
+        return handle.task.result()
+
+
+run_registry = RunRegistry()
@@ -0,0 +1,218 @@
+# Run results store - persists pipeline run outputs in batches, off the request path
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from itertools import islice
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlmodel import Session
+
+from src.config.settings import get_bool, get_float, get_int
+
+logger = logging.getLogger(__name__)
+
+# Store run results at all (needs the pipeline_runs table, see `init-db`)
+RUN_RESULTS_ENABLED = get_bool("RUN_RESULTS_ENABLED", True)
+# How long results can be fetched after the run finished
+RUN_RESULTS_TTL_SECONDS = get_int("RUN_RESULTS_TTL_SECONDS", 24 * 60 * 60)
+# Results written per INSERT, and the longest a result waits to be written
+RUN_RESULTS_BATCH_SIZE = get_int("RUN_RESULTS_BATCH_SIZE", 50)
+RUN_RESULTS_FLUSH_INTERVAL = get_float("RUN_RESULTS_FLUSH_INTERVAL", 1.0)
+# Unwritten results kept in memory (oldest dropped beyond this, e.g. while the DB is down)
+RUN_RESULTS_MAX_PENDING = get_int("RUN_RESULTS_MAX_PENDING", 1_000)
+# How often expired results are deleted
+RUN_RESULTS_CLEANUP_INTERVAL = get_float("RUN_RESULTS_CLEANUP_INTERVAL", 600.0)
+
+
+class RunResultStore:
+    """
+    Write-behind store for pipeline run results.
+
+    record() only puts the result in an in-memory buffer, so finishing a run
+    never waits on the database. A background task started from the lifespan
+    writes the buffer in multi-row upserts (every RUN_RESULTS_FLUSH_INTERVAL
+    seconds, or as soon as a batch is full) from a worker thread, and
+    periodically deletes rows past their expiry. Buffered results are served
+    by get() until they are written, so a result can be fetched as soon as
+    its response was sent. If a write fails the batch stays buffered and is
+    retried; the buffer is bounded, dropping the oldest results first.
+    """
+
+    def __init__(
+        self,
+        ttl: int = RUN_RESULTS_TTL_SECONDS,
+        batch_size: int = RUN_RESULTS_BATCH_SIZE,
+        flush_interval: float = RUN_RESULTS_FLUSH_INTERVAL,
+        max_pending: int = RUN_RESULTS_MAX_PENDING,
+        cleanup_interval: float = RUN_RESULTS_CLEANUP_INTERVAL,
+        enabled: bool = RUN_RESULTS_ENABLED,
+    ) -> None:
+        self.ttl = ttl
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_pending = max(1, max_pending)
+        self.cleanup_interval = cleanup_interval
+        self.enabled = enabled
+        self.written = 0
+        self.dropped = 0
+        self.failed_writes = 0
+        self.expired = 0
+        self._pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def record(
+        self,
+        run_id: str,
+        status: str,
+        num_nodes: int,
+        num_edges: int,
+        is_dag: bool,
+        outputs: Optional[List[Dict[str, str]]] = None,
+        node_outputs: Optional[Dict[str, str]] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        """Buffer a finished run's result for writing; never blocks."""
+        if not self.enabled:
+            return
+        now = datetime.utcnow()
+        # A rerun with the same id replaces the buffered result
+        self._pending.pop(run_id, None)
+        self._pending[run_id] = {
+            "run_id": run_id,
+            "status": status,
+            "num_nodes": num_nodes,
+            "num_edges": num_edges,
+            "is_dag": is_dag,
+            "outputs": outputs,
+            "node_outputs": node_outputs,
+            "error": error,
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=self.ttl),
+        }
+        while len(self._pending) > self.max_pending:
+            dropped_id, _ = self._pending.popitem(last=False)
+            self.dropped += 1
+            logger.warning("Run results buffer full, dropped result of run '%s'", dropped_id)
+        if self._wakeup is not None and len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def get_pending(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """A result that is buffered but not yet written, if any."""
+        return self._pending.get(run_id)
+
+    def get(self, db: Session, run_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Fetch a run's result, from the buffer or the database.
+
+        Returns:
+            The result row as a dict, or None if unknown or expired
+        """
+        from src.models import PipelineRun
+
+        row = self.get_pending(run_id)
+        if row is None:
+            run = db.get(PipelineRun, run_id)
+            row = run.model_dump() if run is not None else None
+        if row is None or row["expires_at"] <= datetime.utcnow():
+            return None
+        return row
+
+    async def start(self) -> None:
+        """Start the background writer; called from the lifespan."""
+        if not self.enabled or self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the writer and write what is still buffered."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._wakeup = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        next_cleanup = time.monotonic() + self.cleanup_interval
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+            if time.monotonic() >= next_cleanup:
+                next_cleanup = time.monotonic() + self.cleanup_interval
+                try:
+                    self.expired += await asyncio.to_thread(self._delete_expired)
+                except Exception as e:
+                    logger.warning("Deleting expired run results failed: %s", e)
+
+    async def flush(self) -> None:
+        """Write all buffered results, one upsert per batch."""
+        while self._pending:
+            batch = list(islice(self._pending.values(), self.batch_size))
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except Exception as e:
+                self.failed_writes += 1
+                logger.warning("Writing %d run result(s) failed, will retry: %s", len(batch), e)
+                return
+            self.written += len(batch)
+            for row in batch:
+                # Keep a result recorded again while this batch was being written
+                if self._pending.get(row["run_id"]) is row:
+                    del self._pending[row["run_id"]]
+
+    @staticmethod
+    def _write(rows: List[Dict[str, Any]]) -> None:
+        from sqlalchemy.dialects.postgresql import insert
+        from src.config.database import get_engine
+        from src.models import PipelineRun
+
+        statement = insert(PipelineRun.__table__).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=["run_id"],
+            set_={
+                column: statement.excluded[column]
+                for column in rows[0]
+                if column != "run_id"
+            },
+        )
+        with get_engine().begin() as connection:
+            connection.execute(statement)
+
+    @staticmethod
+    def _delete_expired() -> int:
+        from sqlalchemy import delete
+        from src.config.database import get_engine
+        from src.models import PipelineRun
+
+        with get_engine().begin() as connection:
+            result = connection.execute(
+                delete(PipelineRun).where(PipelineRun.expires_at <= datetime.utcnow())
+            )
+        return result.rowcount or 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl,
+            "pending": len(self._pending),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed_writes": self.failed_writes,
+            "expired": self.expired,
+        }
+
+
+run_results = RunResultStore()
@@ -0,0 +1,140 @@
+# Node scheduler - critical-path priorities and a shared priority limiter
+
+import asyncio
+import heapq
+import itertools
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config.settings import get_float, get_int
+
+# Priority classes, lower rank is admitted first
+PRIORITY_CLASSES = {"interactive": 0, "batch": 1}
+DEFAULT_PRIORITY = "interactive"
+
+# Node slots shared by every run on this worker
+PIPELINE_MAX_CONCURRENT_NODES = get_int("PIPELINE_MAX_CONCURRENT_NODES", 16)
+
+# Latency assumed for an LLM node type before any run has been observed
+SCHEDULER_DEFAULT_LLM_LATENCY = get_float("SCHEDULER_DEFAULT_LLM_LATENCY", 2.0)
+SCHEDULER_LATENCY_ALPHA = get_float("SCHEDULER_LATENCY_ALPHA", 0.2)
+
+
+def priority_rank(priority: str) -> int:
+    """Map a priority class name to its rank (unknown names rank as batch)."""
+    return PRIORITY_CLASSES.get((priority or DEFAULT_PRIORITY).lower(), max(PRIORITY_CLASSES.values()))
+
+
+def request_priority(requested: Optional[str], default: str, admin: bool = False) -> str:
+    """
+    Priority class a request runs at.
+
+    Clients may lower their priority below the endpoint's default; a higher
+    one is honoured only for admin requests, so unauthenticated batch jobs
+    cannot claim interactive slots.
+    """
+    if not requested:
+        return default
+    if admin or priority_rank(requested) >= priority_rank(default):
+        return requested
+    return default
+
+
+class LatencyTracker:
+    """Exponentially weighted moving average of node latency per node type."""
+
+    def __init__(self, default: float = SCHEDULER_DEFAULT_LLM_LATENCY, alpha: float = SCHEDULER_LATENCY_ALPHA) -> None:
+        self.default = default
+        self.alpha = alpha
+        self._estimates: Dict[str, float] = {}
+
+    def observe(self, node_type: str, seconds: float) -> None:
+        key = (node_type or "").lower()
+        previous = self._estimates.get(key)
+        self._estimates[key] = seconds if previous is None else previous + self.alpha * (seconds - previous)
+
+    def estimate(self, node_type: str) -> float:
+        return self._estimates.get((node_type or "").lower(), self.default)
+
+    def as_dict(self) -> Dict[str, float]:
+        return {key: round(value, 4) for key, value in self._estimates.items()}
+
+
+def critical_path_lengths(
+    order: List[str],
+    dependents: Dict[str, List[str]],
+    costs: Dict[str, float],
+) -> Dict[str, float]:
+    """
+    Estimated remaining critical path for each node.
+
+    remaining(n) = cost(n) + max(remaining(d) for d in dependents(n)), i.e.
+    the longest chain of estimated work from n to the end of the graph.
+    Nodes with the largest value gate the most downstream latency.
+    """
+    remaining: Dict[str, float] = {}
+    for node_id in reversed(order):
+        downstream = max((remaining[d] for d in dependents.get(node_id, ())), default=0.0)
+        remaining[node_id] = costs.get(node_id, 0.0) + downstream
+    return remaining
+
+
+class PriorityLimiter:
+    """
+    Async semaphore that admits waiters by priority rather than FIFO.
+
+    Keys are compared as tuples; the smallest key waiting gets the next free
+    slot. Ties fall back to arrival order.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.in_use = 0
+        self._waiters: List[Tuple[Any, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        # Waiters still pending (the heap also holds cancelled ones until popped)
+        self.waiting = 0
+
+    async def acquire(self, key: Any) -> None:
+        if self.in_use < self.capacity and not self.waiting:
+            self.in_use += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (key, next(self._seq), future))
+        self.waiting += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                self.waiting -= 1
+            else:
+                # The slot was handed over just as we were cancelled
+                self.release()
+            raise
+
+    def release(self) -> None:
+        self.in_use -= 1
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # Hand the slot straight to the highest-priority waiter
+                self.in_use += 1
+                self.waiting -= 1
+                future.set_result(None)
+                break
+
+    @asynccontextmanager
+    async def slot(self, key: Any):
+        await self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"capacity": self.capacity, "in_use": self.in_use, "waiting": self.waiting}
+
+
+latency_tracker = LatencyTracker()
+node_limiter = PriorityLimiter(PIPELINE_MAX_CONCURRENT_NODES)
@@ -0,0 +1,746 @@
+# Shared cache - a cache tier shared by all workers, with pluggable backends
+
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import secrets
+import struct
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from src.config.settings import get_env, get_float, get_int
+
+logger = logging.getLogger(__name__)
+
+# local (per worker), mmap (shared memory on one host) or redis (external key-value service)
+SHARED_CACHE_BACKEND = get_env("SHARED_CACHE_BACKEND", "local")
+SHARED_CACHE_URL = get_env("SHARED_CACHE_URL", "redis://localhost:6379/0")
+SHARED_CACHE_PATH = get_env("SHARED_CACHE_PATH")
+SHARED_CACHE_PREFIX = get_env("SHARED_CACHE_PREFIX", "nb")
+# Memory held by the local and mmap backends, and the largest value cached
+SHARED_CACHE_MAX_BYTES = get_int("SHARED_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+SHARED_CACHE_MAX_VALUE_BYTES = get_int("SHARED_CACHE_MAX_VALUE_BYTES", 4 * 1024 * 1024)
+SHARED_CACHE_DEFAULT_TTL = get_float("SHARED_CACHE_DEFAULT_TTL", 3600.0)
+# How long a worker trusts a namespace version before re-reading it
+SHARED_CACHE_VERSION_INTERVAL = get_float("SHARED_CACHE_VERSION_INTERVAL", 1.0)
+# Stampede protection: how long one builder holds a key, and others wait for it
+SHARED_CACHE_LOCK_TTL = get_float("SHARED_CACHE_LOCK_TTL", 30.0)
+SHARED_CACHE_LOCK_WAIT = get_float("SHARED_CACHE_LOCK_WAIT", 10.0)
+SHARED_CACHE_POLL_INTERVAL = 0.02
+
+_FAILED = object()
+
+# Deletes a lock key only while it still holds the caller's token
+_DELETE_IF_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class CacheLockTimeout(Exception):
+    """Raised when a cross-worker lock could not be acquired in time."""
+
+
+class _BuildAbandoned(Exception):
+    """Tells waiters that the caller building a value was cancelled."""
+
+
+class CacheBackend(ABC):
+    """
+    Byte-oriented key-value store behind SharedCache.
+
+    Backends store bytes under string keys with an optional TTL (seconds,
+    None = kept until deleted). Entries without a TTL (namespace versions)
+    are never evicted to make room, so an invalidation cannot be undone by
+    memory pressure. `add` and `delete_if` must be atomic across every
+    process that shares the backend; locks are built on them.
+    `remote` backends do network I/O, so async callers run them in a thread.
+    """
+
+    name = "base"
+    remote = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        ...
+
+    @abstractmethod
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        """Set only if the key is absent; returns whether it was set."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def delete_if(self, key: str, value: bytes) -> bool:
+        """Delete the key only if it holds `value`; returns whether it did."""
+
+    @abstractmethod
+    def incr(self, key: str) -> int:
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class InMemoryKV:
+    """
+    Bounded in-process key-value store with the subset of the redis-py
+    client API that KVBackend uses.
+
+    Backs the `local` backend and stands in for an external service in
+    tests. Past max_bytes, the least recently used entries that have a TTL
+    are evicted (like redis' volatile-lru policy).
+    """
+
+    def __init__(self, max_bytes: int = SHARED_CACHE_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, Tuple[bytes, Optional[float]]]" = OrderedDict()
+
+    def _live(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and expires <= time.monotonic():
+            self._pop(key)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def _pop(self, key: str) -> None:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.size -= len(key) + len(entry[0])
+
+    def get(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            return self._live(name)
+
+    def set(
+        self,
+        name: str,
+        value: bytes,
+        ex: Optional[float] = None,
+        px: Optional[int] = None,
+        nx: bool = False
+    ) -> Optional[bool]:
+        value = bytes(value) if not isinstance(value, bytes) else value
+        ttl = px / 1000 if px else ex
+        with self._lock:
+            if nx and self._live(name) is not None:
+                return None
+            self._pop(name)
+            self._data[name] = (value, time.monotonic() + ttl if ttl else None)
+            self.size += len(name) + len(value)
+            if self.size > self.max_bytes:
+                self._evict()
+            return True
+
+    def _evict(self) -> None:
+        for key in [key for key, (_, expires) in self._data.items() if expires is not None]:
+            if self.size <= self.max_bytes:
+                return
+            self._pop(key)
+
+    def delete(self, name: str) -> int:
+        with self._lock:
+            existed = name in self._data
+            self._pop(name)
+            return int(existed)
+
+    def delete_if(self, name: str, value: bytes) -> int:
+        with self._lock:
+            if self._live(name) != value:
+                return 0
+            self._pop(name)
+            return 1
+
+    def incr(self, name: str) -> int:
+        with self._lock:
+            value = int(self._live(name) or 0) + 1
+            self._pop(name)
+            encoded = str(value).encode()
+            self._data[name] = (encoded, None)
+            self.size += len(name) + len(encoded)
+            return value
+
+
+class KVBackend(CacheBackend):
+    """
+    Backend over a redis-compatible client (redis-py, or InMemoryKV).
+
+    With a real server every worker on every host shares the cache; bound
+    its memory on the server with maxmemory and the volatile-lru policy, so
+    namespace versions (stored without a TTL) are never evicted.
+    """
+
+    name = "kv"
+
+    def __init__(self, client: Any, remote: bool = True) -> None:
+        self.client = client
+        self.remote = remote
+
+    @classmethod
+    def from_url(cls, url: str) -> "KVBackend":
+        """Connect to a redis server (needs the optional `redis` package)."""
+        import redis
+
+        return cls(redis.Redis.from_url(url, socket_timeout=1.0, socket_connect_timeout=1.0))
+
+    @staticmethod
+    def _ttl(ttl: Optional[float]) -> Optional[int]:
+        """TTL in milliseconds."""
+        return max(1, int(ttl * 1000)) if ttl else None
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        return bool(self.client.set(key, value, px=self._ttl(ttl)))
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        return bool(self.client.set(key, value, px=self._ttl(ttl), nx=True))
+
+    def delete(self, key: str) -> None:
+        self.client.delete(key)
+
+    def delete_if(self, key: str, value: bytes) -> bool:
+        if isinstance(self.client, InMemoryKV):
+            return bool(self.client.delete_if(key, value))
+        return bool(self.client.eval(_DELETE_IF_SCRIPT, 1, key, value))
+
+    def incr(self, key: str) -> int:
+        return int(self.client.incr(key))
+
+    def stats(self) -> Dict[str, Any]:
+        if isinstance(self.client, InMemoryKV):
+            return {"bytes": self.client.size, "max_bytes": self.client.max_bytes}
+        return {}
+
+
+class MmapBackend(CacheBackend):
+    """
+    Cache in a memory-mapped file shared by the workers on one host.
+
+    The file (under /dev/shm where available, so it lives in memory) has a
+    fixed size, which bounds memory no matter how many workers map it. It
+    is split into size classes of fixed-size slots; each class is an
+    open-addressing hash table keyed by a 16-byte key digest, so a lookup
+    compares a few slot headers. When every slot a key can use is taken,
+    the least recently written entry that has a TTL is overwritten; entries
+    without one (namespace versions) are never evicted. Values larger than
+    the largest slot are not cached.
+
+    Every operation holds an flock on the file (shared for reads, exclusive
+    for writes), which makes `add` and `incr` atomic across processes.
+    Operations copy at most one value, so the lock is held for microseconds.
+    """
+
+    name = "mmap"
+    MAGIC = b"NBSC0001"
+    HEADER_SIZE = 4096
+    # Slot header: key digest, expiry (0 = none), written at, value length
+    SLOT_HEADER = struct.Struct("<16sddI4x")
+    PROBES = 8
+    EMPTY = b"\0" * 16
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_bytes: int = SHARED_CACHE_MAX_BYTES,
+        slot_sizes: Sequence[int] = (1024, 16 * 1024, 256 * 1024, SHARED_CACHE_MAX_VALUE_BYTES),
+    ) -> None:
+        import fcntl
+
+        self._fcntl = fcntl
+
+        # Split memory evenly over the size classes: (offset, slot size, slot count)
+        sizes = sorted(size + self.SLOT_HEADER.size for size in set(slot_sizes))
+        share = max(0, max_bytes - self.HEADER_SIZE) // len(sizes)
+        self.classes: List[Tuple[int, int, int]] = []
+        offset = self.HEADER_SIZE
+        for size in sizes:
+            count = max(1, share // size)
+            self.classes.append((offset, size, count))
+            offset += size * count
+        self.size = offset
+        self.max_value = sizes[-1] - self.SLOT_HEADER.size
+        layout = hashlib.blake2b(repr(self.classes).encode(), digest_size=8).hexdigest()
+
+        if path is None:
+            # One file per layout, so workers configured differently never share one
+            directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+            path = os.path.join(directory, f"{SHARED_CACHE_PREFIX}-cache-{os.getuid()}-{layout}")
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        header = self.MAGIC + layout.encode()
+        with self._locked(exclusive=True):
+            file_size = os.fstat(self._fd).st_size
+            if file_size == 0:
+                os.ftruncate(self._fd, self.size)
+                os.pwrite(self._fd, header, 0)
+                file_size = self.size
+            matches = file_size == self.size and os.pread(self._fd, len(header), 0) == header
+            self._map = mmap.mmap(self._fd, self.size) if matches else None
+        if self._map is None:
+            # Resizing it would crash the processes that have it mapped
+            os.close(self._fd)
+            raise ValueError(f"{path} is a shared cache with another layout")
+
+    @contextmanager
+    def _locked(self, exclusive: bool = False) -> Iterator[None]:
+        with self._lock:
+            self._fcntl.flock(self._fd, self._fcntl.LOCK_EX if exclusive else self._fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+
+    @staticmethod
+    def _digest(key: str) -> bytes:
+        return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+    def _slots(self, digest: bytes, classes: Optional[List[Tuple[int, int, int]]] = None) -> Iterator[int]:
+        """Offsets of the slots a key may occupy, per class."""
+        start = int.from_bytes(digest[:8], "little")
+        for offset, size, count in classes or self.classes:
+            for probe in range(min(self.PROBES, count)):
+                yield offset + ((start + probe) % count) * size
+
+    def _find(self, digest: bytes, now: float) -> Optional[int]:
+        for slot in self._slots(digest):
+            key, expires, _, _ = self.SLOT_HEADER.unpack_from(self._map, slot)
+            if key == digest:
+                return slot if not expires or expires > now else None
+        return None
+
+    def _read(self, slot: int) -> bytes:
+        length = self.SLOT_HEADER.unpack_from(self._map, slot)[3]
+        start = slot + self.SLOT_HEADER.size
+        return self._map[start:start + length]
+
+    def _write(self, digest: bytes, value: bytes, ttl: Optional[float], now: float) -> bool:
+        classes = [entry for entry in self.classes if entry[1] - self.SLOT_HEADER.size >= len(value)]
+        if not classes:
+            return False
+        # Drop any copy in another class (the value may have changed size)
+        for slot in self._slots(digest):
+            if self.SLOT_HEADER.unpack_from(self._map, slot)[0] == digest:
+                self.SLOT_HEADER.pack_into(self._map, slot, self.EMPTY, 0.0, 0.0, 0)
+        target = None
+        oldest = None
+        for slot in self._slots(digest, classes[:1]):
+            key, expires, written, _ = self.SLOT_HEADER.unpack_from(self._map, slot)
+            if key == self.EMPTY or (expires and expires <= now):
+                target = slot
+                break
+            if expires and (oldest is None or written < oldest[0]):
+                oldest = (written, slot)
+        if target is None:
+            if oldest is None:
+                # Every candidate slot holds an entry that must not be evicted
+                return False
+            target = oldest[1]
+        start = target + self.SLOT_HEADER.size
+        self._map[start:start + len(value)] = value
+        self.SLOT_HEADER.pack_into(self._map, target, digest, now + ttl if ttl else 0.0, now, len(value))
+        return True
+
+    def get(self, key: str) -> Optional[bytes]:
+        digest = self._digest(key)
+        with self._locked():
+            slot = self._find(digest, time.time())
+            return self._read(slot) if slot is not None else None
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        digest = self._digest(key)
+        with self._locked(exclusive=True):
+            return self._write(digest, value, ttl, time.time())
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        digest = self._digest(key)
+        with self._locked(exclusive=True):
+            now = time.time()
+            if self._find(digest, now) is not None:
+                return False
+            return self._write(digest, value, ttl, now)
+
+    def delete(self, key: str) -> None:
+        digest = self._digest(key)
+        with self._locked(exclusive=True):
+            for slot in self._slots(digest):
+                if self.SLOT_HEADER.unpack_from(self._map, slot)[0] == digest:
+                    self.SLOT_HEADER.pack_into(self._map, slot, self.EMPTY, 0.0, 0.0, 0)
+
+    def delete_if(self, key: str, value: bytes) -> bool:
+        digest = self._digest(key)
+        with self._locked(exclusive=True):
+            slot = self._find(digest, time.time())
+            if slot is None or self._read(slot) != value:
+                return False
+            self.SLOT_HEADER.pack_into(self._map, slot, self.EMPTY, 0.0, 0.0, 0)
+            return True
+
+    def incr(self, key: str) -> int:
+        digest = self._digest(key)
+        with self._locked(exclusive=True):
+            now = time.time()
+            slot = self._find(digest, now)
+            value = int(self._read(slot) or 0) + 1 if slot is not None else 1
+            if not self._write(digest, str(value).encode(), None, now):
+                raise RuntimeError(f"No free slot for counter '{key}' in {self.path}")
+            return value
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "bytes": self.size,
+            "slots": {size - self.SLOT_HEADER.size: count for _, size, count in self.classes},
+        }
+
+
+def build_backend(kind: str = SHARED_CACHE_BACKEND) -> CacheBackend:
+    """
+    Build the configured backend, falling back to the local one if it is
+    unavailable (no fcntl, no redis package or server).
+    """
+    try:
+        if kind == "mmap":
+            return MmapBackend(SHARED_CACHE_PATH)
+        if kind == "redis":
+            backend = KVBackend.from_url(SHARED_CACHE_URL)
+            backend.client.ping()
+            return backend
+        if kind != "local":
+            logger.warning("Unknown SHARED_CACHE_BACKEND '%s', using local", kind)
+    except Exception as e:
+        logger.warning("Shared cache backend '%s' unavailable (%s), using local", kind, e)
+    backend = KVBackend(InMemoryKV(), remote=False)
+    backend.name = "local"
+    return backend
+
+
+class SharedCache:
+    """
+    Versioned cache with stampede protection over a CacheBackend.
+
+    Keys are grouped in namespaces. Each namespace has a version counter in
+    the backend that is part of every key, so invalidate() makes all of a
+    namespace's entries unreachable at once for every worker; they then
+    age out by TTL or eviction. Workers re-read a version at most every
+    SHARED_CACHE_VERSION_INTERVAL seconds (one small read) and see an
+    invalidation from another worker within that interval.
+
+    get_or_set() builds a missing value once: concurrent callers in this
+    process wait for the first one, and callers in other processes wait on
+    a short-lived lock key in the backend until the value appears (or the
+    wait runs out and they build it themselves).
+
+    Backend errors are logged and treated as misses, so a cache outage
+    costs latency, never requests.
+    """
+
+    def __init__(
+        self,
+        backend_factory: Callable[[], CacheBackend] = build_backend,
+        prefix: str = SHARED_CACHE_PREFIX,
+        default_ttl: float = SHARED_CACHE_DEFAULT_TTL,
+        max_value_bytes: int = SHARED_CACHE_MAX_VALUE_BYTES,
+        version_interval: float = SHARED_CACHE_VERSION_INTERVAL,
+        lock_ttl: float = SHARED_CACHE_LOCK_TTL,
+        lock_wait: float = SHARED_CACHE_LOCK_WAIT,
+    ) -> None:
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+        self.max_value_bytes = max_value_bytes
+        self.version_interval = version_interval
+        self.lock_ttl = lock_ttl
+        self.lock_wait = lock_wait
+        self._backend_factory = backend_factory
+        self._backend: Optional[CacheBackend] = None
+        self._lock = threading.Lock()
+        self._versions: Dict[str, Tuple[int, float]] = {}
+        self._building: Dict[str, threading.Lock] = {}
+        self._abuilding: Dict[str, "asyncio.Future"] = {}
+        self.counts = {"hits": 0, "misses": 0, "builds": 0, "waits": 0, "errors": 0}
+
+    @property
+    def backend(self) -> CacheBackend:
+        # Built on first use, so importing this module opens no files or connections
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = self._backend_factory()
+        return self._backend
+
+    @property
+    def shared(self) -> bool:
+        """Whether entries are visible to other workers (any backend but local)."""
+        return self.backend.name != "local"
+
+    def _safe(self, operation: Callable[..., Any], *args: Any, default: Any = None) -> Any:
+        try:
+            return operation(*args)
+        except Exception as e:
+            self.counts["errors"] += 1
+            logger.warning("Shared cache %s failed: %s", getattr(operation, "__name__", "operation"), e)
+            return default
+
+    # Keys and versions
+
+    def version(self, namespace: str) -> int:
+        """Current version of a namespace (re-read at most every version_interval)."""
+        cached = self._versions.get(namespace)
+        now = time.monotonic()
+        if cached is not None and now - cached[1] < self.version_interval:
+            return cached[0]
+        raw = self._safe(self.backend.get, f"{self.prefix}:{namespace}:version", default=_FAILED)
+        if raw is _FAILED:
+            # Keep the last known version while the backend is unreachable
+            version = cached[0] if cached is not None else 0
+        else:
+            version = int(raw) if raw else 0
+        self._versions[namespace] = (version, now)
+        return version
+
+    def invalidate(self, namespace: str) -> None:
+        """Make every entry of a namespace unreachable, for all workers."""
+        version = self._safe(self.backend.incr, f"{self.prefix}:{namespace}:version")
+        if version is not None:
+            self._versions[namespace] = (version, time.monotonic())
+        else:
+            self._versions.pop(namespace, None)
+
+    def key(self, namespace: str, *parts: Any) -> str:
+        """Backend key for the parts in the namespace's current version."""
+        digest = hashlib.blake2b(digest_size=16)
+        for part in parts:
+            digest.update(str(part).encode("utf-8"))
+            digest.update(b"\0")
+        return f"{self.prefix}:{namespace}:{self.version(namespace)}:{digest.hexdigest()}"
+
+    # Plain access
+
+    def get(self, namespace: str, *parts: Any) -> Optional[bytes]:
+        value = self._safe(self.backend.get, self.key(namespace, *parts))
+        self.counts["hits" if value is not None else "misses"] += 1
+        return value
+
+    def set(self, namespace: str, *parts: Any, value: bytes, ttl: Optional[float] = None) -> bool:
+        if len(value) > self.max_value_bytes:
+            return False
+        return bool(self._safe(self.backend.set, self.key(namespace, *parts), value, ttl or self.default_ttl))
+
+    def delete(self, namespace: str, *parts: Any) -> None:
+        self._safe(self.backend.delete, self.key(namespace, *parts))
+
+    # Build once
+
+    @contextmanager
+    def lock(self, namespace: str, *parts: Any, wait: Optional[float] = None) -> Iterator[None]:
+        """
+        Hold a cross-process lock on a key while the block runs.
+
+        The lock holds a random token and is released only while it still
+        holds it, so a holder whose lock expired (lock_ttl) never releases
+        the next holder's lock. Blocks the calling thread while it waits;
+        async code should call it from a worker thread.
+
+        Raises:
+            CacheLockTimeout: If the lock was not acquired within `wait`
+                seconds (default lock_wait)
+        """
+        key = self.key(namespace, *parts) + ":lock"
+        token = self._acquire(key, self.lock_wait if wait is None else wait)
+        if token is None:
+            raise CacheLockTimeout(f"Timed out waiting for the lock on {namespace} {parts}")
+        try:
+            yield
+        finally:
+            self._release(key, token)
+
+    def _acquire(self, lock_key: str, wait: float) -> Optional[bytes]:
+        """Take a lock key, polling for up to `wait` seconds; returns its token or None."""
+        token = secrets.token_hex(16).encode()
+        deadline = time.monotonic() + wait
+        while True:
+            # If the backend is down nothing is shared, so there is nothing to lock
+            if self._safe(self.backend.add, lock_key, token, self.lock_ttl, default=True):
+                return token
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(SHARED_CACHE_POLL_INTERVAL)
+
+    def _release(self, lock_key: str, token: bytes) -> None:
+        self._safe(self.backend.delete_if, lock_key, token)
+
+    def get_or_set(
+        self,
+        namespace: str,
+        parts: Sequence[Any],
+        build: Callable[[], bytes],
+        ttl: Optional[float] = None
+    ) -> bytes:
+        """
+        Return the cached value, building and storing it once if it is missing.
+
+        Args:
+            namespace: Cache namespace (the unit of invalidation)
+            parts: Values identifying the entry within the namespace
+            build: Produces the value on a miss
+            ttl: Seconds to keep the value (default_ttl if None)
+        """
+        key = self.key(namespace, *parts)
+        value = self._safe(self.backend.get, key)
+        if value is not None:
+            self.counts["hits"] += 1
+            return value
+        self.counts["misses"] += 1
+
+        # One builder per key in this process...
+        with self._lock:
+            building = self._building.setdefault(key, threading.Lock())
+        with building:
+            try:
+                value = self._safe(self.backend.get, key)
+                if value is not None:
+                    self.counts["hits"] += 1
+                    return value
+                # ...and across processes
+                value = self._build_once(key, build, ttl)
+            finally:
+                with self._lock:
+                    self._building.pop(key, None)
+        return value
+
+    def _build_once(self, key: str, build: Callable[[], bytes], ttl: Optional[float]) -> bytes:
+        lock_key = key + ":lock"
+        token = self._acquire(lock_key, 0)
+        if token is None:
+            # Another process is building it: wait for the value, then build it ourselves
+            self.counts["waits"] += 1
+            deadline = time.monotonic() + self.lock_wait
+            while time.monotonic() < deadline:
+                time.sleep(SHARED_CACHE_POLL_INTERVAL)
+                value = self._safe(self.backend.get, key)
+                if value is not None:
+                    return value
+        try:
+            self.counts["builds"] += 1
+            value = build()
+            if len(value) <= self.max_value_bytes:
+                self._safe(self.backend.set, key, value, ttl or self.default_ttl)
+            return value
+        finally:
+            if token is not None:
+                self._release(lock_key, token)
+
+    async def _run(self, operation: Callable[..., Any], *args: Any, default: Any = None) -> Any:
+        if self.backend.remote:
+            return await asyncio.to_thread(self._safe, operation, *args, default=default)
+        return self._safe(operation, *args, default=default)
+
+    async def akey(self, namespace: str, *parts: Any) -> str:
+        """key() for async callers; re-reading the version of a remote backend runs in a thread."""
+        if self.backend.remote:
+            return await asyncio.to_thread(self.key, namespace, *parts)
+        return self.key(namespace, *parts)
+
+    async def aget_or_set(
+        self,
+        namespace: str,
+        parts: Sequence[Any],
+        build: Callable[[], Awaitable[bytes]],
+        ttl: Optional[float] = None
+    ) -> bytes:
+        """
+        get_or_set for async builders; remote backends are called in a thread.
+
+        If the caller building the value is cancelled, callers waiting for
+        it are not: the next one builds the value instead.
+        """
+        key = await self.akey(namespace, *parts)
+        value = await self._run(self.backend.get, key)
+        if value is not None:
+            self.counts["hits"] += 1
+            return value
+        self.counts["misses"] += 1
+
+        # Callers in this process share the first caller's build
+        while True:
+            pending = self._abuilding.get(key)
+            if pending is None:
+                break
+            self.counts["waits"] += 1
+            try:
+                return await asyncio.shield(pending)
+            except _BuildAbandoned:
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        self._abuilding[key] = future
+        try:
+            value = await self._abuild_once(key, build, ttl)
+        except BaseException as e:
+            future.set_exception(_BuildAbandoned() if isinstance(e, asyncio.CancelledError) else e)
+            # Waiters get the exception; do not warn if there were none
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            if self._abuilding.get(key) is future:
+                del self._abuilding[key]
+
+    async def _abuild_once(self, key: str, build: Callable[[], Awaitable[bytes]], ttl: Optional[float]) -> bytes:
+        lock_key = key + ":lock"
+        token = secrets.token_hex(16).encode()
+        if not await self._run(self.backend.add, lock_key, token, self.lock_ttl, default=True):
+            self.counts["waits"] += 1
+            token = None
+            deadline = time.monotonic() + self.lock_wait
+            while time.monotonic() < deadline:
+                await asyncio.sleep(SHARED_CACHE_POLL_INTERVAL * 5)
+                value = await self._run(self.backend.get, key)
+                if value is not None:
+                    return value
+        try:
+            self.counts["builds"] += 1
+            value = await build()
+            if len(value) <= self.max_value_bytes:
+                await self._run(self.backend.set, key, value, ttl or self.default_ttl)
+            return value
+        finally:
+            if token is not None:
+                await self._run(self.backend.delete_if, lock_key, token)
+
+    def as_dict(self) -> Dict[str, Any]:
+        backend = self._backend
+        return {
+            "backend": backend.name if backend else None,
+            **self.counts,
+            **(self._safe(backend.stats, default={}) if backend else {}),
+        }
+
+
+shared_cache = SharedCache()
@@ -0,0 +1,331 @@
+# Token budgets - local prompt token estimates and per-node / per-run prompt limits
+
+import asyncio
+import math
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+
+from src.config.limits import LLM_NODE_MAX_PROMPT_TOKENS, PIPELINE_MAX_PROMPT_TOKENS, TOKEN_BUDGET_POLICY
+from src.config.settings import get_env, get_float, get_int
+from src.schemas import LLMNodeUsage, PipelineTokenUsage
+from src.utils.llm_providers import LLMResult
+
+# Characters (UTF-8 bytes for non-ASCII text) per token assumed by the estimator
+TOKEN_CHARS_PER_TOKEN = get_float("TOKEN_CHARS_PER_TOKEN", 4.0)
+# Weight of the newest observed actual/estimated ratio in the calibration
+TOKEN_CALIBRATION_ALPHA = get_float("TOKEN_CALIBRATION_ALPHA", 0.1)
+# summarize policy: largest input chunk sent to one summary call, and its model
+TOKEN_SUMMARY_CHUNK_TOKENS = get_int("TOKEN_SUMMARY_CHUNK_TOKENS", 8_000)
+TOKEN_SUMMARY_MODEL = get_env("TOKEN_SUMMARY_MODEL")
+
+BUDGET_POLICIES = ("truncate", "summarize", "fail")
+TRUNCATION_MARKER = "\n[...truncated]"
+SUMMARY_INSTRUCTIONS = (
+    "Summarize the text below in at most {words} words. Keep every fact, name and number "
+    "that could matter to a later question about it. Reply with the summary only."
+)
+
+# Completes (prompt, instructions) with the node's LLM
+Complete = Callable[[str, str], Awaitable[LLMResult]]
+
+
+class TokenBudgetExceeded(HTTPException):
+    """413 raised when a prompt is over budget under the fail policy."""
+
+    def __init__(self, detail: str) -> None:
+        super().__init__(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+
+
+class TokenEstimator:
+    """
+    Fast local prompt token estimate, calibrated against reported usage.
+
+    Text is measured in characters (UTF-8 bytes when it is not ASCII, as
+    non-Latin scripts take more tokens per character) divided by
+    TOKEN_CHARS_PER_TOKEN. No tokenizer runs, so estimating a large prompt
+    costs about as much as copying it once. Whenever a backend reports the
+    real prompt token count, the ratio of actual to estimated tokens
+    updates a moving correction factor, and the totals are kept per model
+    for /pipelines/runs/stats.
+    """
+
+    def __init__(self, chars_per_token: float = TOKEN_CHARS_PER_TOKEN, alpha: float = TOKEN_CALIBRATION_ALPHA) -> None:
+        self.chars_per_token = chars_per_token
+        self.alpha = alpha
+        self.correction = 1.0
+        self._models: Dict[str, Dict[str, int]] = {}
+
+    def estimate(self, text: str) -> int:
+        if not text:
+            return 0
+        units = len(text) if text.isascii() else len(text.encode("utf-8"))
+        return math.ceil(units / self.chars_per_token * self.correction)
+
+    def estimate_parts(self, parts: Sequence[str]) -> int:
+        return sum(self.estimate(part) for part in parts)
+
+    def observe(self, model: str, estimated: int, actual: Optional[int]) -> None:
+        """Record a call's estimated and reported prompt tokens."""
+        if not actual or not estimated:
+            return
+        ratio = min(max(actual / estimated, 0.5), 2.0)
+        self.correction = min(max(self.correction * (1 + self.alpha * (ratio - 1)), 0.25), 4.0)
+        totals = self._models.setdefault(model, {"calls": 0, "estimated": 0, "actual": 0})
+        totals["calls"] += 1
+        totals["estimated"] += estimated
+        totals["actual"] += actual
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "chars_per_token": self.chars_per_token,
+            "correction": round(self.correction, 4),
+            "models": {
+                model: {
+                    **totals,
+                    "error_pct": round(100.0 * (totals["estimated"] - totals["actual"]) / totals["actual"], 1),
+                }
+                for model, totals in self._models.items()
+            },
+        }
+
+
+token_estimator = TokenEstimator()
+
+
+def _truncate(text: str, tokens: int, max_tokens: int) -> str:
+    """Cut text estimated at `tokens` down to about `max_tokens`."""
+    if tokens <= max_tokens:
+        return text
+    keep = max(0, int(len(text) * max_tokens / tokens) - len(TRUNCATION_MARKER))
+    return text[:keep] + TRUNCATION_MARKER
+
+
+def _shares(sizes: List[int], available: int) -> List[int]:
+    """
+    Split `available` tokens over parts of the given sizes.
+
+    Parts that fit in an equal share keep their size and their unused share
+    goes to the others, so only the largest parts are cut.
+    """
+    shares = list(sizes)
+    remaining = available
+    open_parts = sorted(range(len(sizes)), key=lambda i: sizes[i])
+    while open_parts:
+        share = remaining // len(open_parts)
+        index = open_parts[0]
+        if sizes[index] > share:
+            for index in open_parts:
+                shares[index] = share
+            break
+        remaining -= sizes[index]
+        open_parts.pop(0)
+    return shares
+
+
+class RunTokenBudget:
+    """
+    Prompt token budget and usage report of one pipeline run.
+
+    Before an LLM node runs, fit() estimates its prompt and, if it is over
+    the node's allowance (the node budget, capped by what is left of the
+    pipeline budget), applies the node's policy:
+
+    - truncate: cut the largest prompt parts (usually upstream outputs)
+    - summarize: replace oversized parts with LLM summaries first, then cut
+      whatever is still over
+    - fail: raise TokenBudgetExceeded before any call is made
+
+    record() adds the tokens the backend reported, so the run's response
+    shows estimated next to actual usage per node.
+    """
+
+    def __init__(
+        self,
+        node_limit: int = LLM_NODE_MAX_PROMPT_TOKENS,
+        pipeline_limit: int = PIPELINE_MAX_PROMPT_TOKENS,
+        policy: str = TOKEN_BUDGET_POLICY,
+        estimator: TokenEstimator = token_estimator,
+    ) -> None:
+        self.node_limit = node_limit
+        self.pipeline_limit = pipeline_limit
+        self.policy = policy if policy in BUDGET_POLICIES else "truncate"
+        self.estimator = estimator
+        self.spent = 0
+        self.nodes: Dict[str, LLMNodeUsage] = {}
+        self._call_estimates: Dict[str, int] = {}
+
+    def allowance(self, node_limit: Optional[int] = None) -> Tuple[Optional[int], str]:
+        """Tokens the next prompt may use (None if unlimited) and which budget sets it."""
+        limit = node_limit if node_limit is not None else self.node_limit
+        if self.pipeline_limit:
+            left = max(0, self.pipeline_limit - self.spent)
+            if not limit or left < limit:
+                return left, "pipeline"
+        return (limit or None), "node"
+
+    def preflight(self, prompts: Dict[str, Tuple[int, Optional[int], Optional[str]]]) -> None:
+        """
+        Fail a run up front when prompt content known before it starts is over budget.
+
+        Args:
+            prompts: {node_id: (estimated tokens, node budget, node policy)} for
+                the LLM nodes whose prompts depend only on input nodes
+
+        Only nodes whose own (or inherited) policy is fail are checked, each
+        against its node budget and together against the pipeline budget:
+        since spent tokens never come back, fail-policy prompts that add up
+        to more than the pipeline budget cannot all fit, whatever order they
+        run in. Truncate and summarize nodes are fitted when they run.
+
+        Raises:
+            TokenBudgetExceeded: A fail-policy node, or all fail-policy nodes
+                together, are already over budget; no LLM call has been made yet
+        """
+        total = 0
+        for node_id, (tokens, node_limit, policy) in prompts.items():
+            if (policy if policy in BUDGET_POLICIES else self.policy) != "fail":
+                continue
+            total += tokens
+            limit = node_limit if node_limit is not None else self.node_limit
+            if limit and tokens > limit:
+                raise TokenBudgetExceeded(
+                    f"Prompt of node '{node_id}' is about {tokens} tokens, over the node budget of {limit}"
+                )
+        if self.pipeline_limit and total > self.pipeline_limit:
+            raise TokenBudgetExceeded(
+                f"Prompts of fail-policy nodes are about {total} tokens before any LLM output "
+                f"is added, over the pipeline budget of {self.pipeline_limit}"
+            )
+
+    async def fit(
+        self,
+        node_id: str,
+        instructions: str,
+        parts: List[str],
+        complete: Complete,
+        node_limit: Optional[int] = None,
+        policy: Optional[str] = None,
+    ) -> List[str]:
+        """
+        Bring a node's prompt within its allowance and reserve the tokens.
+
+        Args:
+            node_id: The LLM node
+            instructions: Instructions sent with the prompt (never cut)
+            parts: Prompt parts, joined by the caller
+            complete: Runs a summary call with the node's LLM
+            node_limit: The node's own budget, overriding the default
+            policy: The node's own policy, overriding the default
+
+        Returns:
+            The prompt parts to send
+
+        Raises:
+            TokenBudgetExceeded: Over budget under the fail policy, or the
+                instructions alone do not fit
+        """
+        policy = policy if policy in BUDGET_POLICIES else self.policy
+        fixed = self.estimator.estimate(instructions)
+        sizes = [self.estimator.estimate(part) for part in parts]
+        estimated = fixed + sum(sizes)
+        usage = LLMNodeUsage(estimated_prompt_tokens=0)
+        self.nodes[node_id] = usage
+
+        allowance, source = self.allowance(node_limit)
+        reserved = 0
+        if allowance is not None and estimated > allowance:
+            if policy == "fail" or fixed >= allowance:
+                raise TokenBudgetExceeded(
+                    f"Prompt of node '{node_id}' is about {estimated} tokens, "
+                    f"over the {source} budget ({allowance} tokens available)"
+                )
+            # Reserve the allowance before awaiting summaries, so nodes fitted
+            # meanwhile cannot be handed the same tokens; the part the cut
+            # prompt does not use is given back below
+            reserved = allowance
+            self.spent += reserved
+            try:
+                shares = _shares(sizes, allowance - fixed)
+                if policy == "summarize":
+                    parts, sizes = await self._summarize(usage, parts, sizes, shares, complete)
+                    shares = _shares(sizes, allowance - fixed)
+            except BaseException:
+                self.spent -= reserved
+                raise
+            parts = [_truncate(part, size, share) for part, size, share in zip(parts, sizes, shares)]
+            usage.budget_action = "summarized" if usage.summary_calls else "truncated"
+            usage.estimated_before_budget = estimated
+            estimated = fixed + self.estimator.estimate_parts(parts)
+
+        self._call_estimates[node_id] = estimated
+        usage.estimated_prompt_tokens += estimated
+        self.spent += estimated - reserved
+        return parts
+
+    async def _summarize(
+        self,
+        usage: LLMNodeUsage,
+        parts: List[str],
+        sizes: List[int],
+        shares: List[int],
+        complete: Complete,
+    ) -> Tuple[List[str], List[int]]:
+        """Replace the parts over their share with summaries of about that size."""
+        parts = list(parts)
+        sizes = list(sizes)
+        for index, (size, share) in enumerate(zip(sizes, shares)):
+            if size <= share or share <= 0:
+                continue
+            text = parts[index]
+            chunk_count = math.ceil(size / TOKEN_SUMMARY_CHUNK_TOKENS)
+            chunk_chars = math.ceil(len(text) / chunk_count)
+            chunks = [text[start:start + chunk_chars] for start in range(0, len(text), chunk_chars)]
+            words = max(1, int(share / len(chunks) * 0.75))
+            instructions = SUMMARY_INSTRUCTIONS.format(words=words)
+            results = await asyncio.gather(*(complete(chunk, instructions) for chunk in chunks))
+            for chunk, result in zip(chunks, results):
+                estimated = self.estimator.estimate(instructions) + self.estimator.estimate(chunk)
+                usage.estimated_prompt_tokens += estimated
+                usage.summary_calls += 1
+                self.spent += estimated
+                self._count(usage, estimated, result)
+            parts[index] = "\n".join(result.text for result in results)
+            sizes[index] = self.estimator.estimate(parts[index])
+        return parts, sizes
+
+    def _count(self, usage: LLMNodeUsage, estimated: int, result: LLMResult) -> None:
+        self.estimator.observe(result.model, estimated, result.prompt_tokens)
+        if result.prompt_tokens is not None:
+            usage.prompt_tokens = (usage.prompt_tokens or 0) + result.prompt_tokens
+        if result.completion_tokens is not None:
+            usage.completion_tokens = (usage.completion_tokens or 0) + result.completion_tokens
+
+    def record(self, node_id: str, result: LLMResult, cached: bool = False) -> None:
+        """
+        Add the usage a backend reported for a node's main call.
+
+        A cached result reports no tokens. Its estimate still counts against
+        the run's budget, so how later prompts are cut does not depend on
+        what happened to be cached.
+        """
+        usage = self.nodes.get(node_id)
+        if usage is None:
+            return
+        usage.model = result.model
+        estimated = self._call_estimates.pop(node_id, 0)
+        if cached:
+            usage.cached = True
+            return
+        self._count(usage, estimated, result)
+
+    def report(self) -> Optional[PipelineTokenUsage]:
+        """Usage of the run, or None if no LLM node ran."""
+        if not self.nodes:
+            return None
+        return PipelineTokenUsage(
+            estimated_prompt_tokens=self.spent,
+            prompt_tokens=sum(usage.prompt_tokens or 0 for usage in self.nodes.values()),
+            completion_tokens=sum(usage.completion_tokens or 0 for usage in self.nodes.values()),
+            nodes=self.nodes,
+        )
@@ -0,0 +1,48 @@
+# Cold start tests - lazily loaded modules, the lazy engine and opt-in schema creation
+
+import json
+import subprocess
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+import src.main
+from benchmarks.import_time import BACKEND_DIR, BUDGET_FILE
+from src.config import database
+
+
+def test_entry_point_does_not_import_lazy_modules():
+    with open(BUDGET_FILE) as f:
+        budget = json.load(f)
+    check = (
+        f"import sys, {budget['module']}; "
+        f"print(','.join(name for name in {budget['forbidden_modules']!r} if name in sys.modules))"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", check], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    assert proc.stdout.strip() == ""
+
+
+def test_engine_is_built_on_first_use(monkeypatch):
+    monkeypatch.setattr(database, "_engine", None)
+    monkeypatch.delenv("host", raising=False)
+    # Importing the app never needs credentials; the first use reports them
+    with pytest.raises(RuntimeError, match="Database credentials are not fully set"):
+        database.get_engine()
+    assert database._engine is None
+
+
+@pytest.mark.parametrize("flag, expected", [(None, 0), ("1", 1)])
+def test_schema_is_created_on_startup_only_when_asked(monkeypatch, flag, expected):
+    calls = []
+    monkeypatch.setattr(src.main, "init_db", lambda: calls.append(1))
+    if flag is None:
+        monkeypatch.delenv("DB_INIT_ON_STARTUP", raising=False)
+    else:
+        monkeypatch.setenv("DB_INIT_ON_STARTUP", flag)
+    monkeypatch.setenv("LOOP_LAG_MONITOR", "0")
+    with TestClient(src.main.app) as client:
+        assert client.get("/").status_code == 200
+    assert len(calls) == expected
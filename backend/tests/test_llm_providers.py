@@ -0,0 +1,120 @@
+# LLM provider tests - backend configuration, routing, model checks and concurrency limits
+
+import asyncio
+import json
+
+import pytest
+
+from src.utils.llm_providers import EchoBackend, LLMBackend, LLMResult, build_registry
+
+
+def make_registry(monkeypatch, backends=None, routes=None, default="echo"):
+    monkeypatch.setenv("LLM_DEFAULT_BACKEND", default)
+    monkeypatch.setenv("LLM_BACKENDS", json.dumps(backends or {}))
+    monkeypatch.setenv("LLM_ROUTES", json.dumps(routes or {}))
+    return build_registry()
+
+
+class CountingBackend(LLMBackend):
+    """Records how many completions run at once."""
+
+    kind = "counting"
+
+    def __init__(self, name, **kwargs):
+        super().__init__(name, model="count", **kwargs)
+        self.running = 0
+        self.peak = 0
+
+    async def _complete(self, prompt, model):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        return LLMResult(text=prompt, model=model)
+
+
+# Configuration and routing
+
+def test_routes_map_node_types_to_configured_backends(monkeypatch):
+    registry = make_registry(
+        monkeypatch,
+        backends={"fast": {"kind": "echo", "model": "fast-model", "models": ["other"]}},
+        routes={"Claude": "fast"},
+    )
+    backend, model = registry.resolve("claude", "prompt")
+    assert backend.name == "fast"
+    assert model == "fast-model"
+    backend, model = registry.resolve("mistral", "prompt")
+    assert (backend.name, model) == ("echo", "echo")
+    assert registry.resolve("claude", "prompt", "echo:custom")[0].name == "echo"
+
+
+def test_unknown_backend_kind_is_rejected(monkeypatch):
+    with pytest.raises(ValueError, match="Unknown LLM backend kind 'nope'"):
+        make_registry(monkeypatch, backends={"broken": {"kind": "nope"}})
+
+
+def test_route_to_unknown_backend_fails_on_use(monkeypatch):
+    registry = make_registry(monkeypatch, routes={"claude": "missing"})
+    with pytest.raises(KeyError, match="Unknown LLM backend 'missing'"):
+        registry.resolve("claude", "prompt")
+
+
+def test_model_error_allows_only_routed_backends_and_their_models(monkeypatch):
+    registry = make_registry(
+        monkeypatch,
+        backends={
+            "fast": {"kind": "echo", "model": "fast-model", "models": ["other"]},
+            "unrouted": {"kind": "echo", "model": "hidden"},
+        },
+        routes={"claude": "fast"},
+    )
+    assert registry.model_error("claude", None) is None
+    assert registry.model_error("claude", "other") is None
+    assert registry.model_error("claude", "fast:fast-model") is None
+    assert "not configured" in registry.model_error("claude", "gpt-4")
+    assert "not served by a routed" in registry.model_error("claude", "unrouted:hidden")
+
+
+def test_small_prompts_use_the_small_model(monkeypatch):
+    monkeypatch.setenv("LLM_SMALL_PROMPT_CHARS", "10")
+    registry = make_registry(monkeypatch, backends={"echo": {"kind": "echo", "small_model": "tiny"}})
+    assert registry.resolve(None, "short")[1] == "tiny"
+    assert registry.resolve(None, "a much longer prompt")[1] == "echo"
+
+
+# Backends
+
+def test_echo_backend_is_deterministic():
+    backend = EchoBackend("echo", preview_chars=5)
+
+    async def main():
+        return await backend.complete("hello world"), await backend.complete("hello world", "other")
+
+    first, second = asyncio.run(main())
+    assert first.text.startswith("[echo:") and first.text.endswith("] hello")
+    assert first.prompt_tokens == 2
+    assert second.model == "other"
+    assert first.text.split("]")[0][len("[echo:"):] == second.text.split("]")[0][len("[other:"):]
+
+
+def test_backend_limits_concurrent_completions():
+    backend = CountingBackend("counting", max_concurrency=2)
+
+    async def main():
+        await asyncio.gather(*(backend.complete(str(index)) for index in range(6)))
+
+    asyncio.run(main())
+    assert backend.peak == 2
+
+
+def test_backend_limit_works_on_a_new_event_loop():
+    backend = CountingBackend("counting", max_concurrency=1)
+
+    async def main():
+        await asyncio.gather(*(backend.complete(str(index)) for index in range(3)))
+
+    # The limit is not bound to the loop it was first used on
+    asyncio.run(main())
+    asyncio.run(main())
+    assert backend.peak == 1
@@ -0,0 +1,67 @@
+# Loop monitor tests - lag measurement, stall stacks and history
+
+import asyncio
+import time
+
+from src.utils.loop_monitor import LoopLagMonitor
+
+
+def block_the_loop(seconds):
+    # Deliberately synchronous: this is the code a stall report should point at
+    time.sleep(seconds)
+
+
+def run_with_monitor(monitor, body):
+    async def main():
+        await monitor.start()
+        try:
+            await body()
+        finally:
+            await monitor.stop()
+
+    asyncio.run(main())
+
+
+def test_idle_loop_records_no_stalls():
+    monitor = LoopLagMonitor(budget_ms=200, interval_ms=10)
+    run_with_monitor(monitor, lambda: asyncio.sleep(0.1))
+    assert monitor.stalls == 0
+    assert monitor.as_dict()["recent_stalls"] == []
+
+
+def test_blocking_call_is_recorded_with_its_stack():
+    monitor = LoopLagMonitor(budget_ms=50, interval_ms=10)
+
+    async def body():
+        await asyncio.sleep(0.05)
+        block_the_loop(0.3)
+        # Let the heartbeat wake up and record the stall
+        await asyncio.sleep(0.05)
+
+    run_with_monitor(monitor, body)
+    assert monitor.stalls == 1
+    stall = monitor.as_dict()["recent_stalls"][0]
+    assert stall["lag_ms"] >= 200
+    assert any("block_the_loop" in frame for frame in stall["stack"])
+    assert monitor.max_lag >= 0.2
+
+
+def test_history_keeps_only_the_latest_stalls():
+    monitor = LoopLagMonitor(budget_ms=20, interval_ms=5, history=2)
+
+    async def body():
+        for _ in range(3):
+            await asyncio.sleep(0.03)
+            block_the_loop(0.1)
+        await asyncio.sleep(0.03)
+
+    run_with_monitor(monitor, body)
+    assert monitor.stalls == 3
+    assert len(monitor.recent) == 2
+
+
+def test_stop_allows_a_restart():
+    monitor = LoopLagMonitor(budget_ms=200, interval_ms=10)
+    run_with_monitor(monitor, lambda: asyncio.sleep(0.02))
+    run_with_monitor(monitor, lambda: asyncio.sleep(0.02))
+    assert monitor._task is None
@@ -0,0 +1,87 @@
+# Node search tests - LIKE escaping of user text and the generated search query
+
+import re
+
+from sqlalchemy.dialects import postgresql
+
+from src.controllers.node_controller import LIKE_ESCAPE, NodeController, _like_pattern, _search_tsquery
+
+
+def like_matches(pattern, text, escape=LIKE_ESCAPE):
+    """Case-insensitive SQL LIKE semantics, for checking patterns without a database."""
+    regex = ""
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == escape:
+            index += 1
+            regex += re.escape(pattern[index])
+        elif char == "%":
+            regex += ".*"
+        elif char == "_":
+            regex += "."
+        else:
+            regex += re.escape(char)
+        index += 1
+    return re.fullmatch(regex, text, re.IGNORECASE | re.DOTALL) is not None
+
+
+class Rows:
+    def all(self):
+        return []
+
+    def one(self):
+        return 0
+
+
+class CapturingDB:
+    """Records each statement, compiled for Postgres, instead of running it."""
+
+    def __init__(self):
+        self.statements = []
+
+    def exec(self, statement):
+        self.statements.append(statement.compile(dialect=postgresql.dialect()))
+        return Rows()
+
+
+# Patterns
+
+def test_like_wildcards_in_the_query_match_literally():
+    pattern = _like_pattern("50%_off")
+    assert pattern == "%50!%!_off%"
+    assert like_matches(pattern, "Get 50%_OFF now")
+    assert not like_matches(pattern, "Get 500 xoff now")
+    assert not like_matches(pattern, "Get 50%xoff now")
+
+
+def test_escape_character_itself_is_escaped():
+    pattern = _like_pattern("a!b")
+    assert pattern == "%a!!b%"
+    assert like_matches(pattern, "xa!by")
+    assert not like_matches(pattern, "xaby")
+
+
+def test_plain_queries_match_substrings():
+    assert like_matches(_like_pattern("inp"), "Text Input")
+
+
+def test_tsquery_prefix_matches_words_only():
+    assert _search_tsquery("Text  inp") == "text:* & inp:*"
+    assert _search_tsquery("node_type") == "node:* & type:*"
+    assert _search_tsquery("%_!") is None
+
+
+# Generated SQL
+
+def test_search_sends_escaped_patterns_with_an_escape_clause():
+    db = CapturingDB()
+    response = NodeController.search_nodes(db, query=" 100%_ ")
+    assert response.total == 0
+    compiled = db.statements[0]
+    sql = str(compiled)
+    assert sql.count("ESCAPE '!'") == 2
+    params = list(compiled.params.values())
+    assert params.count("%100!%!_%") == 2
+    # Trigram similarity gets the raw text; LIKE wildcards mean nothing there
+    assert "100%_" in params
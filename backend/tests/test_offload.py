@@ -0,0 +1,93 @@
+# Offload tests - size-based placement and the thread fallback when processes are unavailable
+
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from src.utils import offload
+from src.utils.offload import OffloadPolicy
+
+
+def thread_name(*args):
+    return threading.current_thread().name
+
+
+class BrokenPool(ThreadPoolExecutor):
+    """A process pool whose worker died: every submission fails with BrokenProcessPool."""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_exception(BrokenProcessPool("worker died"))
+        return future
+
+
+@pytest.fixture(autouse=True)
+def fresh_executors():
+    offload.shutdown_executors()
+    yield
+    offload.shutdown_executors()
+
+
+def test_policy_places_work_by_size():
+    policy = OffloadPolicy("test", thread_size=10, process_size=100)
+    assert [policy.mode(size) for size in (0, 9, 10, 99, 100)] == [
+        "inline", "inline", "thread", "thread", "process"
+    ]
+    assert OffloadPolicy("test", thread_size=10).mode(10**9) == "thread"
+
+
+def test_inline_and_thread_work():
+    policy = OffloadPolicy("test", thread_size=10)
+    main_thread = threading.current_thread().name
+
+    async def main():
+        return await policy.run(1, thread_name), await policy.run(10, thread_name)
+
+    inline, threaded = asyncio.run(main())
+    assert inline == main_thread
+    assert threaded.startswith("offload")
+    assert policy.counts == {"inline": 1, "thread": 1, "process": 0}
+
+
+def test_processes_false_keeps_work_in_this_process():
+    policy = OffloadPolicy("test", thread_size=10, process_size=100)
+    assert asyncio.run(policy.run(100, thread_name, processes=False)).startswith("offload")
+    assert policy.counts["thread"] == 1
+
+
+def test_process_work_falls_back_to_threads_when_pool_cannot_start(monkeypatch):
+    def no_processes(*args, **kwargs):
+        raise NotImplementedError("sem_open is not available")
+
+    monkeypatch.setattr(offload, "ProcessPoolExecutor", no_processes)
+    policy = OffloadPolicy("test", thread_size=10, process_size=100)
+    assert asyncio.run(policy.run(100, thread_name)).startswith("offload")
+    assert policy.counts == {"inline": 0, "thread": 1, "process": 0}
+    assert policy.as_dict()["process_fallbacks"] == 1
+
+
+def test_process_work_falls_back_to_threads_when_pool_broke(monkeypatch):
+    monkeypatch.setattr(offload, "ProcessPoolExecutor", lambda **kwargs: BrokenPool())
+    policy = OffloadPolicy("test", thread_size=10, process_size=100)
+
+    async def main():
+        return await policy.run(100, thread_name), await policy.run(100, thread_name)
+
+    assert all(name.startswith("offload") for name in asyncio.run(main()))
+    assert policy.process_fallbacks == 2
+    # The broken pool is dropped, so the next use builds a new one
+    assert "process" not in offload._executors
+
+
+def test_errors_raised_by_the_work_itself_are_not_retried():
+    policy = OffloadPolicy("test", thread_size=10)
+
+    def fail():
+        raise OSError("disk full")
+
+    with pytest.raises(OSError, match="disk full"):
+        asyncio.run(policy.run(10, fail))
+    assert policy.process_fallbacks == 0
@@ -0,0 +1,123 @@
+# Pipeline store tests - drafts shared between workers through the shared cache
+
+import pytest
+
+from src.controllers.pipeline_controller import PipelineController
+from src.schemas import PipelineEdge, PipelineNode
+from src.utils import pipeline_plan as plan_module
+from src.utils import pipeline_store as store_module
+from src.utils.pipeline_plan import PipelinePlan
+from src.utils.pipeline_store import PipelineStore, VersionConflict
+from src.utils.shared_cache import InMemoryKV, KVBackend, SharedCache
+
+
+@pytest.fixture
+def shared_kv(monkeypatch):
+    """Share the store's cache tier through an in-memory stand-in for redis."""
+    client = InMemoryKV()
+    cache = SharedCache(lambda: KVBackend(client, remote=False), version_interval=0)
+    monkeypatch.setattr(store_module, "shared_cache", cache)
+    return client
+
+
+def make_plan():
+    nodes = [
+        PipelineNode(id="t1", type="text", data={"id": "t1", "nodeType": "text", "text": "hello"}),
+        PipelineNode(id="l1", type="mistral", data={"id": "l1", "nodeType": "mistral", "Prompt": "Sum {{t1}}"}),
+        PipelineNode(id="o1", type="output", data={"id": "o1", "nodeType": "output"}),
+    ]
+    edges = [
+        PipelineEdge(source="t1", target="l1"),
+        PipelineEdge(id="e2", source="l1", target="o1"),
+    ]
+    return PipelineController.compile_plan(nodes, edges)
+
+
+def test_draft_created_on_one_worker_is_served_by_another(shared_kv):
+    worker_a, worker_b = PipelineStore(), PipelineStore()
+    created = worker_a.create(make_plan())
+
+    loaded = worker_b.get(created.pipeline_id)
+    assert loaded is not None
+    assert loaded.version == 1
+    assert list(loaded.plan.edges_dict) == list(created.plan.edges_dict)
+    assert loaded.plan.order == created.plan.order
+    assert [node.id for node in loaded.plan.inputs["l1"]] == ["t1"]
+
+
+def test_patch_on_one_worker_is_seen_by_another(shared_kv):
+    worker_a, worker_b = PipelineStore(), PipelineStore()
+    created = worker_a.create(make_plan())
+
+    patched = worker_b.patch(created.pipeline_id, 1, [lambda plan: plan.remove_edge("e2")])
+    assert patched.version == 2
+
+    current = worker_a.get(created.pipeline_id)
+    assert current.version == 2
+    assert current.plan.num_edges == 1
+    with pytest.raises(VersionConflict):
+        worker_a.patch(created.pipeline_id, 1, [])
+
+
+def test_shared_drafts_are_json_and_malformed_copies_are_ignored(shared_kv):
+    worker_a, worker_b = PipelineStore(), PipelineStore()
+    created = worker_a.create(make_plan())
+    cache = store_module.shared_cache
+
+    assert cache.get("pipelines", created.pipeline_id, "graph").startswith(b"{")
+    cache.set("pipelines", created.pipeline_id, "graph", value=b"\x80\x04not json")
+    assert worker_b.get(created.pipeline_id) is None
+
+
+def test_concurrent_patches_of_one_version_conflict():
+    store = PipelineStore()
+    created = store.create(make_plan())
+
+    def nested_patch(plan):
+        # A second patch of the same base version commits while this one runs
+        store.patch(created.pipeline_id, 1, [lambda plan: plan.remove_edge("e2")])
+
+    with pytest.raises(VersionConflict):
+        store.patch(created.pipeline_id, 1, [nested_patch])
+    assert store.get(created.pipeline_id).version == 2
+
+
+def test_patched_plan_matches_a_fresh_compile():
+    plan = make_plan()
+    assert plan.add_edge(PipelineEdge(source="t1", target="o1")) == "t1->o1#2"
+    assert plan.add_edge(PipelineEdge(source="t1", target="o1")) == "t1->o1#3"
+    plan.add_node(PipelineNode(id="t2", type="text", data={"id": "t2", "nodeType": "text", "Prompt": "{{l1}}"}))
+
+    fresh = PipelineController.compile_plan(plan.nodes, plan.edges)
+    assert list(fresh.edges_dict) == list(plan.edges_dict)
+    assert plan.order == fresh.order
+    assert plan.dependencies == fresh.dependencies
+
+
+def test_patch_is_planned_once_and_leaves_the_stored_plan_untouched(monkeypatch):
+    store = PipelineStore()
+    created = store.create(make_plan())
+    original_order = list(created.plan.order)
+    plans = []
+    real_plan = PipelinePlan._plan
+    monkeypatch.setattr(PipelinePlan, "_plan", lambda plan: (plans.append(1), real_plan(plan)))
+
+    patched = store.patch(created.pipeline_id, 1, [
+        lambda plan: plan.add_node(PipelineNode(id="t2", type="text")),
+        lambda plan: plan.add_edge(PipelineEdge(source="t2", target="l1")),
+        lambda plan: plan.remove_edge("e2"),
+    ])
+    assert len(plans) == 1
+    assert patched.plan.dependencies["l1"] == {"t1", "t2"}
+    assert created.plan.order == original_order
+    assert created.plan.num_edges == 2
+
+
+def test_patches_respect_the_pipeline_size_limits(monkeypatch):
+    monkeypatch.setattr(plan_module, "PIPELINE_MAX_NODES", 3)
+    monkeypatch.setattr(plan_module, "PIPELINE_MAX_EDGES", 2)
+    plan = make_plan()
+    with pytest.raises(ValueError):
+        plan.add_node(PipelineNode(id="t2", type="text"))
+    with pytest.raises(ValueError):
+        plan.add_edge(PipelineEdge(source="t1", target="o1"))
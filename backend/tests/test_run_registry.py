@@ -0,0 +1,66 @@
+# Run registry tests - unique run ids, cancellation and the admin-gated cancel route
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.utils.run_registry import RunCancelled, RunIdInUse, RunRegistry, run_registry
+
+
+async def wait_forever():
+    await asyncio.Event().wait()
+
+
+# RunRegistry
+
+def test_duplicate_in_flight_run_id_is_rejected():
+    registry = RunRegistry()
+
+    async def main():
+        first = asyncio.create_task(registry.execute("run", wait_forever()))
+        await asyncio.sleep(0)
+        with pytest.raises(RunIdInUse) as exc:
+            await registry.execute("run", wait_forever())
+        assert exc.value.status_code == 409
+        # The first run is untouched by the rejected one
+        assert not first.done()
+        assert registry.cancel("run")
+        with pytest.raises(RunCancelled):
+            await first
+
+    asyncio.run(main())
+
+
+def test_run_id_is_reusable_once_the_run_finished():
+    registry = RunRegistry()
+
+    async def work(value):
+        return value
+
+    async def main():
+        assert await registry.execute("run", work(1)) == 1
+        assert await registry.execute("run", work(2)) == 2
+        assert registry.get("run") is None
+
+    asyncio.run(main())
+
+
+def test_cancel_reports_unknown_runs():
+    registry = RunRegistry()
+    assert not registry.cancel("missing")
+
+
+# Cancel route
+
+def test_cancel_route_requires_admin(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    client = TestClient(app)
+    assert client.post("/api/v1/pipelines/runs/missing/cancel").status_code == 403
+    assert client.post(
+        "/api/v1/pipelines/runs/missing/cancel", headers={"X-Admin-Token": "wrong"}
+    ).status_code == 403
+    response = client.post("/api/v1/pipelines/runs/missing/cancel", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 404
+    assert run_registry.get("missing") is None
@@ -0,0 +1,114 @@
+# Run results tests - buffered writes, retries, expiry and fetching a run by id
+
+import asyncio
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from src.config import get_db
+from src.main import app
+from src.utils.run_results import RunResultStore, run_results
+
+
+class StoredRun:
+    def __init__(self, row):
+        self.row = row
+
+    def model_dump(self):
+        return dict(self.row)
+
+
+class FakeDB:
+    def __init__(self, rows=()):
+        self.rows = {row["run_id"]: row for row in rows}
+
+    def get(self, model, run_id):
+        row = self.rows.get(run_id)
+        return StoredRun(row) if row else None
+
+
+def make_store(**kwargs):
+    return RunResultStore(enabled=True, **kwargs)
+
+
+def record(store, run_id, **kwargs):
+    store.record(run_id, "completed", 2, 1, True, outputs=[{"o1": run_id}], **kwargs)
+
+
+# Buffer
+
+def test_buffered_result_is_served_before_it_is_written():
+    store = make_store()
+    record(store, "run-1")
+    row = store.get(FakeDB(), "run-1")
+    assert row["outputs"] == [{"o1": "run-1"}]
+    assert store.get(FakeDB(), "unknown") is None
+
+
+def test_buffer_drops_the_oldest_results_when_full():
+    store = make_store(max_pending=2)
+    for run_id in ("a", "b", "c"):
+        record(store, run_id)
+    assert store.get_pending("a") is None
+    assert store.get_pending("c") is not None
+    assert store.dropped == 1
+
+
+def test_expired_results_are_not_served():
+    store = make_store(ttl=60)
+    expired = {"run_id": "old", "expires_at": datetime.utcnow() - timedelta(seconds=1)}
+    assert store.get(FakeDB([expired]), "old") is None
+    current = {"run_id": "new", "expires_at": datetime.utcnow() + timedelta(seconds=60)}
+    assert store.get(FakeDB([current]), "new")["run_id"] == "new"
+
+
+# Writes
+
+def test_flush_writes_in_batches_and_retries_after_a_failure(monkeypatch):
+    store = make_store(batch_size=2)
+    batches = []
+    failures = [RuntimeError("database down")]
+
+    def write(rows):
+        if failures:
+            raise failures.pop()
+        batches.append([row["run_id"] for row in rows])
+
+    monkeypatch.setattr(store, "_write", write)
+    for run_id in ("a", "b", "c"):
+        record(store, run_id)
+
+    asyncio.run(store.flush())
+    assert store.failed_writes == 1
+    assert store.as_dict()["pending"] == 3
+
+    asyncio.run(store.flush())
+    assert batches == [["a", "b"], ["c"]]
+    assert store.written == 3
+    assert store.as_dict()["pending"] == 0
+
+
+def test_disabled_store_records_nothing():
+    store = RunResultStore(enabled=False)
+    record(store, "run-1")
+    assert store.get_pending("run-1") is None
+
+
+# Route
+
+def test_get_run_serves_buffered_results_and_404s_unknown_ids(monkeypatch):
+    monkeypatch.setattr(run_results, "enabled", True)
+    monkeypatch.setattr(run_results, "_pending", type(run_results._pending)())
+    record(run_results, "run-1", node_outputs={"n1": "x"})
+    app.dependency_overrides[get_db] = lambda: FakeDB()
+    try:
+        client = TestClient(app)
+        response = client.get("/api/v1/pipelines/runs/run-1")
+        assert response.status_code == 200
+        assert response.json()["outputs"] == [{"o1": "run-1"}]
+        assert "node_outputs" not in response.json()
+        response = client.get("/api/v1/pipelines/runs/run-1", params={"include_nodes": True})
+        assert response.json()["node_outputs"] == {"n1": "x"}
+        assert client.get("/api/v1/pipelines/runs/missing").status_code == 404
+    finally:
+        app.dependency_overrides.pop(get_db, None)
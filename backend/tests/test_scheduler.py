@@ -0,0 +1,138 @@
+# Scheduler tests - priority admission, waiter accounting, critical paths and priority checks
+
+import asyncio
+
+import pytest
+
+from src.utils.scheduler import (
+    LatencyTracker,
+    PriorityLimiter,
+    critical_path_lengths,
+    priority_rank,
+    request_priority,
+)
+
+
+async def hold(limiter, key, admitted, release):
+    async with limiter.slot(key):
+        admitted.append(key)
+        await release.wait()
+
+
+# PriorityLimiter
+
+def test_limiter_admits_waiters_by_key_under_contention():
+    async def main():
+        limiter = PriorityLimiter(1)
+        admitted = []
+        release = asyncio.Event()
+        # Each task releases its slot right away, except the first holder
+        first = asyncio.create_task(hold(limiter, (0, 0), admitted, release))
+        await asyncio.sleep(0)
+        done = asyncio.Event()
+        done.set()
+        waiters = [
+            asyncio.create_task(hold(limiter, key, admitted, done))
+            for key in [(1, 5), (0, 9), (1, 1), (0, 3)]
+        ]
+        await asyncio.sleep(0)
+        assert limiter.waiting == 4
+        release.set()
+        await asyncio.gather(first, *waiters)
+        return admitted, limiter
+
+    admitted, limiter = asyncio.run(main())
+    assert admitted == [(0, 0), (0, 3), (0, 9), (1, 1), (1, 5)]
+    assert limiter.in_use == 0
+    assert limiter.waiting == 0
+
+
+def test_limiter_ties_fall_back_to_arrival_order():
+    async def main():
+        limiter = PriorityLimiter(1)
+        admitted = []
+        release = asyncio.Event()
+        first = asyncio.create_task(hold(limiter, "first", admitted, release))
+        await asyncio.sleep(0)
+        done = asyncio.Event()
+        done.set()
+        waiters = []
+        for name in ["a", "b", "c"]:
+            waiters.append(asyncio.create_task(hold(limiter, (1,), [], done)))
+            waiters[-1].add_done_callback(lambda task, name=name: admitted.append(name))
+            await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(first, *waiters)
+        return admitted
+
+    assert asyncio.run(main()) == ["first", "a", "b", "c"]
+
+
+def test_cancelled_waiter_leaves_the_live_count():
+    async def main():
+        limiter = PriorityLimiter(1)
+        release = asyncio.Event()
+        holder = asyncio.create_task(hold(limiter, 0, [], release))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(limiter.acquire(1))
+        await asyncio.sleep(0)
+        assert limiter.waiting == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        # The cancelled waiter is still on the heap but no longer counted
+        assert limiter.waiting == 0
+        assert limiter.as_dict() == {"capacity": 1, "in_use": 1, "waiting": 0}
+        release.set()
+        await holder
+        # Its slot was not handed to the cancelled waiter
+        assert limiter.in_use == 0
+        # With nobody waiting, the next acquire does not queue
+        await asyncio.wait_for(limiter.acquire(2), 1)
+        assert limiter.in_use == 1
+
+    asyncio.run(main())
+
+
+# Critical paths
+
+def test_critical_path_lengths_on_a_diamond():
+    #   a
+    #  / \
+    # b   c
+    #  \ /
+    #   d
+    order = ["a", "b", "c", "d"]
+    dependents = {"a": ["b", "c"], "b": ["d"], "c": ["d"]}
+    costs = {"a": 1.0, "b": 5.0, "c": 2.0, "d": 1.0}
+    assert critical_path_lengths(order, dependents, costs) == {"d": 1.0, "c": 3.0, "b": 6.0, "a": 7.0}
+
+
+def test_critical_path_lengths_default_missing_costs_to_zero():
+    assert critical_path_lengths(["a", "b"], {"a": ["b"]}, {"b": 2.0}) == {"b": 2.0, "a": 2.0}
+
+
+def test_latency_tracker_moves_towards_observations():
+    tracker = LatencyTracker(default=2.0, alpha=0.5)
+    assert tracker.estimate("Mistral") == 2.0
+    tracker.observe("Mistral", 4.0)
+    tracker.observe("mistral", 2.0)
+    assert tracker.estimate("MISTRAL") == 3.0
+
+
+# Request priority
+
+def test_request_priority_may_be_lowered_without_admin():
+    assert request_priority("batch", "interactive") == "batch"
+    assert request_priority(None, "batch") == "batch"
+
+
+def test_request_priority_rejects_raising_without_admin():
+    assert request_priority("interactive", "batch") == "batch"
+    assert request_priority("interactive", "batch", admin=True) == "interactive"
+
+
+def test_unknown_priority_ranks_as_batch():
+    assert priority_rank("urgent") == priority_rank("batch")
+    assert request_priority("urgent", "batch") == "urgent"
+    assert request_priority("urgent", "interactive") == "urgent"
@@ -0,0 +1,269 @@
+# Shared cache tests - versioning, bounded memory, locks and stampede protection
+
+import asyncio
+import multiprocessing
+import sys
+import threading
+import time
+
+import pytest
+
+from src.utils.shared_cache import (
+    CacheLockTimeout,
+    InMemoryKV,
+    KVBackend,
+    MmapBackend,
+    SharedCache,
+)
+
+
+def make_cache(client=None, **kwargs):
+    client = client or InMemoryKV()
+    return SharedCache(lambda: KVBackend(client, remote=False), version_interval=0, **kwargs)
+
+
+def make_mmap(path, max_bytes=2 * 1024 * 1024):
+    return MmapBackend(str(path), max_bytes=max_bytes, slot_sizes=(256, 4096))
+
+
+# InMemoryKV (the stand-in for an external key-value service)
+
+def test_in_memory_kv_expires_entries():
+    kv = InMemoryKV()
+    kv.set("a", b"1", ex=0.05)
+    assert kv.get("a") == b"1"
+    time.sleep(0.06)
+    assert kv.get("a") is None
+
+
+def test_in_memory_kv_evicts_only_entries_with_a_ttl():
+    kv = InMemoryKV(max_bytes=1000)
+    kv.incr("version")
+    for index in range(100):
+        kv.set(f"key-{index}", b"x" * 50, ex=60)
+    assert kv.size <= 1000
+    assert kv.get("version") == b"1"
+    assert kv.get("key-99") is not None
+    assert kv.get("key-0") is None
+
+
+def test_in_memory_kv_set_nx_and_delete_if():
+    kv = InMemoryKV()
+    assert kv.set("lock", b"a", nx=True)
+    assert kv.set("lock", b"b", nx=True) is None
+    assert not kv.delete_if("lock", b"b")
+    assert kv.delete_if("lock", b"a")
+    assert kv.get("lock") is None
+
+
+# SharedCache
+
+def test_invalidate_makes_entries_unreachable():
+    cache = make_cache()
+    cache.set("catalog", "node", "text", value=b"v1")
+    assert cache.get("catalog", "node", "text") == b"v1"
+    cache.invalidate("catalog")
+    assert cache.version("catalog") == 1
+    assert cache.get("catalog", "node", "text") is None
+    cache.set("catalog", "node", "text", value=b"v2")
+    assert cache.get("catalog", "node", "text") == b"v2"
+
+
+def test_invalidation_is_seen_by_other_workers():
+    client = InMemoryKV()
+    worker_a, worker_b = make_cache(client), make_cache(client)
+    worker_a.set("catalog", "body", value=b"old")
+    assert worker_b.get("catalog", "body") == b"old"
+    worker_a.invalidate("catalog")
+    assert worker_b.get("catalog", "body") is None
+
+
+def test_values_over_the_size_limit_are_not_cached():
+    cache = make_cache(max_value_bytes=10)
+    assert not cache.set("ns", "big", value=b"x" * 11)
+    assert cache.get_or_set("ns", ("big",), lambda: b"x" * 11) == b"x" * 11
+    assert cache.get("ns", "big") is None
+
+
+def test_backend_errors_are_misses():
+    class Broken(InMemoryKV):
+        def get(self, name):
+            raise ConnectionError("down")
+
+    cache = make_cache(Broken())
+    assert cache.get("ns", "key") is None
+    assert cache.get_or_set("ns", ("key",), lambda: b"built") == b"built"
+    assert cache.counts["errors"] > 0
+
+
+def test_get_or_set_builds_once_across_threads():
+    cache = make_cache()
+    builds = []
+
+    def build():
+        builds.append(1)
+        time.sleep(0.1)
+        return b"value"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_set("ns", ("key",), build)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [b"value"] * 8
+    assert len(builds) == 1
+
+
+def test_get_or_set_waits_for_another_workers_build():
+    client = InMemoryKV()
+    worker_a, worker_b = make_cache(client), make_cache(client)
+    key = worker_a.key("ns", "key") + ":lock"
+    client.set(key, b"other-worker", ex=5)
+
+    def finish_build():
+        time.sleep(0.1)
+        client.set(worker_a.key("ns", "key"), b"from-a", ex=60)
+
+    threading.Thread(target=finish_build).start()
+    assert worker_b.get_or_set("ns", ("key",), lambda: b"from-b") == b"from-a"
+
+
+def test_aget_or_set_builds_once():
+    cache = make_cache()
+    builds = []
+
+    async def build():
+        builds.append(1)
+        await asyncio.sleep(0.05)
+        return b"value"
+
+    async def main():
+        return await asyncio.gather(*(cache.aget_or_set("llm", ("prompt",), build) for _ in range(10)))
+
+    assert asyncio.run(main()) == [b"value"] * 10
+    assert len(builds) == 1
+
+
+def test_cancelled_builder_does_not_cancel_waiters():
+    cache = make_cache()
+    builds = []
+
+    async def build():
+        builds.append(1)
+        await asyncio.sleep(0.1)
+        return b"value"
+
+    async def main():
+        first = asyncio.create_task(cache.aget_or_set("llm", ("prompt",), build))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(cache.aget_or_set("llm", ("prompt",), build))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == b"value"
+    assert len(builds) == 2
+
+
+def test_lock_times_out_instead_of_running_unlocked():
+    client = InMemoryKV()
+    worker_a, worker_b = make_cache(client), make_cache(client)
+    with worker_a.lock("pipelines", "p1"):
+        with pytest.raises(CacheLockTimeout):
+            with worker_b.lock("pipelines", "p1", wait=0.05):
+                pass
+    with worker_b.lock("pipelines", "p1", wait=0.05):
+        pass
+
+
+def test_expired_lock_is_not_released_by_its_old_holder():
+    client = InMemoryKV()
+    worker_a, worker_b = make_cache(client, lock_ttl=0.05), make_cache(client)
+    lock_key = worker_a.key("pipelines", "p1") + ":lock"
+    with worker_a.lock("pipelines", "p1"):
+        time.sleep(0.06)
+        token_b = worker_b._acquire(lock_key, 0)
+        assert token_b is not None
+    # worker_a's release must not have removed worker_b's lock
+    assert client.get(lock_key) == token_b
+
+
+# MmapBackend
+
+def test_mmap_round_trip_and_ttl(tmp_path):
+    backend = make_mmap(tmp_path / "cache")
+    assert backend.set("a", b"1", ttl=0.05)
+    assert backend.get("a") == b"1"
+    assert not backend.add("a", b"2")
+    time.sleep(0.06)
+    assert backend.get("a") is None
+    assert backend.add("a", b"2")
+    assert backend.incr("n") == 1
+    assert backend.incr("n") == 2
+
+
+def test_mmap_is_shared_between_mappings(tmp_path):
+    first, second = make_mmap(tmp_path / "cache"), make_mmap(tmp_path / "cache")
+    first.set("key", b"value", ttl=60)
+    assert second.get("key") == b"value"
+    assert second.delete_if("key", b"value")
+    assert first.get("key") is None
+
+
+def test_mmap_refuses_a_file_with_another_layout(tmp_path):
+    make_mmap(tmp_path / "cache")
+    with pytest.raises(ValueError):
+        make_mmap(tmp_path / "cache", max_bytes=4 * 1024 * 1024)
+
+
+def test_mmap_memory_is_bounded(tmp_path):
+    path = tmp_path / "cache"
+    backend = make_mmap(path)
+    assert not backend.set("big", b"x" * 5000, ttl=60)
+    for index in range(5000):
+        backend.set(f"key-{index}", b"y" * 200, ttl=60)
+    assert path.stat().st_size == backend.size <= 2 * 1024 * 1024
+    assert backend.get("key-4999") == b"y" * 200
+
+
+def test_mmap_eviction_keeps_namespace_versions(tmp_path):
+    cache = SharedCache(lambda: make_mmap(tmp_path / "cache"), version_interval=0)
+    cache.invalidate("catalog")
+    cache.invalidate("catalog")
+    for index in range(20000):
+        cache.set("llm", index, value=b"z" * 200)
+    assert cache.version("catalog") == 2
+
+
+def _build_in_process(path, queue):
+    cache = SharedCache(lambda: make_mmap(path))
+    builds = []
+
+    def build():
+        builds.append(1)
+        time.sleep(0.3)
+        return b"value"
+
+    queue.put((cache.get_or_set("ns", ("key",), build), len(builds)))
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="uses fork")
+def test_mmap_builds_once_across_processes(tmp_path):
+    path = str(tmp_path / "cache")
+    make_mmap(path)
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    processes = [context.Process(target=_build_in_process, args=(path, queue)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    results = [queue.get(timeout=10) for _ in processes]
+    for process in processes:
+        process.join()
+    assert [value for value, _ in results] == [b"value"] * 4
+    assert sum(builds for _, builds in results) == 1
@@ -0,0 +1,132 @@
+# Token budget tests - allowances, truncate / summarize / fail policies and preflight
+
+import asyncio
+
+import pytest
+
+from src.utils.llm_providers import LLMResult
+from src.utils.token_budget import (
+    TRUNCATION_MARKER,
+    RunTokenBudget,
+    TokenBudgetExceeded,
+    TokenEstimator,
+)
+
+
+def make_budget(node_limit=0, pipeline_limit=0, policy="truncate"):
+    # One character per token, so sizes in the tests are exact
+    return RunTokenBudget(node_limit, pipeline_limit, policy, TokenEstimator(chars_per_token=1.0))
+
+
+async def no_summaries(prompt, instructions):
+    raise AssertionError("No summary call expected")
+
+
+def fit(budget, parts, complete=no_summaries, instructions="", **kwargs):
+    return asyncio.run(budget.fit("l1", instructions, parts, complete, **kwargs))
+
+
+# Within budget
+
+def test_prompt_exactly_at_budget_is_sent_unchanged():
+    budget = make_budget(node_limit=100)
+    parts = ["a" * 60, "b" * 30]
+    assert fit(budget, parts, instructions="c" * 10) == parts
+    usage = budget.nodes["l1"]
+    assert usage.estimated_prompt_tokens == 100
+    assert usage.budget_action is None
+    assert budget.spent == 100
+
+
+def test_pipeline_budget_caps_the_node_allowance():
+    budget = make_budget(node_limit=100, pipeline_limit=150)
+    budget.spent = 120
+    assert budget.allowance() == (30, "pipeline")
+    assert make_budget(node_limit=100, pipeline_limit=500).allowance() == (100, "node")
+    assert make_budget().allowance() == (None, "node")
+
+
+# Truncate
+
+def test_over_budget_truncates_the_largest_part_only():
+    budget = make_budget(node_limit=100)
+    small, large = "s" * 20, "l" * 200
+    fitted = fit(budget, [small, large])
+    assert fitted[0] == small
+    assert fitted[1].endswith(TRUNCATION_MARKER)
+    assert len(fitted[1]) <= 80
+    usage = budget.nodes["l1"]
+    assert usage.budget_action == "truncated"
+    assert usage.estimated_before_budget == 220
+    assert budget.spent == usage.estimated_prompt_tokens <= 100
+
+
+# Summarize
+
+def test_summarize_replaces_oversized_parts_with_summaries():
+    calls = []
+
+    async def complete(prompt, instructions):
+        calls.append(prompt)
+        return LLMResult(text="summary", model="echo", prompt_tokens=len(prompt), completion_tokens=2)
+
+    budget = make_budget(node_limit=100, policy="summarize")
+    fitted = fit(budget, ["x" * 500], complete)
+    assert fitted == ["summary"]
+    assert calls == ["x" * 500]
+    usage = budget.nodes["l1"]
+    assert usage.budget_action == "summarized"
+    assert usage.summary_calls == 1
+    assert usage.completion_tokens == 2
+
+
+def test_summarize_failure_gives_the_reserved_tokens_back():
+    async def complete(prompt, instructions):
+        raise RuntimeError("backend down")
+
+    budget = make_budget(node_limit=100, pipeline_limit=1000, policy="summarize")
+    with pytest.raises(RuntimeError):
+        fit(budget, ["x" * 500], complete)
+    assert budget.spent == 0
+    assert budget.allowance() == (100, "node")
+
+
+# Fail
+
+def test_fail_policy_raises_413_before_any_call():
+    budget = make_budget(node_limit=100, policy="fail")
+    with pytest.raises(TokenBudgetExceeded) as exc:
+        fit(budget, ["x" * 101])
+    assert exc.value.status_code == 413
+    assert "'l1'" in exc.value.detail
+    assert budget.spent == 0
+
+
+def test_node_policy_overrides_the_default():
+    budget = make_budget(node_limit=100)
+    with pytest.raises(TokenBudgetExceeded):
+        fit(budget, ["x" * 101], policy="fail")
+    assert fit(make_budget(node_limit=100, policy="fail"), ["x" * 101], policy="truncate")
+
+
+def test_instructions_alone_over_budget_fail_under_any_policy():
+    budget = make_budget(node_limit=10)
+    with pytest.raises(TokenBudgetExceeded):
+        fit(budget, ["x"], instructions="i" * 10)
+
+
+# Preflight
+
+def test_preflight_checks_only_fail_policy_nodes():
+    budget = make_budget(node_limit=100, pipeline_limit=150)
+    budget.preflight({"a": (500, None, "truncate"), "b": (100, None, "fail")})
+    with pytest.raises(TokenBudgetExceeded) as exc:
+        budget.preflight({"a": (101, None, "fail")})
+    assert exc.value.status_code == 413
+
+
+def test_preflight_sums_fail_policy_nodes_against_the_pipeline_budget():
+    budget = make_budget(node_limit=100, pipeline_limit=150)
+    with pytest.raises(TokenBudgetExceeded) as exc:
+        budget.preflight({"a": (80, None, "fail"), "b": (80, None, "fail")})
+    assert "pipeline budget of 150" in exc.value.detail
@@ -76,17 +76,25 @@ export const useStore = create(
 
         if (edgeExists) return; // Don't create duplicate edges
 
-        const targetNodeIDSplitted = targetNodeId.split('-')[0];
-        const targetNode = completeNodes.find(node => node.type === targetNodeIDSplitted);
-        const targetHandleId = targetNode.handles[0].id;
+        // Use the handles the node types actually define (the backend rejects
+        // edges through handles a type does not have)
+        const findHandle = (nodeId, handleType) => {
+          const nodeType = nodeId.split('-')[0];
+          const node = completeNodes.find(node => node.type === nodeType);
+          return node?.handles?.find(handle => handle.type === handleType);
+        };
+        const sourceHandle = findHandle(sourceNodeId, 'source');
+        const targetHandle = findHandle(targetNodeId, 'target');
+
+        if (!sourceHandle || !targetHandle) return; // Nothing to connect through
 
         // Create connection object and use onConnect to add the edge
         // This ensures ReactFlow properly handles the edge addition
         const connection = {
           source: sourceNodeId,
-          sourceHandle: `${sourceNodeId}-output`,
+          sourceHandle: `${sourceNodeId}-${sourceHandle.id}`,
           target: targetNodeId,
-          targetHandle: `${targetNodeId}-${targetHandleId}`,
+          targetHandle: `${targetNodeId}-${targetHandle.id}`,
         };
 
         // Use the existing onConnect function which properly handles ReactFlow updates